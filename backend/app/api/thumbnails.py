@@ -0,0 +1,42 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from app.core.config import settings
+from app.services.thumbnails import MEDIA_TYPES, THUMBNAIL_NAME
+
+router = APIRouter()
+
+# A thumbnail's name is derived from its content, so it can be cached forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored, '*' matches anything."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+@router.get("/thumbnails/{name}", include_in_schema=False)
+async def get_thumbnail(name: str, request: Request):
+    """
+    Serves a content-addressed thumbnail.
+
+    The ETag is the file name itself (content hash + size), so revalidation is a
+    string compare that answers 304 without touching the disk. FileResponse
+    handles Range/If-Range requests and hands the file to the server's zero-copy
+    path when it offers one (the ASGI pathsend extension); deployments can also
+    point IMAGE_BASE_URL at a static server such as the frontend's nginx.
+    """
+    match = THUMBNAIL_NAME.fullmatch(name)
+    if match is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    etag = f'"{name}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    path = os.path.join(settings.THUMBNAIL_DIR, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return FileResponse(path, media_type=MEDIA_TYPES[match["ext"]], headers=headers)
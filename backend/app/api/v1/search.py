@@ -1,143 +1,608 @@
 import asyncio
-import json
+import hashlib
+import threading
+import time
+from typing import List, Optional
 from fastapi.responses import StreamingResponse
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 
-from app.core.models import SearchQuery, SearchResponse, SearchResultItem
+from app.core.config import settings
+from app.core.metrics import FILTERED_SEARCHES, HYBRID_SEARCHES, STREAM_DISCONNECTS, RequestTimer
+from app.core.sse import compress_events, format_sse, negotiate_encoding, wait_for_disconnect
+from app.core.models import (
+    SearchQuery, SearchResponse, SearchResultItem, BatchSearchRequest, BatchSearchResponse,
+    SearchFilters, Orientation, Color
+)
 from app.services.clip_service import get_clip_service, CLIPService
-from app.services.chromadb_service import get_chromadb_service, ChromaDBService
+from app.services.vector_store import get_vector_store, VectorStore
 from app.services.explanation_service import get_explanation_service, ExplanationService
+from app.services.cache_service import get_search_cache_service, SearchCacheService, normalize_query
+from app.services.image_decoding import get_decode_pool, decode_and_resize
+from app.services.executors import StageSaturated, get_executor_stats, get_model_executor, get_search_executor
+from app.services.thumbnails import get_thumbnail_service
+from app.services.keyword_index import KeywordIndexService, get_keyword_index_service
+from app.services.hybrid_search import reciprocal_rank_fusion, rerank
+from app.services.attribute_index import AttributeIndexService, AttributeIndexUnavailable, get_attribute_index_service
 
 router = APIRouter()
 
-def format_sse(data: dict) -> str:
-    """Formats a dictionary as a Server-Sent Event string."""
-    return f"data: {json.dumps(data)}\n\n"
-
-# @router.get("/search/stream")
-# async def stream_search_images(
-#     q: str,
-#     request: Request,
-#     clip: CLIPService = Depends(get_clip_service),
-#     chroma: ChromaDBService = Depends(get_chromadb_service),
-#     explainer: ExplanationService = Depends(get_explanation_service)
-# ):
-#     # --- THIS IS THE FIX ---
-#     # The nested generator needs access to the variables from the parent function.
-#     # We pass them in as arguments.
-#     async def event_generator(query: str, clip_service: CLIPService, chroma_service: ChromaDBService, explainer_service: ExplanationService):
-#         try:
-#             # Step 1: Text Embedding
-#             yield format_sse({"step": "Analyzing your query...", "progress": 25})
-#             query_embedding = clip_service.encode_text(query) # Use the passed-in argument
-#             await asyncio.sleep(0.001)
-
-#             # Step 2: Vector Search
-#             yield format_sse({"step": "Searching our visual library...", "progress": 50})
-#             search_results = chroma_service.search( # Use the passed-in argument
-#                 query_embedding=query_embedding, 
-#                 top_k=5, 
-#                 include=["metadatas", "distances"]
-#             )
-#             await asyncio.sleep(0.01)
-
-#             # Step 3: AI Explanation
-#             yield format_sse({"step": "Asking our AI for an explanation...", "progress": 75})
-#             explanation_text = explainer_service.generate_explanation(user_query=query) # Use the passed-in argument
-#             await asyncio.sleep(0.001)
-
-#             # Step 4: Formatting Response
-#             yield format_sse({"step": "Finalizing results...", "progress": 95})
-#             response_items = []
-#             if search_results and search_results['ids'][0]:
-#                 for i, result_id in enumerate(search_results['ids'][0]):
-#                     filename = search_results['metadatas'][0][i]['filename']
-#                     distance = search_results['distances'][0][i]
-#                     similarity = max(0, 1 - distance / 2)
-#                     similarity_percent = round(similarity * 100)
-                    
-#                     image_url = f"{request.base_url}images/{filename}"
-#                     response_items.append({
-#                         "image_id": result_id,
-#                         "image_url": image_url,
-#                         "explanation": explanation_text,
-#                         "score": similarity_percent
-#                     })
-            
-#             # Final Step
-#             final_data = {
-#                 "step": "Done!", 
-#                 "progress": 100, 
-#                 "results": response_items
-#             }
-#             yield format_sse(final_data)
-
-#         except Exception as e:
-#             print(f"Error during stream: {e}")
-#             error_data = {"error": "An error occurred during the search.", "progress": 100}
-#             yield format_sse(error_data)
-
-#     # We call the generator with the necessary arguments.
-#     return StreamingResponse(event_generator(q, clip, chroma, explainer), media_type="text/event-stream")
+def build_result_items(search_results: dict, query_index: int, base_url: str, explanation: str | None = "") -> list[dict]:
+    """Turns one query's slice of a vector-store result into response items (no explanation key when None)."""
+    response_items = []
+    thumbnails = get_thumbnail_service()
+    if search_results and search_results['ids'][query_index]:
+        for i, result_id in enumerate(search_results['ids'][query_index]):
+            meta = search_results['metadatas'][query_index][i]
+            distance = search_results['distances'][query_index][i]
+            similarity = max(0, 1 - distance / 2)
+            similarity_percent = round(similarity * 100)
+            item = {
+                "image_id": result_id,
+                **thumbnails.urls_for(meta['filename'], base_url),
+                **({"explanation": explanation} if explanation is not None else {}),
+                "score": similarity_percent
+            }
+            # Hybrid results are ordered by fused rank, not by `score` alone
+            if "fused_scores" in search_results:
+                item["fused_score"] = round(search_results['fused_scores'][query_index][i], 6)
+            response_items.append(item)
+    return response_items
+
+def get_search_filters(
+    orientation: Optional[Orientation] = None,
+    color: List[Color] = Query([]),
+    min_width: Optional[int] = Query(None, ge=1),
+    min_height: Optional[int] = Query(None, ge=1),
+    taken_after: Optional[int] = None,
+    taken_before: Optional[int] = None
+) -> SearchFilters:
+    """Attribute filters from the query string; `color` may be repeated to match any of several."""
+    return SearchFilters(
+        orientation=orientation, color=color, min_width=min_width, min_height=min_height,
+        taken_after=taken_after, taken_before=taken_before
+    )
+
+def check_page(offset: int, limit: int):
+    if offset + limit > settings.SEARCH_MAX_RESULTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"offset + limit may not exceed {settings.SEARCH_MAX_RESULTS}."
+        )
+
+async def match_filters(attributes: AttributeIndexService, filters: SearchFilters, timer: RequestTimer):
+    """Evaluates the filters against the attribute index; None when there are none."""
+    if filters.is_empty():
+        return None
+    try:
+        with timer.stage("filter"):
+            return await timer.run_in_executor(get_search_executor(), attributes.match, filters)
+    except AttributeIndexUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def results_cache_key(key, filters: SearchFilters, match):
+    """Result lists are cached per query, filter set and attribute index build."""
+    return key if match is None else (key, filters.cache_key(), match.version)
+
+async def run_vector_search(store: VectorStore, query_embedding, top_k: int, match, timer: RequestTimer) -> dict:
+    """Top-k search, restricted to the filter's matches when there is one."""
+    with timer.stage("ann_search"):
+        search_results, strategy = await timer.run_in_executor(
+            get_search_executor(),
+            store.search_filtered,
+            query_embedding, top_k, match, ["metadatas", "distances"]
+        )
+    if match is not None:
+        FILTERED_SEARCHES.inc(strategy=strategy)
+    return search_results
+
+async def run_hybrid_search(store: VectorStore, keyword_task: asyncio.Future, cancel: threading.Event,
+                            query_embedding, top_k: int, match, timer: RequestTimer) -> tuple[dict, bool]:
+    """
+    Fuses the keyword hits (already being fetched by `keyword_task`) with ANN hits
+    by reciprocal rank, then reranks the fused head with exact cosine.
+
+    What runs after the ANN results arrive is bounded by HYBRID_LATENCY_BUDGET_MS:
+    a keyword query still running past it is cancelled, and the rerank is skipped
+    when no budget is left. Those requests get the ANN results, uncached.
+    Returns (results, cacheable).
+    """
+    ann_results = await run_vector_search(store, query_embedding, max(settings.HYBRID_CANDIDATES, top_k), match, timer)
+    ann_only = {field: [ann_results[field][0][:top_k]] for field in ("ids", "metadatas", "distances")}
+    budget = settings.HYBRID_LATENCY_BUDGET_MS / 1000
+    started = time.perf_counter()
+    try:
+        with timer.stage("keyword_wait"):
+            keyword_hits = await asyncio.wait_for(asyncio.shield(keyword_task), timeout=budget)
+    except asyncio.TimeoutError:
+        cancel.set()
+        HYBRID_SEARCHES.inc(outcome="keyword_timeout")
+        return ann_only, False
+    except Exception as e:
+        print(f"Keyword search failed: {e}")
+        HYBRID_SEARCHES.inc(outcome="keyword_error")
+        return ann_only, False
+
+    if match is not None:
+        keyword_hits = [hit for hit in keyword_hits if match.contains(hit[0])]
+    if not keyword_hits:
+        HYBRID_SEARCHES.inc(outcome="ann_only")
+        return ann_only, True
+    if time.perf_counter() - started >= budget:
+        HYBRID_SEARCHES.inc(outcome="rerank_skipped")
+        return ann_only, False
+
+    keyword_ids = [id_ for id_, _, _ in keyword_hits]
+    fused = reciprocal_rank_fusion([ann_results["ids"][0], keyword_ids])
+    with timer.stage("rerank"):
+        search_results = await timer.run_in_executor(
+            get_search_executor(),
+            rerank,
+            store, query_embedding, fused[:max(settings.HYBRID_RERANK_TOP_N, top_k)], keyword_ids, top_k
+        )
+    HYBRID_SEARCHES.inc(outcome="fused")
+    return search_results, True
+
+def page_results(search_results: dict, offset: int, limit: int) -> tuple[dict, Optional[int]]:
+    """
+    Slices one page out of the first offset + limit + 1 results; the extra hit
+    only tells whether a next page exists, whose offset is returned as well.
+    """
+    page = {field: [search_results[field][0][offset:offset + limit]]
+            for field in ("ids", "metadatas", "distances", "fused_scores") if field in search_results}
+    end = offset + limit
+    has_more = len(search_results["ids"][0]) > end and end < settings.SEARCH_MAX_RESULTS
+    return page, end if has_more else None
 
 
 @router.get("/search/stream")
 async def stream_search_images(
     q: str,
     request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(5, ge=1, le=100),
+    protocol: int = Query(1, ge=1, le=2),
+    filters: SearchFilters = Depends(get_search_filters),
     clip: CLIPService = Depends(get_clip_service),
-    chroma: ChromaDBService = Depends(get_chromadb_service),
-    explainer: ExplanationService = Depends(get_explanation_service)
+    store: VectorStore = Depends(get_vector_store),
+    explainer: ExplanationService = Depends(get_explanation_service),
+    cache: SearchCacheService = Depends(get_search_cache_service),
+    attributes: AttributeIndexService = Depends(get_attribute_index_service),
+    keywords: KeywordIndexService = Depends(get_keyword_index_service)
 ):
-    async def event_generator():
-        loop = asyncio.get_running_loop()
+    """
+    Streams search progress, results and the explanation as Server-Sent Events.
+
+    `offset`/`limit` select a page of the ranked results; attribute filters
+    (orientation, color, min_width, min_height, taken_after, taken_before)
+    restrict them using the precomputed attribute index. When a keyword index
+    is built, its BM25 hits are fused with the vector hits (hybrid retrieval).
+
+    `protocol=2` selects the compact stream: results are sent once, with URLs
+    relative to a `base_url` field and no per-item explanation; the explanation
+    arrives only as `explanation_delta` events (the final event carries it only
+    when nothing was streamed); and the stream is gzip/brotli-compressed when
+    the client accepts it. In both protocols, work still pending when the
+    client disconnects is cancelled.
+    """
+    async def run_search(events: asyncio.Queue, timer: RequestTimer):
+        """Embeds the query, searches the collection and publishes the result items."""
+        cache_key = normalize_query(q)
+        keyword_version = keywords.version() if settings.HYBRID_SEARCH_ENABLED else None
+        results_key = results_cache_key(cache_key, filters, match)
+        if keyword_version is not None:
+            results_key = (results_key, "hybrid", keyword_version)
+        top_k = offset + limit + 1 # One extra hit tells whether there is a next page
+
+        # Step 1: Embed text (skipped entirely when the result list is cached)
+        await events.put({"step": "Analyzing your query...", "progress": 25})
+        with timer.stage("cache_lookup"):
+            search_results = cache.get_results(results_key, top_k)
+            if search_results is None:
+                query_embedding = cache.get_embedding(cache_key)
+
+        # The keyword lookup only needs the text, so it runs alongside encoding and ANN
+        keyword_task, cancel_keywords = None, threading.Event()
+        if search_results is None and keyword_version is not None:
+            keyword_task = asyncio.ensure_future(timer.run_in_executor(
+                get_search_executor(),
+                keywords.search,
+                cache_key, max(settings.HYBRID_CANDIDATES, top_k), cancel_keywords
+            ))
+            # Failures are handled where the task is awaited; this only silences abandoned ones
+            keyword_task.add_done_callback(lambda task: task.cancelled() or task.exception())
 
         try:
-            # Step 1: Embed text
-            yield format_sse({"step": "Analyzing your query...", "progress": 25})
-            query_embedding = await loop.run_in_executor(None, clip.encode_text, q)
+            if search_results is None and query_embedding is None:
+                with timer.stage("encode"):
+                    query_embedding = await clip.encode_text_batched(cache_key)
+                cache.put_embedding(cache_key, query_embedding)
 
             # Step 2: Vector DB search
-            yield format_sse({"step": "Searching our visual library...", "progress": 50})
-            search_results = await loop.run_in_executor(
-                None,
-                chroma.search,
-                query_embedding, 5, ["metadatas", "distances"]
-            )
-
-            # Step 3: Explanation
-            yield format_sse({"step": "Asking our AI for an explanation...", "progress": 75})
-            explanation_text = await loop.run_in_executor(
-                None, explainer.generate_explanation, q
-            )
-
-            # Step 4: Package response
-            yield format_sse({"step": "Finalizing results...", "progress": 95})
-            response_items = []
-            if search_results and search_results['ids'][0]:
-                for i, result_id in enumerate(search_results['ids'][0]):
-                    meta = search_results['metadatas'][0][i]
-                    distance = search_results['distances'][0][i]
-                    similarity = max(0, 1 - distance / 2)
-                    similarity_percent = round(similarity * 100)
-                    response_items.append({
-                        "image_id": result_id,
-                        "image_url": f"{request.base_url}images/{meta['filename']}",
-                        "explanation": explanation_text,
-                        "score": similarity_percent
-                    })
+            await events.put({"step": "Searching our visual library...", "progress": 50})
+            if search_results is None:
+                cacheable = True
+                if keyword_task is not None:
+                    search_results, cacheable = await run_hybrid_search(
+                        store, keyword_task, cancel_keywords, query_embedding, top_k, match, timer
+                    )
+                else:
+                    search_results = await run_vector_search(store, query_embedding, top_k, match, timer)
+                if cacheable:
+                    cache.put_results(results_key, top_k, search_results)
+        finally:
+            # Stops a keyword query left running by an error or a disconnect
+            cancel_keywords.set()
+            if keyword_task is not None:
+                keyword_task.cancel()
 
+        # Step 3: Package results; they go out without waiting for the explanation
+        with timer.stage("serialize"):
+            page, next_offset = page_results(search_results, offset, limit)
+            if protocol == 1:
+                response_items = build_result_items(page, 0, str(request.base_url))
+            else:
+                response_items = build_result_items(page, 0, "", explanation=None)
+        results_event = {
+            "step": "Asking our AI for an explanation...",
+            "progress": 75,
+            "results": response_items,
+            "offset": offset,
+            "next_offset": next_offset
+        }
+        if protocol != 1:
+            results_event["base_url"] = str(request.base_url)
+        await events.put(results_event)
+        return response_items, next_offset
+
+    async def run_explanation(events: asyncio.Queue, timer: RequestTimer):
+        """Streams explanation tokens as they are generated."""
+        tokens = []
+        with timer.stage("explanation"):
+            async for token in explainer.stream_explanation(q):
+                if not tokens:
+                    timer.record("explanation_first_token", time.perf_counter() - timer.started)
+                tokens.append(token)
+                await events.put({"explanation_delta": token})
+        return "".join(tokens).strip()
+
+    # Admission control: refuse up front when the model or search stage is full;
+    # when only the LLM is saturated, answer without a generated explanation
+    # unless one is already cached.
+    if clip.is_saturated():
+        raise StageSaturated("clip-model")
+    if get_search_executor().saturated:
+        raise StageSaturated("vector-search")
+    degraded = explainer.is_saturated() and not await explainer.is_cached(q)
+    check_page(offset, limit)
+    # Only counted in flight once the stream starts: a response that is never
+    # iterated never runs the generator's finally, and would leak the gauge.
+    timer = RequestTimer("stream", in_flight=False)
+    try:
+        # Evaluated before the stream starts, so a missing index is a plain 503
+        match = await match_filters(attributes, filters, timer)
+    except BaseException:
+        timer.finish(query=q)
+        raise
+
+    async def event_generator():
+        timer.enter_in_flight()
+        events: asyncio.Queue = asyncio.Queue()
+        # Typeahead clients often abandon a query before the stream starts
+        if await request.is_disconnected():
+            STREAM_DISCONNECTS.inc()
+            timer.finish(query=q)
+            return
+        disconnected = asyncio.create_task(wait_for_disconnect(request))
+        search_task = asyncio.create_task(run_search(events, timer))
+        tasks = {search_task}
+        explanation_task = None
+        if not degraded:
+            # The explanation only needs the query text, so it starts at request
+            # arrival and runs alongside embedding and search.
+            explanation_task = asyncio.create_task(run_explanation(events, timer))
+            tasks.add(explanation_task)
+
+        getter = None
+        try:
+            pending = set(tasks)
+            while pending or not events.empty():
+                if not events.empty():
+                    timer.mark_first_byte()
+                    yield format_sse(events.get_nowait())
+                    continue
+                getter = asyncio.create_task(events.get())
+                done, _ = await asyncio.wait(pending | {getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    # Nobody is listening; the finally block cancels the LLM and search work
+                    STREAM_DISCONNECTS.inc()
+                    return
+                if getter in done:
+                    timer.mark_first_byte()
+                    yield format_sse(getter.result())
+                else:
+                    getter.cancel()
+                pending -= done
+                # Surface search failures immediately instead of waiting on the LLM
+                if search_task in done and search_task.exception() is not None:
+                    raise search_task.exception()
+
+            response_items, next_offset = search_task.result()
+            explanation_text = explanation_task.result() if explanation_task else explainer.reject(q)
+            if protocol == 1:
+                for item in response_items:
+                    item["explanation"] = explanation_text
+                done_event = {
+                    "step": "Done!",
+                    "progress": 100,
+                    "explanation": explanation_text,
+                    "results": response_items,
+                    "offset": offset,
+                    "next_offset": next_offset
+                }
+            else:
+                # Results and explanation tokens were already sent
+                done_event = {"step": "Done!", "progress": 100}
+                if explanation_task is None:
+                    done_event["explanation"] = explanation_text
+            if degraded:
+                done_event["degraded"] = True
+            yield format_sse(done_event)
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # The server cancels (or closes) the generator when the client goes away mid-send
+            STREAM_DISCONNECTS.inc()
+            raise
+        except StageSaturated as e:
+            print(f"Stream rejected: {e}")
             yield format_sse({
-                "step": "Done!",
-                "progress": 100,
-                "results": response_items
+                "error": "The service is busy, please try again shortly.",
+                "retry_after": settings.ADMISSION_RETRY_AFTER_SECONDS,
+                "progress": 100
             })
-
         except Exception as e:
             print(f"Stream Exception: {e}")
             yield format_sse({
                 "error": "An error occurred during the search.",
                 "progress": 100
             })
+        finally:
+            # Client disconnects and errors must not leave LLM or search work running
+            disconnected.cancel()
+            if getter is not None:
+                getter.cancel()
+            for task in tasks:
+                task.cancel()
+            timer.finish(query=q)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if protocol == 1:
+        return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None:
+        return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return StreamingResponse(compress_events(event_generator(), encoding), media_type="text/event-stream", headers=headers)
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_search_images(
+    body: BatchSearchRequest,
+    request: Request,
+    stream: bool = False,
+    clip: CLIPService = Depends(get_clip_service),
+    store: VectorStore = Depends(get_vector_store),
+    explainer: ExplanationService = Depends(get_explanation_service),
+    cache: SearchCacheService = Depends(get_search_cache_service)
+):
+    """
+    Searches for many queries in one call.
+
+    All uncached texts are embedded in one batched CLIP pass and searched with a
+    single multi-vector query. Responses come back in request order, either as
+    one JSON body or, with `?stream=true` or `Accept: application/x-ndjson`, as
+    NDJSON with one SearchResponse per line.
+    """
+    if len(body.queries) > settings.BATCH_SEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may contain at most {settings.BATCH_SEARCH_MAX_QUERIES} queries."
+        )
+    base_url = str(request.base_url)
+    keys = [normalize_query(query.text) for query in body.queries]
+    unique_keys = list(dict.fromkeys(keys))
+
+    # Explanations only need the text, so they start before retrieval
+    explanation_tasks = {}
+    if body.explain:
+        explanation_tasks = {key: asyncio.create_task(explainer.get_explanation(key)) for key in unique_keys}
+
+    timer = RequestTimer("batch")
+    try:
+        results_by_key = {}
+        with timer.stage("cache_lookup"):
+            for key in unique_keys:
+                cached = cache.get_results(key, body.top_k)
+                if cached is not None:
+                    results_by_key[key] = (cached, 0)
+
+        to_search = [key for key in unique_keys if key not in results_by_key]
+        if to_search:
+            embeddings = {key: cache.get_embedding(key) for key in to_search}
+            to_encode = [key for key, embedding in embeddings.items() if embedding is None]
+            if to_encode:
+                with timer.stage("encode"):
+                    encoded = await timer.run_in_executor(get_model_executor(), clip.encode_texts, to_encode)
+                for key, embedding in zip(to_encode, encoded):
+                    cache.put_embedding(key, embedding)
+                    embeddings[key] = embedding
+
+            with timer.stage("ann_search"):
+                search_results = await timer.run_in_executor(
+                    get_search_executor(),
+                    store.search_batch,
+                    [embeddings[key] for key in to_search], body.top_k, ["metadatas", "distances"]
+                )
+            for i, key in enumerate(to_search):
+                single = {field: [search_results[field][i]] for field in ("ids", "metadatas", "distances")}
+                cache.put_results(key, body.top_k, single)
+                results_by_key[key] = (search_results, i)
+    except Exception:
+        for task in explanation_tasks.values():
+            task.cancel()
+        timer.finish(queries=len(body.queries))
+        raise
+
+    async def build_response(query: SearchQuery, key: str) -> SearchResponse:
+        explanation = await explanation_tasks[key] if key in explanation_tasks else ""
+        search_results, index = results_by_key[key]
+        items = build_result_items(search_results, index, base_url, explanation)
+        return SearchResponse(query=query.text, results=[SearchResultItem(**item) for item in items])
+
+    if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+        async def ndjson_generator():
+            try:
+                for query, key in zip(body.queries, keys):
+                    response = await build_response(query, key)
+                    timer.mark_first_byte()
+                    yield response.model_dump_json() + "\n"
+            finally:
+                for task in explanation_tasks.values():
+                    task.cancel()
+                timer.finish(queries=len(body.queries))
+
+        return StreamingResponse(ndjson_generator(), media_type="application/x-ndjson")
+
+    try:
+        with timer.stage("serialize"):
+            responses = [await build_response(query, key) for query, key in zip(body.queries, keys)]
+        return BatchSearchResponse(responses=responses)
+    finally:
+        timer.finish(queries=len(body.queries))
+
+
+def exclude_id(search_results: dict, image_id: str, top_k: int) -> dict:
+    """Drops the query image itself from a single-query result and trims it to top_k."""
+    keep = [i for i, result_id in enumerate(search_results['ids'][0]) if result_id != image_id][:top_k]
+    return {field: [[search_results[field][0][i] for i in keep]] for field in ("ids", "metadatas", "distances")}
+
+
+@router.get("/search/similar/{image_id}", response_model=SearchResponse)
+async def search_similar_images(
+    image_id: str,
+    request: Request,
+    top_k: int = Query(5, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    filters: SearchFilters = Depends(get_search_filters),
+    store: VectorStore = Depends(get_vector_store),
+    cache: SearchCacheService = Depends(get_search_cache_service),
+    attributes: AttributeIndexService = Depends(get_attribute_index_service)
+):
+    """
+    "More like this": searches with an indexed image's stored vector.
+
+    The vector is read straight from the store, so this costs one lookup and one
+    ANN query with no model inference. `top_k` is the page size; `offset` and
+    the attribute filters work as in /search/stream.
+    """
+    check_page(offset, top_k)
+    timer = RequestTimer("similar")
+    try:
+        match = await match_filters(attributes, filters, timer)
+        results_key = results_cache_key(("similar", image_id), filters, match)
+        fetch_k = offset + top_k + 1 # One extra hit tells whether there is a next page
+        search_results = cache.get_results(results_key, fetch_k)
+        if search_results is None:
+            with timer.stage("vector_lookup"):
+                embeddings = await timer.run_in_executor(get_search_executor(), store.get_embeddings, [image_id])
+            if image_id not in embeddings:
+                raise HTTPException(status_code=404, detail=f"Image '{image_id}' is not indexed.")
+            # Ask for one extra hit, since the image itself is its own nearest neighbour
+            search_results = await run_vector_search(store, embeddings[image_id], fetch_k + 1, match, timer)
+            search_results = exclude_id(search_results, image_id, fetch_k)
+            cache.put_results(results_key, fetch_k, search_results)
+
+        page, next_offset = page_results(search_results, offset, top_k)
+        items = build_result_items(page, 0, str(request.base_url))
+        return SearchResponse(
+            results=[SearchResultItem(**item) for item in items], offset=offset, next_offset=next_offset
+        )
+    finally:
+        timer.finish(image_id=image_id)
+
+
+@router.post("/search/image", response_model=SearchResponse)
+async def search_by_image(
+    request: Request,
+    file: UploadFile = File(...),
+    top_k: int = Query(5, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    filters: SearchFilters = Depends(get_search_filters),
+    clip: CLIPService = Depends(get_clip_service),
+    store: VectorStore = Depends(get_vector_store),
+    cache: SearchCacheService = Depends(get_search_cache_service),
+    attributes: AttributeIndexService = Depends(get_attribute_index_service)
+):
+    """
+    Query-by-example with an uploaded image.
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    Decoding and resizing run in a process pool; embeddings and result lists are
+    cached by the SHA-256 of the uploaded bytes, so re-uploads skip the model.
+    `top_k` is the page size; `offset` and the attribute filters work as in
+    /search/stream.
+    """
+    check_page(offset, top_k)
+    data = await file.read(settings.MAX_UPLOAD_BYTES + 1)
+    if len(data) > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Uploads are limited to {settings.MAX_UPLOAD_BYTES} bytes.")
+    timer = RequestTimer("image")
+    content_hash = hashlib.sha256(data).hexdigest()
+
+    try:
+        match = await match_filters(attributes, filters, timer)
+        results_key = results_cache_key(("upload", content_hash), filters, match)
+        fetch_k = offset + top_k + 1 # One extra hit tells whether there is a next page
+        search_results = cache.get_results(results_key, fetch_k)
+        if search_results is None:
+            query_embedding = cache.get_image_embedding(content_hash)
+            if query_embedding is None:
+                try:
+                    # Process pool: the callable must stay picklable, so no executor_wait wrapper
+                    with timer.stage("decode"):
+                        image = await asyncio.get_running_loop().run_in_executor(
+                            get_decode_pool(), decode_and_resize, data, settings.CLIP_IMAGE_INPUT_SIZE
+                        )
+                except Exception as e:
+                    print(f"Could not decode uploaded image: {e}")
+                    raise HTTPException(status_code=400, detail="The uploaded file is not a valid image.")
+                with timer.stage("encode"):
+                    query_embedding = await timer.run_in_executor(get_model_executor(), clip.encode_image, image)
+                cache.put_image_embedding(content_hash, query_embedding)
+
+            search_results = await run_vector_search(store, query_embedding, fetch_k, match, timer)
+            cache.put_results(results_key, fetch_k, search_results)
+
+        page, next_offset = page_results(search_results, offset, top_k)
+        items = build_result_items(page, 0, str(request.base_url))
+        return SearchResponse(
+            results=[SearchResultItem(**item) for item in items], offset=offset, next_offset=next_offset
+        )
+    finally:
+        timer.finish(content_hash=content_hash)
+
+
+@router.get("/search/stats")
+async def search_stats(
+    clip: CLIPService = Depends(get_clip_service),
+    explainer: ExplanationService = Depends(get_explanation_service),
+    cache: SearchCacheService = Depends(get_search_cache_service),
+    attributes: AttributeIndexService = Depends(get_attribute_index_service)
+):
+    """Reports runtime metrics for the search pipeline."""
+    return {
+        "text_batcher": clip.get_batcher_stats(),
+        "executors": get_executor_stats(),
+        "cache": cache.get_stats(),
+        "attribute_index": attributes.get_stats(),
+        "explanations": explainer.get_stats()
+    }
@@ -12,13 +12,89 @@ class Settings(BaseSettings):
     CSV_PATH: str = os.path.join(DATA_DIR, "photos_url.csv")
     NUM_IMAGES_TO_DOWNLOAD: int | None = 500 # Set to None to download all
     IMAGE_TARGET_SIZE: tuple = (800, 800)
+    DOWNLOAD_CONCURRENCY: int = 32
+    DOWNLOAD_PER_HOST_RATE: float = 20.0 # Requests/second per host; 0 disables the limit
+    DOWNLOAD_MAX_RETRIES: int = 3
+    DOWNLOAD_MANIFEST_PATH: str = os.path.join(DATA_DIR, "download_manifest.jsonl")
+
+    # --- Thumbnails ---
+    # Content-addressed renditions written by scripts/generate_thumbnails.py
+    THUMBNAIL_DIR: str = "storage/thumbnails"
+    THUMBNAIL_SIZES: tuple = (160, 480, 960) # Longer side, in pixels
+    THUMBNAIL_RESULT_SIZE: int = 480 # Size `image_url` points at in search results
+    THUMBNAIL_FORMAT: str = "webp" # "webp" or "jpeg"
+    THUMBNAIL_QUALITY: int = 80
+    # Base URL thumbnails are linked from, e.g. a static server or CDN in front of
+    # THUMBNAIL_DIR (with a trailing slash); empty links them to this API's /thumbnails route
+    IMAGE_BASE_URL: str = ""
 
     # --- Model & Embedding Configuration ---
     CLIP_MODEL_NAME: str = 'clip-ViT-B-32'
+    # "torch" (sentence-transformers) or "onnx" (ONNX Runtime, see scripts/export_onnx.py)
+    CLIP_INFERENCE_BACKEND: str = "torch"
+    ONNX_MODEL_DIR: str = "storage/onnx/clip-ViT-B-32"
+    ONNX_USE_INT8: bool = False # Use the dynamically int8-quantized towers
+    ONNX_INTRA_OP_THREADS: int = 0 # 0 lets ONNX Runtime pick
+    # Micro-batching of concurrent text queries into one forward pass
+    CLIP_BATCH_MAX_SIZE: int = 32
+    CLIP_BATCH_MAX_WAIT_MS: float = 5.0
+    CLIP_ENCODE_BATCH_SIZE: int = 256 # Forward-pass size for bulk encoding (batch endpoint)
+    BATCH_SEARCH_MAX_QUERIES: int = 5000
+    # Query-by-example uploads
+    CLIP_IMAGE_INPUT_SIZE: int = 224
+    IMAGE_DECODE_WORKERS: int = 2
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
     
     # --- ChromaDB Configuration ---
     CHROMA_PERSIST_DIR: str = "storage/chromadb"
     CHROMA_COLLECTION_NAME: str = "visual_search"
+    # Bumped by ingestion whenever the collection changes
+    COLLECTION_EPOCH_PATH: str = "storage/collection_epoch"
+
+    # --- Vector Backend Configuration ---
+    # "chroma" (HNSW via ChromaDB) or "numpy" (memory-mapped exact/int8 search)
+    VECTOR_BACKEND: str = "chroma"
+    NUMPY_INDEX_DIR: str = "storage/numpy_index"
+    # float32 working set of one scan chunk (vector block + scores); every shard
+    # thread and concurrent search holds one, so keep it in the low megabytes
+    NUMPY_SCAN_CHUNK_BYTES: int = 8 * 1024 * 1024
+    NUMPY_RESCORE_FACTOR: int = 8 # int8 candidates per result re-scored in float16
+    # Row-range shards scanned in parallel threads and merged; the index files are
+    # mapped read-only, so all uvicorn workers (UVICORN_WORKERS) share one copy
+    NUMPY_INDEX_SHARDS: int = 1
+
+    # --- Attribute Filters & Pagination ---
+    # Bitmap indexes over image attributes, built by scripts/build_attribute_index.py
+    ATTRIBUTE_INDEX_DIR: str = "storage/attribute_index"
+    # Filters matching at most this many rows and at most this fraction of the collection
+    # are answered by exact search over just the matches; all others filter ANN results
+    FILTER_PREFILTER_MAX_ROWS: int = 20000
+    FILTER_PREFILTER_MAX_SELECTIVITY: float = 0.05
+    FILTER_PREFILTER_CHUNK_ROWS: int = 2048 # Vectors fetched per lookup during a pre-filter scan
+    FILTER_POSTFILTER_MAX_K: int = 2000 # Largest ANN over-fetch (before pre-filtering, if within the row cap)
+    SEARCH_MAX_RESULTS: int = 500 # Upper bound on offset + limit
+
+    # --- Hybrid Retrieval ---
+    # SQLite FTS5 (BM25) index of per-image text, built by scripts/build_keyword_index.py
+    KEYWORD_INDEX_PATH: str = "storage/keyword_index.sqlite3"
+    CSV_TEXT_COLUMNS: list[str] = ["photo_description", "ai_description"] # Indexed when present in CSV_PATH
+    # Optional generated captions (build_keyword_index.py --captions), cached per image
+    CAPTION_CACHE_PATH: str = "storage/captions.sqlite3"
+    CAPTION_PROMPT: str = (
+        "Describe this photo in one sentence. Name the main objects, the setting, "
+        "and any visible text, logos or brands."
+    )
+    HYBRID_SEARCH_ENABLED: bool = True # /search/stream fuses keyword hits whenever the index exists
+    HYBRID_CANDIDATES: int = 50 # Hits taken from each retriever before fusion
+    HYBRID_RRF_K: int = 60 # Reciprocal-rank fusion constant
+    HYBRID_RERANK_TOP_N: int = 50 # Fused candidates rescored with exact cosine
+    # Latency hybrid retrieval may add once ANN results are in; past it, ANN results are returned as is
+    HYBRID_LATENCY_BUDGET_MS: float = 50.0
+
+    # --- Query Cache Configuration ---
+    CACHE_TTL_SECONDS: float = 3600.0
+    EMBEDDING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
 
     # --- Ollama Configuration ---
     OLLAMA_BASE_URL: str = "http://localhost:11434"
@@ -31,6 +107,32 @@ class Settings(BaseSettings):
         "Example: 'This result may be relevant as it features a dog playing fetch on a sunny beach.'"
     )
     
+    # Persistent cache of generated explanations (keyed by model + prompt hash)
+    EXPLANATION_CACHE_PATH: str = "storage/explanations.sqlite3"
+    # Admission control for Ollama: concurrent generations and how many may wait
+    OLLAMA_MAX_CONCURRENCY: int = 2
+    OLLAMA_MAX_QUEUE: int = 8
+    EXPLANATION_BUSY_FALLBACK: str = "This result was selected because it closely matches your search for '{query}'."
+    
+    # --- Stage Executors & Admission Control ---
+    # CLIP inference runs on its own pool: few workers, each using TORCH_INTRA_OP_THREADS
+    MODEL_EXECUTOR_WORKERS: int = 1
+    MODEL_EXECUTOR_MAX_QUEUE: int = 16
+    TORCH_INTRA_OP_THREADS: int = 0 # 0 keeps torch's default (one per physical core)
+    CLIP_BATCH_MAX_PENDING: int = 256 # Text queries waiting in the micro-batcher
+    SEARCH_EXECUTOR_WORKERS: int = 4
+    SEARCH_EXECUTOR_MAX_QUEUE: int = 64
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1 # Retry-After sent with 503s from saturated stages
+
+    # --- Search Streaming ---
+    # Encodings offered to protocol-2 streams, in order of preference; empty disables compression
+    SSE_COMPRESSION_ENCODINGS: list[str] = ["br", "gzip"]
+    SSE_COMPRESSION_LEVEL: int = 5 # gzip 1-9 / brotli 0-11
+    SSE_DISCONNECT_POLL_SECONDS: float = 0.25 # How often a stream checks whether its client went away
+
+    # --- Observability ---
+    SLOW_REQUEST_SECONDS: float = 2.0 # Requests slower than this get a structured log line
+
     # --- CORS Configuration ---
     ALLOWED_ORIGINS: list[str] = ["http://localhost:5173", "http://localhost:3000"]
 
@@ -0,0 +1,264 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Recording is a lock plus a few integer/float updates (well under a microsecond
+or two per observation), so timers can wrap every stage of the hot path.
+Counters that services already keep (cache, batcher, explanation stats) are
+exported through collectors that only run at scrape time.
+"""
+import asyncio
+import functools
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from app.core.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value) -> list[str]:
+        return [f"{self.name}{_format_labels(key)} {value}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key, value) -> list[str]:
+        bucket_counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def register_collector(collector):
+    """
+    Registers a scrape-time callback returning (name, type, help, value, labels)
+    tuples; used to export counters that services already maintain.
+    """
+    _collectors.append(collector)
+
+
+def render_prometheus() -> str:
+    """Renders every metric and collector in the Prometheus text format (0.0.4)."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    seen = set()
+    for collector in _collectors:
+        try:
+            samples = list(collector())
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+            continue
+        for name, type_name, documentation, value, labels in samples:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+            lines.append(f"{name}{_format_labels(tuple(labels.items()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Search pipeline metrics ---
+
+STAGE_SECONDS = Histogram(
+    "search_stage_seconds", "Latency of each search pipeline stage.", ("route", "stage")
+)
+REQUEST_SECONDS = Histogram(
+    "search_request_seconds", "End-to-end latency of search requests.", ("route",)
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "search_requests_in_flight", "Search requests currently being processed.", ("route",)
+)
+SERVICE_CALL_SECONDS = Histogram(
+    "service_call_seconds", "Latency of service method calls.", ("method",)
+)
+CLIP_BATCH_SIZE = Histogram(
+    "clip_text_batch_size", "Number of queries per batched CLIP text forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+CLIP_BATCH_QUEUE_WAIT_SECONDS = Histogram(
+    "clip_text_batch_queue_wait_seconds", "Time a query waited in the micro-batching queue."
+)
+HYBRID_SEARCHES = Counter(
+    "search_hybrid_total", "Hybrid (keyword + vector) searches by outcome.", ("outcome",)
+)
+FILTERED_SEARCHES = Counter(
+    "search_filtered_total", "Attribute-filtered searches by execution strategy.", ("strategy",)
+)
+STREAM_DISCONNECTS = Counter(
+    "search_stream_disconnects_total", "Search streams abandoned by the client before the final event."
+)
+
+
+def timed(method: str):
+    """Decorator recording a service method's latency in service_call_seconds."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    SERVICE_CALL_SECONDS.observe(time.perf_counter() - started, method=method)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                SERVICE_CALL_SECONDS.observe(time.perf_counter() - started, method=method)
+        return wrapper
+    return decorator
+
+
+class RequestTimer:
+    """
+    Per-request stage timings.
+
+    Each stage is recorded in search_stage_seconds as it completes and kept on
+    the timer, so a slow request can be logged with its full breakdown.
+    """
+
+    def __init__(self, route: str, in_flight: bool = True):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self._first_byte = False
+        self._in_flight = False
+        if in_flight:
+            self.enter_in_flight()
+
+    def enter_in_flight(self):
+        """Counts the request in search_requests_in_flight until finish()."""
+        if not self._in_flight:
+            self._in_flight = True
+            REQUESTS_IN_FLIGHT.inc(route=self.route)
+
+    def record(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, route=self.route, stage=stage)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    async def run_in_executor(self, executor, fn, *args):
+        """run_in_executor that also records how long the call queued for a worker."""
+        submitted = time.perf_counter()
+
+        def call():
+            self.record("executor_wait", time.perf_counter() - submitted)
+            return fn(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    def mark_first_byte(self):
+        if not self._first_byte:
+            self._first_byte = True
+            self.record("time_to_first_byte", time.perf_counter() - self.started)
+
+    def finish(self, **context):
+        total = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe(total, route=self.route)
+        if self._in_flight:
+            self._in_flight = False
+            REQUESTS_IN_FLIGHT.dec(route=self.route)
+        if total >= settings.SLOW_REQUEST_SECONDS:
+            print(json.dumps({
+                "event": "slow_request",
+                "route": self.route,
+                "total_seconds": round(total, 4),
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                **context,
+            }))
@@ -1,17 +1,50 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
 
 # --- API Request Models ---
 
+Orientation = Literal["landscape", "portrait", "square"]
+Color = Literal["red", "orange", "yellow", "green", "cyan", "blue", "purple", "pink", "black", "gray", "white"]
+
+class SearchFilters(BaseModel):
+    """Attribute filters; all given conditions must hold, `color` matches any listed bucket."""
+    orientation: Optional[Orientation] = None
+    color: List[Color] = []
+    min_width: Optional[int] = Field(None, ge=1)
+    min_height: Optional[int] = Field(None, ge=1)
+    taken_after: Optional[int] = None # Capture year, inclusive
+    taken_before: Optional[int] = None # Capture year, inclusive
+
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_defaults=True)
+
+    def cache_key(self) -> tuple:
+        return tuple(sorted((name, tuple(sorted(value)) if isinstance(value, list) else value)
+                            for name, value in self.model_dump(exclude_defaults=True).items()))
+
 class SearchQuery(BaseModel):
     text: str
 
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery] = Field(..., min_length=1)
+    top_k: int = Field(5, ge=1, le=100)
+    explain: bool = False
+
 # --- API Response Models ---
 
 class SearchResultItem(BaseModel):
     image_id: str
     image_url: str
-    explanation: str
+    thumbnail_urls: Dict[str, str] = {} # Thumbnail size (px) -> URL, for srcset
+    explanation: str = ""
+    score: Optional[int] = None
+    fused_score: Optional[float] = None # Hybrid search only: the rank-fusion score results are ordered by
 
 class SearchResponse(BaseModel):
-    results: List[SearchResultItem]
\ No newline at end of file
+    query: Optional[str] = None
+    results: List[SearchResultItem]
+    offset: int = 0
+    next_offset: Optional[int] = None # Offset of the next page, if there may be one
+
+class BatchSearchResponse(BaseModel):
+    responses: List[SearchResponse]
@@ -0,0 +1,97 @@
+"""
+Server-Sent Events helpers: event encoding, per-event compression and
+client-disconnect detection for the streaming search route.
+"""
+import asyncio
+import json
+import zlib
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError: # Falls back to the (slower) stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError: # Without brotli, streams are only offered gzip
+    brotli = None
+
+
+def dumps(data: dict) -> bytes:
+    """Compact JSON encoding of one event payload."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def format_sse(data: dict) -> bytes:
+    """Formats a dictionary as a Server-Sent Event."""
+    return b"data: " + dumps(data) + b"\n\n"
+
+
+class GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": GzipStream}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliStream
+
+
+def negotiate_encoding(accept_encoding: str, preferred=settings.SSE_COMPRESSION_ENCODINGS) -> str | None:
+    """Picks the first of `preferred` the client accepts (q > 0) and this server supports."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in preferred:
+        if encoding in COMPRESSORS and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+async def compress_events(events, encoding: str, level: int = settings.SSE_COMPRESSION_LEVEL):
+    """
+    Compresses an event stream, flushing after every event so each one reaches
+    the client (and EventSource) as soon as it is produced.
+    """
+    compressor = COMPRESSORS[encoding](level)
+    try:
+        async for event in events:
+            yield compressor.compress(event)
+        yield compressor.finish()
+    finally:
+        await events.aclose()
+
+
+async def wait_for_disconnect(request, interval: float = settings.SSE_DISCONNECT_POLL_SECONDS):
+    """Returns once the client has gone away."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
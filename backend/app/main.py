@@ -1,28 +1,83 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
+from app.core.metrics import render_prometheus
 from app.api.v1 import search
-from app.services import clip_service, chromadb_service, explanation_service
+from app.api import thumbnails
+from app.services import clip_service, vector_store, explanation_service, cache_service
+from app.services.executors import StageSaturated
+
+# Startup progress, reported by /readyz
+startup_state = {"ready": False, "error": None, "timings": {}}
+
+def _timed(name, fn):
+    """Runs one startup step and records how long it took."""
+    started = time.perf_counter()
+    result = fn()
+    startup_state["timings"][name] = round(time.perf_counter() - started, 3)
+    return result
+
+async def load_services():
+    """
+    Loads models and indexes concurrently, then warms them up.
+
+    The model, the vector index and the Ollama clients are independent, so they
+    are initialized in parallel threads; warmup runs once all of them exist.
+    """
+    print("--- Backend App Startup ---")
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        clip, store, _, _ = await asyncio.gather(
+            loop.run_in_executor(None, _timed, "clip_model", clip_service.get_clip_service),
+            loop.run_in_executor(None, _timed, "vector_index", vector_store.get_vector_store),
+            loop.run_in_executor(None, _timed, "explanation_client", explanation_service.get_explanation_service),
+            loop.run_in_executor(None, _timed, "search_cache", cache_service.get_search_cache_service),
+        )
+        embedding = await loop.run_in_executor(None, _timed, "clip_warmup", clip.warmup)
+        await loop.run_in_executor(None, _timed, "vector_warmup", lambda: store.warmup(embedding))
+    except Exception as e:
+        startup_state["error"] = str(e)
+        print(f"--- Startup failed: {e} ---")
+        return
+    startup_state["timings"]["total"] = round(time.perf_counter() - started, 3)
+    startup_state["ready"] = True
+    breakdown = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in startup_state["timings"].items())
+    print(f"--- All services initialized ({breakdown}) ---")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Loading runs in the background so /healthz answers immediately;
+    # search routes return 503 until /readyz reports ready.
+    loader = asyncio.create_task(load_services())
+    yield
+    loader.cancel()
+
+async def require_ready():
+    if not startup_state["ready"]:
+        raise HTTPException(status_code=503, detail="Service is starting up.", headers={"Retry-After": "5"})
 
 # Application an_instance
 app = FastAPI(
     title=settings.APP_NAME,
-    # Lifespan events are recommended over on_event for modern FastAPI
+    lifespan=lifespan,
 )
 
-# --- Event Handlers ---
-# This dictionary-based approach is for older FastAPI versions.
-# For newer versions (0.93.0+), use lifespan context manager.
-# This ensures models are loaded on startup.
-@app.on_event("startup")
-async def startup_event():
-    print("--- Backend App Startup ---")
-    # This will trigger the instantiation of our singleton services
-    clip_service.get_clip_service()
-    chromadb_service.get_chromadb_service()
-    explanation_service.get_explanation_service()
-    print("--- All services initialized ---")
+# --- Admission Control ---
+@app.exception_handler(StageSaturated)
+async def stage_saturated_handler(request: Request, exc: StageSaturated):
+    """Sheds load from a saturated stage instead of letting its queue grow without bound."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The service is busy, please try again shortly.", "stage": exc.stage},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
 
 # --- Middleware ---
 app.add_middleware(
@@ -36,11 +91,35 @@ app.add_middleware(
 # --- Static Files ---
 # Mount the 'data/images' directory to be served at '/images'
 app.mount("/images", StaticFiles(directory="data/images"), name="images")
+# Content-addressed thumbnails (not gated by readiness, like the originals)
+app.include_router(thumbnails.router)
 
 # --- API Routers ---
-app.include_router(search.router, prefix=settings.API_V1_STR)
+app.include_router(search.router, prefix=settings.API_V1_STR, dependencies=[Depends(require_ready)])
 
 # --- Root Endpoint ---
 @app.get("/", tags=["Root"])
 async def read_root():
-    return {"message": f"Welcome to the {settings.APP_NAME}"}
\ No newline at end of file
+    return {"message": f"Welcome to the {settings.APP_NAME}"}
+
+# --- Health Probes ---
+@app.get("/healthz", tags=["Health"])
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Health"])
+async def readyz():
+    """Readiness: models are loaded and warmed up."""
+    status_code = 200 if startup_state["ready"] else 503
+    status = "ready" if startup_state["ready"] else ("failed" if startup_state["error"] else "starting")
+    return JSONResponse(
+        status_code=status_code,
+        content={"status": status, "error": startup_state["error"], "startup_seconds": startup_state["timings"]}
+    )
+
+# --- Metrics ---
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint; available while the models are still loading."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
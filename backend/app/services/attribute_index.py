@@ -0,0 +1,183 @@
+"""
+Bitmap indexes over image attributes, for filtered search.
+
+`build_attribute_index` turns the attribute metadata written at ingestion into
+a directory of small NumPy files: one packed bitmap (one bit per row) for every
+orientation and color value, and integer columns for the range filters.
+Evaluating a filter is a few vectorized ANDs/ORs over the whole collection,
+and tells the search how selective the filter is before any vector is read.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from app.core.config import settings
+from app.services.image_attributes import COLORS, ORIENTATIONS
+from app.services.numpy_index import MappedIds, save_id_arrays
+
+MANIFEST_FILE = "manifest.json"
+BITMAPS_FILE = "bitmaps.npy" # (bitmaps, ceil(rows / 8)) uint8, one packed row per attribute value
+CATEGORICAL_ATTRIBUTES = {"orientation": ORIENTATIONS, "color": COLORS}
+NUMERIC_ATTRIBUTES = ("width", "height", "taken_year") # 0 means unknown
+BITMAP_KEYS = [f"{name}={value}" for name, values in CATEGORICAL_ATTRIBUTES.items() for value in values]
+
+
+class AttributeIndexUnavailable(RuntimeError):
+    """Raised when a filtered search is requested but no attribute index has been built."""
+
+
+def build_attribute_index(index_dir: str, ids: list[str], metadatas: list[dict]) -> int:
+    """
+    Writes the bitmaps, numeric columns and id arrays for the given rows.
+
+    Rows without attributes (ingested before they were extracted) match no
+    filter. Returns the number of rows that have attributes.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    count = len(ids)
+    positions = {key: i for i, key in enumerate(BITMAP_KEYS)}
+    bits = np.zeros((len(BITMAP_KEYS), count), dtype=bool)
+    columns = {name: np.zeros(count, dtype=np.int32) for name in NUMERIC_ATTRIBUTES}
+    with_attributes = 0
+    for row, metadata in enumerate(metadatas):
+        if "orientation" not in metadata:
+            continue
+        with_attributes += 1
+        for name in CATEGORICAL_ATTRIBUTES:
+            position = positions.get(f"{name}={metadata.get(name)}")
+            if position is not None:
+                bits[position, row] = True
+        for name in NUMERIC_ATTRIBUTES:
+            columns[name][row] = int(metadata.get(name) or 0)
+
+    np.save(os.path.join(index_dir, BITMAPS_FILE), np.packbits(bits, axis=1))
+    for name, column in columns.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), column)
+    save_id_arrays(index_dir, ids)
+    manifest = {
+        "count": count,
+        "with_attributes": with_attributes,
+        "bitmaps": BITMAP_KEYS,
+        "columns": list(NUMERIC_ATTRIBUTES),
+        "created_at": time.time(),
+    }
+    # The manifest goes last; its presence marks a complete index
+    with open(os.path.join(index_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return with_attributes
+
+
+class AttributeMatch:
+    """The rows matching a filter, with the membership test used for post-filtering."""
+
+    def __init__(self, index: "AttributeIndex", mask: np.ndarray):
+        self._index = index
+        self.version = index.manifest["created_at"] # Distinguishes rebuilds in cache keys
+        self.mask = mask
+        self.rows = np.flatnonzero(mask)
+        self.count = len(self.rows)
+        self.selectivity = self.count / max(1, len(mask))
+
+    def ids(self) -> list[str]:
+        return [self._index.ids.id_at(row) for row in self.rows]
+
+    def contains(self, id_: str) -> bool:
+        row = self._index.ids.row_of(id_)
+        return row is not None and bool(self.mask[row])
+
+
+class AttributeIndex:
+    """A built attribute index, memory-mapped read-only."""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.count = self.manifest["count"]
+        self.ids = MappedIds(index_dir)
+        bitmaps = np.load(os.path.join(index_dir, BITMAPS_FILE), mmap_mode="r")
+        self._bitmaps = {key: bitmaps[i] for i, key in enumerate(self.manifest["bitmaps"])}
+        self._columns = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r") for name in self.manifest["columns"]
+        }
+
+    def _bitmap(self, name: str, values) -> np.ndarray:
+        """OR of the bitmaps for the given values of one attribute."""
+        packed = np.zeros((self.count + 7) // 8, dtype=np.uint8)
+        for value in values:
+            packed |= self._bitmaps[f"{name}={value}"]
+        return packed
+
+    def match(self, filters) -> AttributeMatch:
+        """Evaluates a SearchFilters against every row."""
+        packed = np.full((self.count + 7) // 8, 0xFF, dtype=np.uint8)
+        if filters.orientation:
+            packed &= self._bitmap("orientation", [filters.orientation])
+        if filters.color:
+            packed &= self._bitmap("color", filters.color)
+        mask = np.unpackbits(packed, count=self.count).astype(bool)
+
+        # Range conditions run on the columns; unknown values (0) never match
+        width, height, year = self._columns["width"], self._columns["height"], self._columns["taken_year"]
+        if filters.min_width:
+            mask &= width >= filters.min_width
+        if filters.min_height:
+            mask &= height >= filters.min_height
+        if filters.taken_after is not None or filters.taken_before is not None:
+            mask &= year > 0
+            if filters.taken_after is not None:
+                mask &= year >= filters.taken_after
+            if filters.taken_before is not None:
+                mask &= year <= filters.taken_before
+        return AttributeMatch(self, mask)
+
+
+class AttributeIndexService:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AttributeIndexService, cls).__new__(cls)
+            cls._lock = threading.Lock()
+            cls._index = None
+            cls._manifest_mtime = None
+        return cls._instance
+
+    def get_index(self) -> AttributeIndex | None:
+        """The current index, re-opened when a rebuild replaces it; None if none is built."""
+        # A stat() per call is cheap; the index is only re-opened when the manifest changes.
+        try:
+            mtime = os.stat(os.path.join(settings.ATTRIBUTE_INDEX_DIR, MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                if mtime != self._manifest_mtime:
+                    self._index = AttributeIndex(settings.ATTRIBUTE_INDEX_DIR) if mtime is not None else None
+                    self._manifest_mtime = mtime
+                    if self._index is not None:
+                        print(f"Attribute index loaded: {self._index.count} rows.")
+        return self._index
+
+    def match(self, filters) -> AttributeMatch | None:
+        """Rows matching `filters`, or None when no filter is set."""
+        if filters is None or filters.is_empty():
+            return None
+        index = self.get_index()
+        if index is None:
+            raise AttributeIndexUnavailable(
+                "Filtering needs the attribute index. Build it with: PYTHONPATH=. python scripts/build_attribute_index.py"
+            )
+        return index.match(filters)
+
+    def get_stats(self) -> dict:
+        index = self.get_index()
+        if index is None:
+            return {"built": False}
+        return {"built": True, "rows": index.count, "with_attributes": index.manifest["with_attributes"]}
+
+
+def get_attribute_index_service():
+    """Dependency injector for FastAPI."""
+    return AttributeIndexService()
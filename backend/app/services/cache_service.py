@@ -0,0 +1,185 @@
+import os
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.metrics import register_collector
+
+
+def normalize_query(text: str) -> str:
+    """Canonical cache key for a query: NFKC, lower-cased, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def approximate_size(value) -> int:
+    """Rough in-memory footprint of a cached value, in bytes."""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# --- Collection epoch ---
+# Ingestion bumps this counter every time it changes the collection, so running
+# API workers can tell that their cached result lists are stale.
+
+def read_collection_epoch(path: str = settings.COLLECTION_EPOCH_PATH) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_collection_epoch(path: str = settings.COLLECTION_EPOCH_PATH) -> int:
+    """Increments the collection epoch on disk and returns the new value."""
+    epoch = read_collection_epoch(path) + 1
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(epoch))
+    os.replace(tmp_path, path)
+    return epoch
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by approximate memory use, with per-entry TTL."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self._max_bytes = max_bytes
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[object, tuple[object, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = approximate_size(value)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, time.monotonic() + self._ttl, size)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SearchCacheService:
+    _instance = None
+    _embeddings = None
+    _results = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(SearchCacheService, cls).__new__(cls)
+            cls._embeddings = LRUCache(settings.EMBEDDING_CACHE_MAX_BYTES, settings.CACHE_TTL_SECONDS)
+            cls._results = LRUCache(settings.RESULT_CACHE_MAX_BYTES, settings.CACHE_TTL_SECONDS)
+            cls._epoch_lock = threading.Lock()
+            cls._epoch_mtime = None
+            cls._epoch = read_collection_epoch()
+            register_collector(cls._instance._collect_metrics)
+            print(f"Search cache initialized at collection epoch {cls._epoch}.")
+        return cls._instance
+
+    def _current_epoch(self) -> int:
+        # A stat() per lookup is cheap; the file is only re-read when it changes.
+        try:
+            mtime = os.stat(settings.COLLECTION_EPOCH_PATH).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._epoch_mtime:
+            with self._epoch_lock:
+                if mtime != self._epoch_mtime:
+                    epoch = read_collection_epoch()
+                    if epoch != self._epoch:
+                        print(f"Collection epoch changed {self._epoch} -> {epoch}; invalidating result cache.")
+                        self._results.clear()
+                        self._epoch = epoch
+                    self._epoch_mtime = mtime
+        return self._epoch
+
+    def get_embedding(self, key: str):
+        return self._embeddings.get(key)
+
+    def put_embedding(self, key: str, embedding):
+        self._embeddings.put(key, embedding)
+
+    def get_image_embedding(self, content_hash: str):
+        return self._embeddings.get(("image", content_hash))
+
+    def put_image_embedding(self, content_hash: str, embedding):
+        self._embeddings.put(("image", content_hash), embedding)
+
+    def get_results(self, key: str, top_k: int):
+        return self._results.get((self._current_epoch(), key, top_k))
+
+    def put_results(self, key: str, top_k: int, results):
+        self._results.put((self._current_epoch(), key, top_k), results)
+
+    def _collect_metrics(self):
+        for tier, cache in (("embeddings", self._embeddings), ("results", self._results)):
+            stats = cache.get_stats()
+            labels = {"tier": tier}
+            yield ("search_cache_hits_total", "counter", "Search cache hits.", stats["hits"], labels)
+            yield ("search_cache_misses_total", "counter", "Search cache misses.", stats["misses"], labels)
+            yield ("search_cache_evictions_total", "counter", "Search cache evictions.", stats["evictions"], labels)
+            yield ("search_cache_bytes", "gauge", "Approximate bytes held by the search cache.", stats["bytes"], labels)
+        yield ("collection_epoch", "gauge", "Collection epoch seen by this worker.", self._epoch, {})
+
+    def get_stats(self) -> dict:
+        return {
+            "collection_epoch": self._epoch,
+            "embeddings": self._embeddings.get_stats(),
+            "results": self._results.get_stats(),
+        }
+
+def get_search_cache_service():
+    """Dependency injector for FastAPI."""
+    return SearchCacheService()
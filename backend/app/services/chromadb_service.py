@@ -1,13 +1,16 @@
-import chromadb
 from app.core.config import settings
+from app.core.metrics import timed
+from app.services.vector_store import VectorStore, to_numpy
 
-class ChromaDBService:
+class ChromaDBService(VectorStore):
     _instance = None
     _client = None
     _collection = None
 
     def __new__(cls):
         if cls._instance is None:
+            import chromadb
+
             cls._instance = super(ChromaDBService, cls).__new__(cls)
             print(f"Initializing ChromaDB client and connecting to collection '{settings.CHROMA_COLLECTION_NAME}'...")
             cls._client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
@@ -18,11 +21,19 @@ class ChromaDBService:
             print("ChromaDB service initialized successfully.")
         return cls._instance
 
+    @classmethod
+    def from_collection(cls, collection) -> "ChromaDBService":
+        """Wraps an existing collection outside of the app singleton (used by benchmarks)."""
+        service = object.__new__(cls)
+        service._collection = collection
+        return service
+
     def get_collection(self):
         return self._collection
 
     # --- THIS IS THE FIX ---
     # We add `include` as a parameter to our custom search function
+    @timed("chroma.search")
     def search(self, query_embedding, top_k=5, include=["metadatas"]):
         """Performs a similarity search in the collection."""
         return self.get_collection().query(
@@ -32,9 +43,29 @@ class ChromaDBService:
         )
     # ---------------------
 
-# Instantiate the singleton on module load
-chromadb_service = ChromaDBService()
+    @timed("chroma.search_batch")
+    def search_batch(self, query_embeddings, top_k=5, include=["metadatas"]):
+        """Performs a similarity search for several query embeddings in one call."""
+        return self.get_collection().query(
+            query_embeddings=to_numpy(query_embeddings).tolist(),
+            n_results=top_k,
+            include=include
+        )
+
+    def count(self):
+        return self.get_collection().count()
+
+    @timed("chroma.get_embeddings")
+    def get_embeddings(self, ids):
+        """Looks up stored vectors by id (no ANN traversal)."""
+        items = self.get_collection().get(ids=list(ids), include=["embeddings"])
+        return {id_: to_numpy(embedding) for id_, embedding in zip(items['ids'], items['embeddings'])}
+
+    @timed("chroma.get_metadatas")
+    def get_metadatas(self, ids):
+        items = self.get_collection().get(ids=list(ids), include=["metadatas"])
+        return dict(zip(items['ids'], items['metadatas']))
 
 def get_chromadb_service():
-    """Dependency injector for FastAPI."""
-    return chromadb_service
\ No newline at end of file
+    """Dependency injector for FastAPI; the client is created on first call."""
+    return ChromaDBService()
@@ -1,31 +1,231 @@
-import torch
-from sentence_transformers import SentenceTransformer
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
 from app.core.config import settings
+from app.core.metrics import CLIP_BATCH_QUEUE_WAIT_SECONDS, CLIP_BATCH_SIZE, register_collector, timed
+from app.services.executors import StageSaturated, get_model_executor
+
+
+def copy_row(row):
+    """Detaches one embedding row from its batch (torch tensor or NumPy array)."""
+    return row.clone() if hasattr(row, "clone") else row.copy()
+
+
+class TextEncodingBatcher:
+    """
+    Dynamic micro-batching queue for CLIP text encoding.
+
+    Concurrent callers submit single queries; a dedicated worker thread collects
+    them for up to `max_wait_ms` (or until `max_batch_size` is reached), runs a
+    single batched `encode` call and resolves each caller's future with its own
+    embedding row. The forward pass runs on `executor` when given, so it shares
+    the model's thread budget with other inference; at most `max_pending`
+    queries may wait before `submit` raises StageSaturated.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0, executor=None, max_pending: int = 0):
+        self._model = model
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._executor = executor
+        self._max_pending = max_pending
+        self._queue: "queue.Queue[tuple[str, Future, float]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "cancelled": 0,
+            "max_batch_size": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "encode_seconds_total": 0.0,
+        }
+        self._worker = threading.Thread(target=self._run, name="clip-text-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queues a single text for encoding and returns a future for its embedding."""
+        if self.saturated:
+            raise StageSaturated("clip-text-batcher")
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    @property
+    def saturated(self) -> bool:
+        return bool(self._max_pending) and self._queue.qsize() >= self._max_pending
+
+    def get_stats(self) -> dict:
+        """Returns a snapshot of batch-size and queue-wait metrics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["avg_batch_size"] = stats["items"] / batches if batches else 0.0
+        stats["avg_queue_wait_seconds"] = stats["queue_wait_seconds_total"] / stats["items"] if stats["items"] else 0.0
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def _collect_batch(self) -> list:
+        # Block until the first request arrives, then keep collecting until the
+        # batch is full or the wait window (measured from the first item) closes.
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self._max_wait
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _encode_now(self, texts: list[str]):
+        return self._model.encode(texts, batch_size=len(texts), convert_to_tensor=True, show_progress_bar=False)
+
+    def _encode(self, texts: list[str]):
+        if self._executor is None:
+            return self._encode_now(texts)
+        return self._executor.submit(self._encode_now, texts).result()
+
+    def _run(self):
+        while True:
+            # Callers that gave up (e.g. a client disconnect) cancelled their future; skip their text
+            collected = self._collect_batch()
+            batch = [item for item in collected if item[1].set_running_or_notify_cancel()]
+            if len(batch) < len(collected):
+                with self._stats_lock:
+                    self._stats["cancelled"] += len(collected) - len(batch)
+            if not batch:
+                continue
+            started = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = self._encode(texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            # Clone each row so callers (and caches) don't pin the whole batch tensor.
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result(copy_row(embeddings[i]))
+
+            finished = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            CLIP_BATCH_SIZE.observe(len(batch))
+            for wait in waits:
+                CLIP_BATCH_QUEUE_WAIT_SECONDS.observe(wait)
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["items"] += len(batch)
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+                self._stats["queue_wait_seconds_total"] += sum(waits)
+                self._stats["queue_wait_seconds_max"] = max(self._stats["queue_wait_seconds_max"], max(waits))
+                self._stats["encode_seconds_total"] += finished - started
+
 
 class CLIPService:
     _instance = None
     _model = None
+    _batcher = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(CLIPService, cls).__new__(cls)
             # Initialize the model on first instantiation
-            device = 'cuda' if torch.cuda.is_available() else 'cpu'
-            print(f"Loading CLIP model '{settings.CLIP_MODEL_NAME}' onto device '{device}'...")
-            cls._model = SentenceTransformer(settings.CLIP_MODEL_NAME, device=device)
+            if settings.CLIP_INFERENCE_BACKEND == "onnx":
+                cls._model = cls._load_onnx_model()
+            elif settings.CLIP_INFERENCE_BACKEND == "torch":
+                cls._model = cls._load_torch_model()
+            else:
+                raise ValueError(f"Unknown CLIP_INFERENCE_BACKEND '{settings.CLIP_INFERENCE_BACKEND}'")
+            cls._batcher = TextEncodingBatcher(
+                cls._model,
+                max_batch_size=settings.CLIP_BATCH_MAX_SIZE,
+                max_wait_ms=settings.CLIP_BATCH_MAX_WAIT_MS,
+                executor=get_model_executor(),
+                max_pending=settings.CLIP_BATCH_MAX_PENDING,
+            )
+            register_collector(cls._instance._collect_metrics)
             print("CLIP model loaded successfully.")
         return cls._instance
 
+    @staticmethod
+    def _load_torch_model():
+        # Heavy imports are deferred until the service is first created
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        if settings.TORCH_INTRA_OP_THREADS:
+            torch.set_num_threads(settings.TORCH_INTRA_OP_THREADS)
+        print(f"Loading CLIP model '{settings.CLIP_MODEL_NAME}' onto device '{device}'...")
+        return SentenceTransformer(settings.CLIP_MODEL_NAME, device=device)
+
+    @staticmethod
+    def _load_onnx_model():
+        from app.services.onnx_clip import OnnxClipEncoder
+
+        precision = "int8" if settings.ONNX_USE_INT8 else "fp32"
+        print(f"Loading ONNX CLIP model from '{settings.ONNX_MODEL_DIR}' ({precision})...")
+        return OnnxClipEncoder(
+            settings.ONNX_MODEL_DIR,
+            int8=settings.ONNX_USE_INT8,
+            intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+        )
+
     def get_model(self):
         return self._model
 
+    @timed("clip.encode_text")
     def encode_text(self, text: str):
         """Generates an embedding for a given text query."""
         return self.get_model().encode(text, convert_to_tensor=True)
 
-# Instantiate the singleton on module load
-clip_service = CLIPService()
+    @timed("clip.encode_texts")
+    def encode_texts(self, texts: list[str]):
+        """Generates embeddings for many texts in one batched pass, as independent rows."""
+        embeddings = self.get_model().encode(
+            texts, batch_size=settings.CLIP_ENCODE_BATCH_SIZE, convert_to_tensor=True, show_progress_bar=False
+        )
+        return [copy_row(row) for row in embeddings]
+
+    @timed("clip.encode_image")
+    def encode_image(self, image):
+        """Generates an embedding for a decoded PIL image."""
+        return self.get_model().encode(image, convert_to_tensor=True, show_progress_bar=False)
+
+    @timed("clip.encode_text_batched")
+    async def encode_text_batched(self, text: str):
+        """Generates an embedding through the micro-batching queue (for concurrent requests)."""
+        return await asyncio.wrap_future(self._batcher.submit(text))
+
+    def get_batcher_stats(self) -> dict:
+        return self._batcher.get_stats()
+
+    def is_saturated(self) -> bool:
+        """True when new text queries would be refused by the batcher or the model pool."""
+        return self._batcher.saturated or get_model_executor().saturated
+
+    def _collect_metrics(self):
+        stats = self.get_batcher_stats()
+        yield ("clip_text_batches_total", "counter", "Batched CLIP text forward passes.", stats["batches"], {})
+        yield ("clip_text_batch_items_total", "counter", "Queries encoded through the batcher.", stats["items"], {})
+        yield ("clip_text_batch_cancelled_total", "counter", "Queries dropped from the batcher after their caller gave up.", stats["cancelled"], {})
+        yield ("clip_text_batch_pending", "gauge", "Queries waiting in the batcher queue.", stats["pending"], {})
+
+    def warmup(self):
+        """Runs one text and one image inference so the first real query doesn't pay for cold kernels."""
+        from PIL import Image
+
+        embedding = self.encode_text("warmup")
+        self.encode_image(Image.new('RGB', (settings.CLIP_IMAGE_INPUT_SIZE, settings.CLIP_IMAGE_INPUT_SIZE)))
+        return embedding
 
 def get_clip_service():
-    """Dependency injector for FastAPI."""
-    return clip_service
\ No newline at end of file
+    """Dependency injector for FastAPI; the model is loaded on first call."""
+    return CLIPService()
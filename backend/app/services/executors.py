@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.metrics import register_collector
+
+
+class StageSaturated(RuntimeError):
+    """Raised when a pipeline stage's backlog is full; the API answers 503 with Retry-After."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"The '{stage}' stage is at capacity.")
+        self.stage = stage
+
+
+class BoundedThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    A thread pool that refuses work instead of queueing without limit.
+
+    At most `max_workers + max_queue` calls may be running or waiting; further
+    `submit` calls raise StageSaturated. It can be passed anywhere an executor
+    is expected, e.g. `loop.run_in_executor`.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max(0, max_queue)
+        self._pending_lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self._pending >= self.max_pending
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._pending_lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise StageSaturated(self.name)
+            self._pending += 1
+            self._submitted += 1
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future=None):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def get_stats(self) -> dict:
+        with self._pending_lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+            }
+
+
+_executors: dict[str, BoundedThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str, max_workers: int, max_queue: int) -> BoundedThreadPoolExecutor:
+    with _executors_lock:
+        if name not in _executors:
+            if not _executors:
+                register_collector(_collect_metrics)
+            _executors[name] = BoundedThreadPoolExecutor(name, max_workers, max_queue)
+        return _executors[name]
+
+
+def get_model_executor() -> BoundedThreadPoolExecutor:
+    """Runs CLIP inference; sized so the model gets a fixed thread budget."""
+    return _get_executor("clip-model", settings.MODEL_EXECUTOR_WORKERS, settings.MODEL_EXECUTOR_MAX_QUEUE)
+
+
+def get_search_executor() -> BoundedThreadPoolExecutor:
+    """Runs vector store queries and lookups."""
+    return _get_executor("vector-search", settings.SEARCH_EXECUTOR_WORKERS, settings.SEARCH_EXECUTOR_MAX_QUEUE)
+
+
+def get_executor_stats() -> dict:
+    return {name: executor.get_stats() for name, executor in list(_executors.items())}
+
+
+def _collect_metrics():
+    for name, stats in get_executor_stats().items():
+        labels = {"stage": name}
+        yield ("stage_executor_pending", "gauge", "Calls running or queued on a stage executor.", stats["pending"], labels)
+        yield ("stage_executor_capacity", "gauge", "Maximum calls running or queued on a stage executor.", stats["max_pending"], labels)
+        yield ("stage_executor_rejected_total", "counter", "Calls refused because the stage was saturated.", stats["rejected"], labels)
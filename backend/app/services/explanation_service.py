@@ -1,37 +1,199 @@
-import ollama
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
 from app.core.config import settings
+from app.core.metrics import register_collector, timed
+
+FALLBACK_EXPLANATION = "An explanation could not be generated at this time."
+
+
+class ExplanationCache:
+    """Persistent SQLite key/value store of generated explanations, keyed by a model+prompt hash."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, explanation TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT explanation FROM explanations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, explanation: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, model, explanation, created_at) VALUES (?, ?, ?, ?)",
+                (key, model, explanation, time.time())
+            )
+
+
+class _InflightGeneration:
+    """One shared LLM generation that any number of identical requests can subscribe to."""
+
+    def __init__(self):
+        self.tokens: list[str] = []
+        self.done = False
+        self.task: asyncio.Task | None = None
+        self._subscribers: list[asyncio.Queue] = []
+
+    def publish(self, token: str):
+        self.tokens.append(token)
+        for subscriber in self._subscribers:
+            subscriber.put_nowait(token)
+
+    def finish(self):
+        self.done = True
+        for subscriber in self._subscribers:
+            subscriber.put_nowait(None)
+
+    async def stream(self):
+        # Late subscribers first replay what was already generated
+        subscriber: asyncio.Queue = asyncio.Queue()
+        for token in self.tokens:
+            subscriber.put_nowait(token)
+        if self.done:
+            subscriber.put_nowait(None)
+        self._subscribers.append(subscriber)
+        try:
+            while (token := await subscriber.get()) is not None:
+                yield token
+        finally:
+            self._subscribers.remove(subscriber)
+            # Nobody is listening any more, so stop paying for the generation
+            if not self._subscribers and not self.done and self.task is not None:
+                self.task.cancel()
+
 
 class ExplanationService:
     _instance = None
-    _client = None
+    _async_client = None
+    _cache = None
 
     def __new__(cls):
         if cls._instance is None:
+            import ollama
+
             cls._instance = super(ExplanationService, cls).__new__(cls)
             print(f"Initializing Ollama client with base URL: {settings.OLLAMA_BASE_URL}")
-            cls._client = ollama.Client(host=settings.OLLAMA_BASE_URL)
+            cls._async_client = ollama.AsyncClient(host=settings.OLLAMA_BASE_URL)
+            cls._cache = ExplanationCache(settings.EXPLANATION_CACHE_PATH)
+            cls._inflight: dict[str, _InflightGeneration] = {}
+            cls._semaphore = asyncio.Semaphore(settings.OLLAMA_MAX_CONCURRENCY)
+            cls._stats = {"cache_hits": 0, "cache_misses": 0, "coalesced": 0, "rejected": 0, "generated": 0}
+            register_collector(cls._instance._collect_metrics)
         return cls._instance
 
-    def get_client(self):
-        return self._client
+    def get_async_client(self):
+        return self._async_client
+
+    def _build_prompt(self, user_query: str) -> tuple[str, str]:
+        prompt = settings.EXPLANATION_PROMPT.format(query=user_query)
+        return prompt, ExplanationCache.make_key(settings.OLLAMA_MODEL, prompt)
+
+    async def stream_explanation(self, user_query: str):
+        """
+        Yields the explanation token by token.
+
+        Cached explanations are returned in one piece, identical in-flight queries
+        share a single generation, and when more than OLLAMA_MAX_QUEUE generations
+        are already waiting for a slot a canned fallback is returned immediately.
+        """
+        prompt, key = self._build_prompt(user_query)
+        # SQLite lookups block, so they run off the event loop
+        cached = await asyncio.to_thread(self._cache.get, key)
+        if cached is not None:
+            self._stats["cache_hits"] += 1
+            yield cached
+            return
+        self._stats["cache_misses"] += 1
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._stats["coalesced"] += 1
+        else:
+            if self.is_saturated():
+                yield self.reject(user_query)
+                return
+            flight = _InflightGeneration()
+            self._inflight[key] = flight
+            flight.task = asyncio.create_task(self._run_generation(key, prompt, flight))
 
-    def generate_explanation(self, user_query: str) -> str:
-        """Generates an explanation for a search query using the Ollama model."""
+        async for token in flight.stream():
+            yield token
+
+    async def is_cached(self, user_query: str) -> bool:
+        """True when the explanation for this query is already in the cache."""
+        _, key = self._build_prompt(user_query)
+        return await asyncio.to_thread(self._cache.get, key) is not None
+
+    def is_saturated(self) -> bool:
+        """True when a new (uncached, not in-flight) generation would be refused."""
+        return len(self._inflight) >= settings.OLLAMA_MAX_CONCURRENCY + settings.OLLAMA_MAX_QUEUE
+
+    def reject(self, user_query: str) -> str:
+        """Counts a shed request and returns the canned explanation used instead."""
+        self._stats["rejected"] += 1
+        return settings.EXPLANATION_BUSY_FALLBACK.format(query=user_query)
+
+    async def get_explanation(self, user_query: str) -> str:
+        """Returns the full explanation text, sharing cache and in-flight work with streams."""
+        return "".join([token async for token in self.stream_explanation(user_query)]).strip()
+
+    @timed("explanation.stream_generation")
+    async def _run_generation(self, key: str, prompt: str, flight: _InflightGeneration):
         try:
-            prompt = settings.EXPLANATION_PROMPT.format(query=user_query)
-            
-            response = self.get_client().generate(
-                model=settings.OLLAMA_MODEL,
-                prompt=prompt
-            )
-            return response['response'].strip()
+            async with self._semaphore:
+                stream = await self.get_async_client().generate(
+                    model=settings.OLLAMA_MODEL,
+                    prompt=prompt,
+                    stream=True
+                )
+                async for part in stream:
+                    token = part['response']
+                    if not flight.tokens:
+                        # Explanations never start with whitespace
+                        token = token.lstrip()
+                    if token:
+                        flight.publish(token)
+            self._stats["generated"] += 1
+            explanation = "".join(flight.tokens).strip()
+            if explanation:
+                await asyncio.to_thread(self._cache.put, key, settings.OLLAMA_MODEL, explanation)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"Error calling Ollama API: {e}")
-            return "An explanation could not be generated at this time."
+            print(f"Error streaming from Ollama API: {e}")
+            if not flight.tokens:
+                flight.publish(FALLBACK_EXPLANATION)
+        finally:
+            flight.finish()
+            self._inflight.pop(key, None)
+
+    def _collect_metrics(self):
+        for event, count in self._stats.items():
+            yield ("explanation_events_total", "counter", "Explanation cache/coalescing/admission events.", count, {"event": event})
+        stats = self.get_stats()
+        yield ("explanation_generations_in_flight", "gauge", "LLM generations running or queued.", stats["in_flight"], {})
+        yield ("explanation_generations_queued", "gauge", "LLM generations waiting for a slot.", stats["queued"], {})
 
-# Instantiate the singleton
-explanation_service = ExplanationService()
+    def get_stats(self) -> dict:
+        in_flight = len(self._inflight)
+        return {**self._stats, "in_flight": in_flight, "queued": max(0, in_flight - settings.OLLAMA_MAX_CONCURRENCY)}
 
 def get_explanation_service():
-    """Dependency injector for FastAPI."""
-    return explanation_service
\ No newline at end of file
+    """Dependency injector for FastAPI; the client is created on first call."""
+    return ExplanationService()
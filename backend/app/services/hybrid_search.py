@@ -0,0 +1,56 @@
+"""
+Fusion and re-ranking for hybrid (keyword + vector) retrieval.
+
+The two retrievers' scores are not comparable, so their rankings are merged
+with reciprocal-rank fusion. The fused head is then rescored with exact cosine
+similarity from the stored vectors and fused again: the exact vector ranking
+replaces the approximate one, the keyword ranking keeps exact-term hits that
+CLIP ranks low. Results are ordered by that fused score, which is reported
+with them (`fused_scores`) next to the cosine distance.
+"""
+import numpy as np
+from app.core.config import settings
+from app.services.vector_store import VectorStore, to_numpy
+
+
+def fusion_scores(rankings: list[list[str]], k: int = settings.HYBRID_RRF_K) -> dict[str, float]:
+    """Sum of 1 / (k + rank) over the ranked id lists each id appears in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = settings.HYBRID_RRF_K) -> list[str]:
+    """Merges ranked id lists by their reciprocal-rank fusion score."""
+    scores = fusion_scores(rankings, k)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def rerank(store: VectorStore, query_embedding, candidate_ids: list[str], keyword_ids: list[str], top_k: int) -> dict:
+    """
+    Rescores the fused candidates with exact cosine and fuses that ranking with
+    the keyword ranking (`keyword_ids`, best first); returns the top_k by fused
+    score in the store's result layout, with cosine distances and `fused_scores`.
+    """
+    vectors = store.get_embeddings(candidate_ids)
+    found = [id_ for id_ in candidate_ids if id_ in vectors]
+    if not found:
+        return {"ids": [[]], "distances": [[]], "metadatas": [[]], "fused_scores": [[]]}
+    query = to_numpy(query_embedding).reshape(-1)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    matrix = np.stack([vectors[id_] for id_ in found])
+    cosine = dict(zip(found, (matrix @ query / np.maximum(np.linalg.norm(matrix, axis=1), 1e-12)).tolist()))
+
+    by_vector = sorted(found, key=cosine.get, reverse=True)
+    scores = fusion_scores([by_vector, [id_ for id_ in keyword_ids if id_ in cosine]])
+    # Ties (e.g. equal ranks in both lists) go to the closer vector
+    result_ids = sorted(found, key=lambda id_: (scores[id_], cosine[id_]), reverse=True)[:top_k]
+    metadatas = store.get_metadatas(result_ids)
+    return {
+        "ids": [result_ids],
+        "distances": [[1.0 - cosine[id_] for id_ in result_ids]],
+        "metadatas": [[metadatas.get(id_, {}) for id_ in result_ids]],
+        "fused_scores": [[scores[id_] for id_ in result_ids]],
+    }
@@ -0,0 +1,90 @@
+"""
+Filterable image attributes, extracted once at ingestion and stored as vector
+metadata: dimensions, aspect ratio, orientation, dominant color bucket and the
+EXIF capture date.
+"""
+import numpy as np
+from PIL import Image
+
+ORIENTATIONS = ("landscape", "portrait", "square")
+# Hue buckets (upper bound in degrees, name); low-saturation pixels are black/gray/white
+HUE_BUCKETS = ((15, "red"), (45, "orange"), (70, "yellow"), (160, "green"), (200, "cyan"),
+               (260, "blue"), (290, "purple"), (340, "pink"), (360, "red"))
+COLORS = ("red", "orange", "yellow", "green", "cyan", "blue", "purple", "pink", "black", "gray", "white")
+SQUARE_TOLERANCE = 0.05 # Aspect ratios within 5% of 1 count as square
+COLOR_SAMPLE_SIZE = 64
+
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+
+
+def orientation_of(width: int, height: int) -> str:
+    aspect = width / height
+    if abs(aspect - 1) <= SQUARE_TOLERANCE:
+        return "square"
+    return "landscape" if aspect > 1 else "portrait"
+
+
+def color_labels(hsv: np.ndarray) -> np.ndarray:
+    """Color bucket of each pixel, given an (n, 3) array of PIL HSV values (0-255)."""
+    hsv = hsv.astype(np.float32) / 255.0
+    # Hue wraps around: H=255 is 360 degrees, which is red again
+    hue, saturation, value = (hsv[:, 0] * 360) % 360, hsv[:, 1], hsv[:, 2]
+
+    labels = np.empty(len(hsv), dtype=object)
+    lower = 0
+    for upper, name in HUE_BUCKETS:
+        labels[(hue >= lower) & (hue < upper)] = name
+        lower = upper
+    labels[saturation < 0.2] = "gray"
+    labels[(saturation < 0.2) & (value > 0.85)] = "white"
+    labels[value < 0.15] = "black"
+    return labels.astype(str)
+
+
+def dominant_color(img: Image.Image) -> str:
+    """Most common color bucket over a downsampled copy of the image."""
+    sample = img.convert("RGB")
+    sample.thumbnail((COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+    names, counts = np.unique(color_labels(np.asarray(sample.convert("HSV")).reshape(-1, 3)), return_counts=True)
+    return str(names[np.argmax(counts)])
+
+
+def exif_date(img: Image.Image) -> str | None:
+    """Capture date as YYYY-MM-DD from EXIF DateTimeOriginal (or DateTime), if present."""
+    try:
+        exif = img.getexif()
+        raw = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except Exception:
+        return None
+    if not raw or len(raw) < 10:
+        return None
+    date = str(raw)[:10].replace(":", "-")
+    year, month, day = date.split("-") if date.count("-") == 2 else (None, None, None)
+    if not (year and year.isdigit() and month.isdigit() and day.isdigit()) or year == "0000":
+        return None
+    return date
+
+
+def extract_attributes(img: Image.Image, original_size: tuple[int, int] | None = None) -> dict:
+    """
+    Attributes of a freshly opened image (call before resizing, which drops EXIF).
+    `original_size` overrides the measured dimensions when `img` is a downsized
+    copy, e.g. the sizes recorded in the download manifest.
+
+    Values are plain str/int/float so they can be stored as Chroma metadata.
+    """
+    width, height = original_size or img.size
+    attributes = {
+        "width": width,
+        "height": height,
+        "aspect": round(width / height, 3),
+        "orientation": orientation_of(width, height),
+        "color": dominant_color(img),
+    }
+    taken_at = exif_date(img)
+    if taken_at:
+        attributes["taken_at"] = taken_at
+        attributes["taken_year"] = int(taken_at[:4])
+    return attributes
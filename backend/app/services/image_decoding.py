@@ -0,0 +1,28 @@
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+from app.core.config import settings
+
+_decode_pool = None
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-heavy image decoding, created on first use."""
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(max_workers=settings.IMAGE_DECODE_WORKERS)
+    return _decode_pool
+
+def decode_and_resize(data: bytes, min_side: int) -> Image.Image:
+    """
+    Decodes image bytes to RGB and downsizes so the shortest side is `min_side`.
+
+    Runs in a worker process; the CLIP processor center-crops the result.
+    """
+    with Image.open(BytesIO(data)) as img:
+        img = img.convert('RGB')
+        scale = min_side / min(img.size)
+        if scale < 1:
+            new_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img = img.resize(new_size, Image.Resampling.BICUBIC)
+        return img
@@ -0,0 +1,121 @@
+"""
+BM25 keyword index over per-image text, for hybrid retrieval.
+
+CLIP similarity misses exact terms (brand names, rare nouns); this SQLite FTS5
+index catches them. `build_keyword_index` writes a fresh database next to the
+target and swaps it in; the service reopens it when the file changes.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+from app.core.config import settings
+from app.core.metrics import timed
+
+TOKEN = re.compile(r"\w+")
+PROGRESS_STEPS = 1000 # SQLite VM instructions between cancellation checks
+
+
+class KeywordSearchCancelled(RuntimeError):
+    """Raised when a keyword query is abandoned because its latency budget ran out."""
+
+
+def to_match_query(text: str) -> str | None:
+    """Turns free text into an FTS5 query matching any of its terms (BM25 ranks the overlap)."""
+    tokens = list(dict.fromkeys(TOKEN.findall(text.lower())))
+    return " OR ".join(f'"{token}"' for token in tokens) if tokens else None
+
+
+def build_keyword_index(path: str, rows) -> int:
+    """
+    Writes (id, filename, text) rows into a new FTS5 database at `path`; returns
+    the row count. Without any rows no index is installed (an existing one is
+    removed), so servers skip hybrid retrieval instead of fusing empty hits.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE docs USING fts5("
+            "id UNINDEXED, filename UNINDEXED, text, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        with conn:
+            conn.executemany("INSERT INTO docs (id, filename, text) VALUES (?, ?, ?)", rows)
+            # Merges the index segments for faster queries
+            conn.execute("INSERT INTO docs (docs) VALUES ('optimize')")
+        count = conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    finally:
+        conn.close()
+    if count == 0:
+        os.remove(tmp_path)
+        if os.path.exists(path):
+            os.remove(path)
+        return 0
+    os.replace(tmp_path, path)
+    return count
+
+
+class KeywordIndexService:
+    """Read-only access to the keyword index; one SQLite connection per thread."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(KeywordIndexService, cls).__new__(cls)
+            cls._local = threading.local()
+        return cls._instance
+
+    def version(self) -> int | None:
+        """The index file's mtime, or None when no index is built; part of result cache keys."""
+        try:
+            return os.stat(settings.KEYWORD_INDEX_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _connection(self):
+        version = self.version()
+        if version is None:
+            return None
+        if getattr(self._local, "version", None) != version:
+            if getattr(self._local, "conn", None) is not None:
+                self._local.conn.close()
+            # Opened read-only; a rebuild replaces the file, so the next call reopens it
+            self._local.conn = sqlite3.connect(f"file:{settings.KEYWORD_INDEX_PATH}?mode=ro", uri=True)
+            self._local.version = version
+        return self._local.conn
+
+    @timed("keyword.search")
+    def search(self, text: str, limit: int, cancel: threading.Event | None = None) -> list[tuple[str, str, float]]:
+        """
+        Returns up to `limit` (id, filename, bm25 score) hits, best first.
+
+        Setting `cancel` aborts a running query at the next progress check.
+        """
+        query = to_match_query(text)
+        conn = self._connection()
+        if query is None or conn is None:
+            return []
+        if cancel is not None:
+            conn.set_progress_handler(cancel.is_set, PROGRESS_STEPS)
+        try:
+            # bm25() is lower-is-better; negated so callers rank by descending score
+            return conn.execute(
+                "SELECT id, filename, -bm25(docs) FROM docs WHERE docs MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            if cancel is not None and cancel.is_set():
+                raise KeywordSearchCancelled("Keyword search exceeded its latency budget.") from e
+            raise
+        finally:
+            if cancel is not None:
+                conn.set_progress_handler(None, 0)
+
+
+def get_keyword_index_service():
+    """Dependency injector for FastAPI."""
+    return KeywordIndexService()
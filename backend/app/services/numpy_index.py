@@ -0,0 +1,153 @@
+import json
+import os
+import time
+
+import numpy as np
+from app.services.vector_store import to_numpy
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "embeddings.npy"
+INT8_VECTORS_FILE = "embeddings_int8.npy"
+INT8_SCALES_FILE = "scales.npy"
+# Ids and metadata are memory-mapped files, shared through the page cache
+IDS_ARRAY_FILE = "ids.npy" # Fixed-width UTF-8 ids, one per row
+ID_ORDER_FILE = "id_order.npy" # Rows sorted by id, for binary-search lookups
+METADATA_BLOB_FILE = "metadatas.jsonl" # One JSON object per row
+METADATA_OFFSETS_FILE = "metadata_offsets.npy" # Byte offset of each row in the blob (count + 1 entries)
+INDEX_FORMAT = 2
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def save_id_arrays(index_dir: str, ids: list[str]):
+    """Writes ids as a fixed-width array plus its sort order, for mapped binary-search lookups."""
+    encoded_ids = [id_.encode("utf-8") for id_ in ids]
+    array = np.array(encoded_ids, dtype=f"S{max([1, *map(len, encoded_ids)])}")
+    np.save(os.path.join(index_dir, IDS_ARRAY_FILE), array)
+    np.save(os.path.join(index_dir, ID_ORDER_FILE), np.argsort(array, kind="stable"))
+
+
+class MappedIds:
+    """Memory-mapped ids written by save_id_arrays: row -> id and id -> row by binary search."""
+
+    def __init__(self, index_dir: str):
+        self._ids = np.load(os.path.join(index_dir, IDS_ARRAY_FILE), mmap_mode="r")
+        self._order = np.load(os.path.join(index_dir, ID_ORDER_FILE), mmap_mode="r")
+
+    def __len__(self):
+        return len(self._ids)
+
+    def id_at(self, row: int) -> str:
+        return self._ids[row].decode("utf-8")
+
+    def row_of(self, id_: str) -> int | None:
+        key = id_.encode("utf-8")
+        if not len(self._ids) or len(key) > self._ids.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(self._ids, key, sorter=self._order))
+        if position < len(self._order) and self._ids[self._order[position]] == key:
+            return int(self._order[position])
+        return None
+
+    def rows_of(self, ids: list[str]) -> np.ndarray:
+        """Vectorized row_of; unknown ids are dropped."""
+        encoded = [id_.encode("utf-8") for id_ in ids]
+        keys = np.array([key for key in encoded if len(key) <= self._ids.dtype.itemsize], dtype=self._ids.dtype)
+        if not len(self._ids) or not len(keys):
+            return np.empty(0, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._ids, keys, sorter=self._order), len(self._order) - 1)
+        rows = np.asarray(self._order[positions], dtype=np.int64)
+        return rows[self._ids[rows] == keys]
+
+
+class NumpyIndexWriter:
+    """
+    Streams vectors into an on-disk index directory readable by NumpyVectorService.
+
+    Vectors are L2-normalized and stored as float16; with `quantize="int8"` a
+    per-vector symmetric int8 copy (plus scales) is written as well and used for
+    the first-pass scan, with the float16 rows kept for rescoring.
+    """
+
+    def __init__(self, index_dir: str, count: int, dim: int, quantize: str | None = None):
+        if quantize not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization '{quantize}'")
+        os.makedirs(index_dir, exist_ok=True)
+        self._dir = index_dir
+        self._quantize = quantize
+        self._count = count
+        self._dim = dim
+        self._offset = 0
+        self._ids: list[str] = []
+        self._metadatas: list[dict] = []
+        open_memmap = np.lib.format.open_memmap
+        self._vectors = open_memmap(os.path.join(index_dir, VECTORS_FILE), mode="w+", dtype=np.float16, shape=(count, dim))
+        self._int8 = self._scales = None
+        if quantize == "int8":
+            self._int8 = open_memmap(os.path.join(index_dir, INT8_VECTORS_FILE), mode="w+", dtype=np.int8, shape=(count, dim))
+            self._scales = open_memmap(os.path.join(index_dir, INT8_SCALES_FILE), mode="w+", dtype=np.float32, shape=(count,))
+
+    def add(self, ids, embeddings, metadatas=None):
+        vectors = normalize_rows(to_numpy(embeddings))
+        end = self._offset + len(ids)
+        if end > self._count:
+            raise ValueError(f"Index was sized for {self._count} vectors")
+        self._vectors[self._offset:end] = vectors
+        if self._int8 is not None:
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            self._int8[self._offset:end] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[self._offset:end] = scales
+        self._ids.extend(ids)
+        self._metadatas.extend(metadatas or [{} for _ in ids])
+        self._offset = end
+
+    def close(self, model_name: str):
+        """Flushes vectors and writes the id/metadata sidecars and manifest."""
+        for array in (self._vectors, self._int8, self._scales):
+            if array is not None:
+                array.flush()
+        save_id_arrays(self._dir, self._ids)
+        lines = [json.dumps(metadata).encode("utf-8") + b"\n" for metadata in self._metadatas]
+        with open(os.path.join(self._dir, METADATA_BLOB_FILE), "wb") as f:
+            f.writelines(lines)
+        offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in lines], out=offsets[1:])
+        np.save(os.path.join(self._dir, METADATA_OFFSETS_FILE), offsets)
+        manifest = {
+            "format": INDEX_FORMAT,
+            "count": self._offset,
+            "dim": self._dim,
+            "quantization": self._quantize,
+            "model": model_name,
+            "created_at": time.time(),
+        }
+        # The manifest goes last; its presence marks a complete index
+        with open(os.path.join(self._dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+
+class MappedRowData(MappedIds):
+    """Ids and metadata of an index, memory-mapped so worker processes share one copy."""
+
+    def __init__(self, index_dir: str):
+        super().__init__(index_dir)
+        self._offsets = np.load(os.path.join(index_dir, METADATA_OFFSETS_FILE), mmap_mode="r")
+        blob_path = os.path.join(index_dir, METADATA_BLOB_FILE)
+        # np.memmap can't map an empty file
+        self._blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else b""
+
+    def metadata_at(self, row: int) -> dict:
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return json.loads(bytes(self._blob[start:end]))
+
+
+def open_row_data(index_dir: str, manifest: dict) -> MappedRowData:
+    if manifest.get("format") != INDEX_FORMAT:
+        raise ValueError(
+            f"Vector index at '{index_dir}' has format {manifest.get('format')}, expected {INDEX_FORMAT}. "
+            "Rebuild it with: PYTHONPATH=. python scripts/build_vector_index.py"
+        )
+    return MappedRowData(index_dir)
@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from app.core.config import settings
+from app.core.metrics import timed
+from app.services.vector_store import VectorStore, to_numpy
+from app.services.numpy_index import (
+    MANIFEST_FILE, VECTORS_FILE, INT8_VECTORS_FILE, INT8_SCALES_FILE, normalize_rows, open_row_data
+)
+
+MIN_SHARD_ROWS = 16384 # Below this, thread handoff costs more than a shard saves
+
+class MappedIndex:
+    """
+    One built index, memory-mapped read-only.
+
+    A search holds on to the MappedIndex it started with, so a rebuild swapped
+    in mid-query never mixes the old vectors with the new ids.
+    """
+
+    def __init__(self, index_dir: str, shards: int = 1):
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(
+                f"No vector index at '{index_dir}'. Build one with: PYTHONPATH=. python scripts/build_vector_index.py"
+            )
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        count = self.manifest["count"]
+        # mmap_mode='r' maps the files read-only: no copy at startup, pages load on demand
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")[:count]
+        self.int8 = self.scales = None
+        if self.manifest.get("quantization") == "int8":
+            self.int8 = np.load(os.path.join(index_dir, INT8_VECTORS_FILE), mmap_mode="r")[:count]
+            self.scales = np.load(os.path.join(index_dir, INT8_SCALES_FILE), mmap_mode="r")[:count]
+        self.rows = open_row_data(index_dir, self.manifest)
+        # Contiguous row ranges; small indexes are not worth splitting
+        shards = max(1, min(shards, count // MIN_SHARD_ROWS))
+        bounds = np.linspace(0, count, shards + 1, dtype=np.int64)
+        self.shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def chunk_rows(self, n_queries: int) -> int:
+        """Rows per scan chunk, so its float32 block and score matrix fit NUMPY_SCAN_CHUNK_BYTES."""
+        return max(1, settings.NUMPY_SCAN_CHUNK_BYTES // (4 * (self.vectors.shape[1] + n_queries)))
+
+    def scan(self, queries: np.ndarray, k: int, pool=None) -> tuple[np.ndarray, np.ndarray]:
+        """Exact top-k over all shards, merged into one candidate list per query."""
+        if pool is None or len(self.shards) == 1:
+            return self.scan_range(queries, k, 0, self.vectors.shape[0])
+        parts = list(pool.map(lambda bounds: self.scan_range(queries, k, *bounds), self.shards))
+        scores = np.concatenate([part[0] for part in parts], axis=1)
+        rows = np.concatenate([part[1] for part in parts], axis=1)
+        if scores.shape[1] > k:
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, keep, axis=1)
+            rows = np.take_along_axis(rows, keep, axis=1)
+        return scores, rows
+
+    def scan_range(self, queries: np.ndarray, k: int, begin: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k over rows [begin, end) for a batch of queries.
+
+        The matrix is processed in row chunks (one BLAS matmul each, since BLAS has
+        no float16/int8 kernels), keeping a running top-k per query with argpartition.
+        """
+        matrix = self.int8 if self.int8 is not None else self.vectors
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        chunk_rows = self.chunk_rows(len(queries))
+        for start in range(begin, end, chunk_rows):
+            block = np.asarray(matrix[start:min(end, start + chunk_rows)], dtype=np.float32)
+            scores = queries @ block.T
+            if self.scales is not None:
+                scores *= self.scales[start:start + len(block)]
+            rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+        return best_scores, best_rows
+
+    def rescore(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Exact float16 scores for int8 candidates; only the candidate rows are read."""
+        scores = np.empty(rows.shape, dtype=np.float32)
+        for i, candidate_rows in enumerate(rows):
+            scores[i] = np.asarray(self.vectors[candidate_rows], dtype=np.float32) @ queries[i]
+        return scores
+
+
+class NumpyVectorService(VectorStore):
+    """
+    Exact (or int8 + rescore) search over a memory-mapped index.
+
+    Every array, including ids and metadata, is mapped read-only, so any number
+    of uvicorn workers share one copy of the index in the page cache. With
+    `shards > 1` the rows are split into contiguous ranges scanned in parallel
+    threads (NumPy releases the GIL in matmul), and the per-shard top-k lists
+    are merged. A rebuild (scripts/build_vector_index.py) is picked up on the
+    next query, like the attribute index.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(NumpyVectorService, cls).__new__(cls)
+            cls._instance._open(settings.NUMPY_INDEX_DIR, settings.NUMPY_INDEX_SHARDS)
+        return cls._instance
+
+    @classmethod
+    def from_directory(cls, index_dir: str, shards: int = 1) -> "NumpyVectorService":
+        """Opens an index outside of the app singleton (used by scripts and benchmarks)."""
+        service = object.__new__(cls)
+        service._open(index_dir, shards)
+        return service
+
+    def _open(self, index_dir: str, shards: int = 1):
+        self._index_dir = index_dir
+        self._requested_shards = shards
+        self._lock = threading.Lock()
+        self._index = None
+        self._manifest_mtime = None
+        # Sized for the requested shards, so it outlives index reloads
+        self._shard_pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="numpy-shard") if shards > 1 else None
+        self.get_index()
+
+    def get_index(self) -> MappedIndex:
+        """The current index, re-mapped when a rebuild replaces it."""
+        # A stat() per call is cheap; the index is only re-mapped when the manifest changes.
+        try:
+            mtime = os.stat(os.path.join(self._index_dir, MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime and (mtime is not None or self._index is None):
+            with self._lock:
+                if mtime != self._manifest_mtime:
+                    print(f"Memory-mapping NumPy vector index from '{self._index_dir}'...")
+                    index = MappedIndex(self._index_dir, self._requested_shards)
+                    self._index, self._manifest_mtime = index, mtime
+                    shards = len(index.shards)
+                    print(f"NumPy vector index loaded: {index.manifest['count']} vectors "
+                          f"({index.manifest.get('quantization') or 'float16'}, {shards} shard{'s' if shards > 1 else ''}).")
+        # Between a rebuild's directory swap and the new manifest, the last index keeps serving
+        return self._index
+
+    def count(self):
+        return len(self.get_index().rows)
+
+    @timed("numpy.get_embeddings")
+    def get_embeddings(self, ids):
+        index = self.get_index()
+        rows = {id_: index.rows.row_of(id_) for id_ in ids}
+        return {id_: np.asarray(index.vectors[row], dtype=np.float32) for id_, row in rows.items() if row is not None}
+
+    def get_metadatas(self, ids):
+        index = self.get_index()
+        rows = {id_: index.rows.row_of(id_) for id_ in ids}
+        return {id_: index.rows.metadata_at(row) for id_, row in rows.items() if row is not None}
+
+    @timed("numpy.search_ids")
+    def search_ids(self, query_embedding, ids, top_k=5, include=["metadatas"]):
+        """Exact search over the given ids only, reading just their rows."""
+        index = self.get_index()
+        query = normalize_rows(to_numpy(query_embedding).reshape(1, -1))[0]
+        rows = np.sort(index.rows.rows_of(ids))
+        k = min(top_k, len(rows))
+        if k == 0:
+            return {"ids": [[]], "distances": [[]], "metadatas": [[]]}
+        scores = np.empty(len(rows), dtype=np.float32)
+        chunk_rows = index.chunk_rows(1)
+        for start in range(0, len(rows), chunk_rows):
+            chunk = rows[start:start + chunk_rows]
+            scores[start:start + len(chunk)] = np.asarray(index.vectors[chunk], dtype=np.float32) @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = {"ids": [[index.rows.id_at(r) for r in rows[top]]]}
+        if "distances" in include:
+            results["distances"] = [(1.0 - scores[top]).tolist()]
+        if "metadatas" in include:
+            results["metadatas"] = [[index.rows.metadata_at(r) for r in rows[top]]]
+        return results
+
+    @timed("numpy.search_batch")
+    def search_batch(self, query_embeddings, top_k=5, include=["metadatas"]):
+        """Exact (or int8 with rescoring) cosine search for a batch of queries."""
+        index = self.get_index()
+        queries = normalize_rows(to_numpy(query_embeddings).reshape(-1, index.vectors.shape[1]))
+        count = len(index.rows)
+        k = min(top_k, count)
+        if k == 0:
+            empty = [[] for _ in queries]
+            return {"ids": empty, "distances": empty, "metadatas": empty}
+
+        if index.int8 is not None:
+            candidates = min(count, k * settings.NUMPY_RESCORE_FACTOR)
+            _, rows = index.scan(queries, candidates, self._shard_pool)
+            scores = index.rescore(queries, rows)
+        else:
+            scores, rows = index.scan(queries, k, self._shard_pool)
+
+        # Final ordering of the (small) candidate set
+        order = np.argsort(-scores, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+
+        results = {"ids": [[index.rows.id_at(r) for r in row] for row in rows]}
+        if "distances" in include:
+            results["distances"] = (1.0 - scores).tolist()
+        if "metadatas" in include:
+            results["metadatas"] = [[index.rows.metadata_at(r) for r in row] for row in rows]
+        if "embeddings" in include:
+            results["embeddings"] = [np.asarray(index.vectors[row], dtype=np.float32).tolist() for row in rows]
+        return results
+
+def get_numpy_vector_service():
+    """Dependency injector for FastAPI; the index is mapped on first call."""
+    return NumpyVectorService()
@@ -0,0 +1,72 @@
+import json
+import os
+
+import numpy as np
+
+TEXT_MODEL_FILE = "text.onnx"
+IMAGE_MODEL_FILE = "image.onnx"
+INT8_SUFFIX = ".int8"
+EXPORT_MANIFEST_FILE = "export.json"
+TEXT_MAX_LENGTH = 77 # CLIP's context length
+
+
+def model_path(model_dir: str, filename: str, int8: bool = False) -> str:
+    stem, ext = os.path.splitext(filename)
+    return os.path.join(model_dir, f"{stem}{INT8_SUFFIX}{ext}" if int8 else filename)
+
+
+class OnnxClipEncoder:
+    """
+    CLIP text and image towers exported to ONNX, run with ONNX Runtime on CPU.
+
+    `encode` mirrors `SentenceTransformer.encode` for CLIP: strings go through
+    the text tower, PIL images through the image tower. Embeddings are returned
+    as float32 NumPy arrays (`convert_to_tensor` is accepted and ignored).
+    """
+
+    def __init__(self, model_dir: str, int8: bool = False, intra_op_threads: int = 0):
+        try:
+            import onnxruntime as ort
+            from transformers import CLIPImageProcessor, CLIPTokenizerFast
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX backend needs the optional dependencies in requirements-onnx.txt"
+            ) from e
+
+        with open(os.path.join(model_dir, EXPORT_MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        providers = ["CPUExecutionProvider"]
+        self._text = ort.InferenceSession(model_path(model_dir, TEXT_MODEL_FILE, int8), options, providers=providers)
+        self._image = ort.InferenceSession(model_path(model_dir, IMAGE_MODEL_FILE, int8), options, providers=providers)
+        self._tokenizer = CLIPTokenizerFast.from_pretrained(model_dir)
+        self._image_processor = CLIPImageProcessor.from_pretrained(model_dir)
+
+    def encode_texts(self, texts: list[str]) -> np.ndarray:
+        tokens = self._tokenizer(
+            texts, padding=True, truncation=True, max_length=TEXT_MAX_LENGTH, return_tensors="np"
+        )
+        return self._text.run(None, {
+            "input_ids": tokens["input_ids"].astype(np.int64),
+            "attention_mask": tokens["attention_mask"].astype(np.int64),
+        })[0]
+
+    def encode_images(self, images) -> np.ndarray:
+        pixels = self._image_processor(images=images, return_tensors="np")["pixel_values"]
+        return self._image.run(None, {"pixel_values": pixels.astype(np.float32)})[0]
+
+    def encode(self, inputs, batch_size: int = 32, convert_to_tensor: bool = False, **kwargs):
+        single = not isinstance(inputs, list)
+        items = [inputs] if single else inputs
+        outputs = []
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            if all(isinstance(item, str) for item in batch):
+                outputs.append(self.encode_texts(batch))
+            else:
+                outputs.append(self.encode_images(batch))
+        embeddings = np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,115 @@
+"""
+Pre-generated, content-addressed thumbnails.
+
+`scripts/generate_thumbnails.py` renders every image at THUMBNAIL_SIZES into
+THUMBNAIL_DIR as `<content hash>-<size>.<ext>` and writes a manifest mapping
+each source filename to its hash. A file name therefore never changes content,
+so thumbnails can be served with a strong ETag and `immutable` caching, by the
+API or by any static file server pointed at the directory.
+"""
+import json
+import os
+import re
+import threading
+
+from PIL import Image
+from app.core.config import settings
+
+MANIFEST_FILE = "manifest.json"
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+MEDIA_TYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+THUMBNAIL_NAME = re.compile(r"(?P<digest>[0-9a-f]{16})-(?P<size>\d+)\.(?P<ext>webp|jpg)")
+
+
+def thumbnail_name(digest: str, size: int, image_format: str = settings.THUMBNAIL_FORMAT) -> str:
+    return f"{digest}-{size}.{EXTENSIONS[image_format]}"
+
+
+def render_thumbnails(path: str, digest: str, output_dir: str, sizes=settings.THUMBNAIL_SIZES,
+                      image_format: str = settings.THUMBNAIL_FORMAT, quality: int = settings.THUMBNAIL_QUALITY) -> list[str]:
+    """
+    Writes the missing thumbnails of one image (runs in a worker process).
+
+    Each size bounds the longer side; images are never upscaled. Files are written
+    under a temporary name and renamed, so a reader never sees a partial file.
+    """
+    written = []
+    options = {"quality": quality, "method": 4} if image_format == "webp" else {"quality": quality, "optimize": True}
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        for size in sorted(sizes, reverse=True):
+            name = thumbnail_name(digest, size, image_format)
+            target = os.path.join(output_dir, name)
+            if os.path.exists(target):
+                continue
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+            tmp_path = f"{target}.tmp"
+            img.save(tmp_path, format=image_format.upper(), **options)
+            os.replace(tmp_path, target)
+            written.append(name)
+    return written
+
+
+def read_manifest(path: str) -> dict:
+    """Returns filename -> {"digest", "mtime_ns", "size"}."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(path: str, entries: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class ThumbnailService:
+    """Maps result filenames to thumbnail URLs; falls back to the original image when none exists."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ThumbnailService, cls).__new__(cls)
+            cls._lock = threading.Lock()
+            cls._digests = {}
+            cls._manifest_mtime = None
+        return cls._instance
+
+    def _current_digests(self) -> dict:
+        # A stat() per call is cheap; the manifest is only re-read when it changes.
+        path = os.path.join(settings.THUMBNAIL_DIR, MANIFEST_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                if mtime != self._manifest_mtime:
+                    entries = read_manifest(path) if mtime is not None else {}
+                    self._digests = {filename: entry["digest"] for filename, entry in entries.items()}
+                    self._manifest_mtime = mtime
+        return self._digests
+
+    def urls_for(self, filename: str, base_url: str) -> dict:
+        """
+        Returns {"image_url", "thumbnail_urls"} for one result.
+
+        `image_url` is the THUMBNAIL_RESULT_SIZE rendition, `thumbnail_urls` maps
+        every size to its URL (for srcset). Thumbnails are addressed from
+        IMAGE_BASE_URL when set, so a static server can take that traffic.
+        """
+        digest = self._current_digests().get(filename)
+        if digest is None:
+            return {"image_url": f"{base_url}images/{filename}", "thumbnail_urls": {}}
+        thumbnail_base = settings.IMAGE_BASE_URL or base_url
+        urls = {str(size): f"{thumbnail_base}thumbnails/{thumbnail_name(digest, size)}" for size in settings.THUMBNAIL_SIZES}
+        image_url = urls.get(str(settings.THUMBNAIL_RESULT_SIZE)) or urls[str(max(settings.THUMBNAIL_SIZES))]
+        return {"image_url": image_url, "thumbnail_urls": urls}
+
+
+def get_thumbnail_service():
+    """Dependency injector for FastAPI."""
+    return ThumbnailService()
@@ -0,0 +1,130 @@
+import math
+from abc import ABC, abstractmethod
+
+import numpy as np
+from app.core.config import settings
+
+
+def to_numpy(embeddings) -> np.ndarray:
+    """Converts a torch tensor, list or array of embeddings to a float32 NumPy array."""
+    if isinstance(embeddings, (list, tuple)) and embeddings and hasattr(embeddings[0], "detach"):
+        embeddings = [e.detach().cpu().numpy() for e in embeddings]
+    if hasattr(embeddings, "detach"):
+        embeddings = embeddings.detach().cpu().numpy()
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+class VectorStore(ABC):
+    """
+    Interface shared by the vector search backends.
+
+    Results use Chroma's query layout so callers don't depend on the backend:
+    {'ids': [[...]], 'distances': [[...]], 'metadatas': [[...]]}, one inner list
+    per query, with cosine distances (1 - cosine similarity).
+    """
+
+    @abstractmethod
+    def search_batch(self, query_embeddings, top_k=5, include=["metadatas"]) -> dict:
+        """Searches for several query embeddings at once."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of vectors in the store."""
+
+    @abstractmethod
+    def get_embeddings(self, ids: list[str]) -> dict:
+        """Returns the stored vectors for the given ids as {id: float32 array}; unknown ids are omitted."""
+
+    @abstractmethod
+    def get_metadatas(self, ids: list[str]) -> dict:
+        """Returns the stored metadata for the given ids as {id: dict}; unknown ids are omitted."""
+
+    def search(self, query_embedding, top_k=5, include=["metadatas"]) -> dict:
+        """Performs a similarity search for a single query embedding."""
+        return self.search_batch(to_numpy(query_embedding).reshape(1, -1), top_k, include)
+
+    def search_ids(self, query_embedding, ids: list[str], top_k=5, include=["metadatas"]) -> dict:
+        """
+        Exact cosine search restricted to `ids` (pre-filtering).
+
+        Only the candidates' vectors are read, in chunks, keeping a running top-k.
+        """
+        query = to_numpy(query_embedding).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        best_ids, best_scores = [], np.empty(0, dtype=np.float32)
+        for start in range(0, len(ids), settings.FILTER_PREFILTER_CHUNK_ROWS):
+            vectors = self.get_embeddings(ids[start:start + settings.FILTER_PREFILTER_CHUNK_ROWS])
+            if not vectors:
+                continue
+            matrix = np.stack(list(vectors.values()))
+            scores = matrix @ query / np.maximum(np.linalg.norm(matrix, axis=1), 1e-12)
+            best_ids = best_ids + list(vectors)
+            best_scores = np.concatenate([best_scores, scores.astype(np.float32)])
+            if len(best_ids) > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1)[:top_k]
+                best_ids = [best_ids[i] for i in keep]
+                best_scores = best_scores[keep]
+
+        order = np.argsort(-best_scores)[:top_k]
+        result_ids = [best_ids[i] for i in order]
+        results = {"ids": [result_ids]}
+        if "distances" in include:
+            results["distances"] = [(1.0 - best_scores[order]).tolist()]
+        if "metadatas" in include:
+            metadatas = self.get_metadatas(result_ids)
+            results["metadatas"] = [[metadatas.get(id_, {}) for id_ in result_ids]]
+        return results
+
+    def search_filtered(self, query_embedding, top_k=5, match=None, include=["metadatas"]) -> tuple[dict, str]:
+        """
+        Top-k among the rows of an AttributeMatch, choosing the strategy by selectivity.
+
+        Narrow filters are pre-filtered: an exact scan of just the matching vectors.
+        A filter is narrow when it matches at most FILTER_PREFILTER_MAX_ROWS rows
+        and at most FILTER_PREFILTER_MAX_SELECTIVITY of the collection; the row cap
+        bounds the scan, so a 5% filter on a huge collection is never pre-filtered.
+        Everything else is post-filtered: the ANN query over-fetches by 1/selectivity,
+        doubling until enough hits survive the filter. Past FILTER_POSTFILTER_MAX_K it
+        falls back to pre-filtering if the matches fit under the row cap, and
+        otherwise returns the hits found so far. Returns (results, strategy).
+        """
+        if match is None:
+            return self.search(query_embedding, top_k, include), "none"
+        empty = {"ids": [[]], "distances": [[]], "metadatas": [[]]}
+        if match.count == 0:
+            return empty, "empty"
+        within_cap = match.count <= settings.FILTER_PREFILTER_MAX_ROWS
+        if within_cap and match.selectivity <= settings.FILTER_PREFILTER_MAX_SELECTIVITY:
+            return self.search_ids(query_embedding, match.ids(), top_k, include), "prefilter"
+
+        total = self.count()
+        k = min(total, math.ceil(top_k / match.selectivity * 1.2))
+        max_k = max(k, settings.FILTER_POSTFILTER_MAX_K)
+        while True:
+            results = self.search(query_embedding, k, include)
+            keep = [i for i, id_ in enumerate(results["ids"][0]) if match.contains(id_)][:top_k]
+            if len(keep) == top_k or k == total or (k >= max_k and not within_cap):
+                filtered = {field: [[values[0][i] for i in keep]] for field, values in results.items()
+                            if field in ("ids", "distances", "metadatas") and values}
+                return filtered, "postfilter"
+            if k >= max_k:
+                break
+            k = min(total, max_k, k * 2)
+        return self.search_ids(query_embedding, match.ids(), top_k, include), "prefilter"
+
+    def warmup(self, query_embedding):
+        """Runs one query so index pages and caches are hot before serving traffic."""
+        if self.count():
+            self.search(query_embedding, 1, ["distances"])
+
+
+def get_vector_store() -> VectorStore:
+    """Dependency injector for FastAPI; returns the backend selected by VECTOR_BACKEND."""
+    # Imported lazily so that only the configured backend is loaded
+    if settings.VECTOR_BACKEND == "numpy":
+        from app.services.numpy_vector_service import get_numpy_vector_service
+        return get_numpy_vector_service()
+    if settings.VECTOR_BACKEND == "chroma":
+        from app.services.chromadb_service import get_chromadb_service
+        return get_chromadb_service()
+    raise ValueError(f"Unknown VECTOR_BACKEND '{settings.VECTOR_BACKEND}'")
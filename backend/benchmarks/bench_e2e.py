@@ -0,0 +1,198 @@
+"""
+End-to-end `/search/stream` throughput under concurrent load.
+
+Starts the API with uvicorn in a subprocess against a synthetic ChromaDB
+collection and a stub Ollama server, then drives it with a closed-loop async
+load generator at several concurrency levels and stream protocols. For each
+level it reports requests/sec, time to the results event and time to the
+final event. Every storage path the API writes to is pointed at a temporary
+directory, so a run neither reads nor touches the real indexes and caches.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_encode import make_queries
+from benchmarks.common import SYNTHETIC_COLLECTION_NAME, build_chroma_collection, random_unit_vectors, summarize
+from benchmarks.stub_ollama import create_app, free_port, serve_in_thread
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("e2e")
+    group.add_argument("--e2e-collection-size", type=int, default=10000)
+    group.add_argument("--e2e-concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    group.add_argument("--e2e-requests", type=int, default=200, help="Requests per concurrency level")
+    group.add_argument("--e2e-repeat-ratio", type=float, default=0.0,
+                       help="Fraction of requests that reuse an earlier query (exercises the caches)")
+    group.add_argument("--e2e-llm-tokens", type=int, default=20)
+    group.add_argument("--e2e-llm-token-ms", type=float, default=10.0)
+    group.add_argument("--e2e-protocols", type=int, nargs="+", choices=[1, 2], default=[1, 2],
+                       help="/search/stream protocol versions to drive at each concurrency level")
+    group.add_argument("--e2e-startup-timeout", type=float, default=300.0)
+
+
+def start_backend(port: int, env_overrides: dict) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, **env_overrides}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def wait_until_ready(client, process, timeout: float) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode} during startup")
+        try:
+            response = await client.get("/readyz")
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise TimeoutError("Backend did not become ready in time")
+
+
+async def stream_one(client, query: str, protocol: int = 1) -> dict:
+    """
+    Issues one /search/stream request and times the results and final events.
+    Protocol 2 sends results in their own event and a bare final event; httpx
+    decodes its compressed body transparently.
+    """
+    started = time.perf_counter()
+    timings = {"results": None, "done": None, "error": None}
+    try:
+        async with client.stream("GET", "/api/v1/search/stream", params={"q": query, "protocol": protocol}) as response:
+            if response.status_code != 200:
+                timings["error"] = f"HTTP {response.status_code}"
+                return timings
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if "error" in event:
+                    timings["error"] = event["error"]
+                if "results" in event and timings["results"] is None:
+                    timings["results"] = time.perf_counter() - started
+                if event.get("progress") == 100:
+                    timings["done"] = time.perf_counter() - started
+    except Exception as e:
+        timings["error"] = str(e)
+    return timings
+
+
+async def run_level(client, queries: list[str], concurrency: int, protocol: int = 1) -> dict:
+    """Closed loop: `concurrency` workers each issue their next request as soon as the last finishes."""
+    pending = iter(queries)
+    outcomes = []
+
+    async def worker():
+        for query in pending:
+            outcomes.append(await stream_one(client, query, protocol))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ok = [o for o in outcomes if o["error"] is None and o["done"] is not None]
+    return {
+        "concurrency": concurrency,
+        "protocol": protocol,
+        "requests": len(outcomes),
+        "errors": len(outcomes) - len(ok),
+        "seconds": elapsed,
+        "requests_per_sec": len(ok) / elapsed if elapsed else 0.0,
+        "time_to_results": summarize([o["results"] for o in ok if o["results"] is not None]),
+        "time_to_done": summarize([o["done"] for o in ok]),
+    }
+
+
+def build_query_stream(n: int, repeat_ratio: float, offset: int, seed: int = 0) -> list[str]:
+    import random
+
+    rng = random.Random(seed + offset)
+    fresh = iter(make_queries(n, offset=offset))
+    queries = []
+    for _ in range(n):
+        if queries and rng.random() < repeat_ratio:
+            queries.append(rng.choice(queries))
+        else:
+            queries.append(next(fresh))
+    return queries
+
+
+async def drive(args, base_url: str, process) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.e2e_concurrency) + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        startup = await wait_until_ready(client, process, args.e2e_startup_timeout)
+        print(f"Backend ready: {startup['startup_seconds']}")
+        levels = []
+        runs = [(protocol, concurrency) for concurrency in args.e2e_concurrency for protocol in args.e2e_protocols]
+        for i, (protocol, concurrency) in enumerate(runs):
+            # Each level gets its own queries so earlier levels don't warm the caches
+            queries = build_query_stream(args.e2e_requests, args.e2e_repeat_ratio, offset=(i + 1) * 1_000_000)
+            level = await run_level(client, queries, concurrency, protocol)
+            levels.append(level)
+            print(f"e2e protocol={protocol} concurrency={concurrency:<4} {level['requests_per_sec']:8.1f} req/s  "
+                  f"results p50 {level['time_to_results'].get('p50_ms', 0):8.1f} ms  "
+                  f"done p50 {level['time_to_done'].get('p50_ms', 0):8.1f} ms  errors {level['errors']}")
+        stats = (await client.get("/api/v1/search/stats")).json()
+    return {"startup_seconds": startup["startup_seconds"], "levels": levels, "service_stats": stats}
+
+
+def isolated_storage(tmp: str) -> dict:
+    """Environment overrides pointing every index, cache and thumbnail path into `tmp`."""
+    return {
+        "COLLECTION_EPOCH_PATH": os.path.join(tmp, "collection_epoch"),
+        "NUMPY_INDEX_DIR": os.path.join(tmp, "numpy_index"),
+        "ATTRIBUTE_INDEX_DIR": os.path.join(tmp, "attribute_index"),
+        "KEYWORD_INDEX_PATH": os.path.join(tmp, "keyword_index.sqlite3"),
+        "CAPTION_CACHE_PATH": os.path.join(tmp, "captions.sqlite3"),
+        "EXPLANATION_CACHE_PATH": os.path.join(tmp, "explanations.sqlite3"),
+        "THUMBNAIL_DIR": os.path.join(tmp, "thumbnails"),
+    }
+
+
+def run(args) -> dict:
+    import chromadb
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chroma_dir = os.path.join(tmp, "chromadb")
+        build_chroma_collection(chromadb.PersistentClient(path=chroma_dir), random_unit_vectors(args.e2e_collection_size))
+
+        ollama_port, api_port = free_port(), free_port()
+        stub = serve_in_thread(create_app(args.e2e_llm_tokens, args.e2e_llm_token_ms), ollama_port)
+        process = start_backend(api_port, {
+            "VECTOR_BACKEND": "chroma",
+            "CHROMA_PERSIST_DIR": chroma_dir,
+            "CHROMA_COLLECTION_NAME": SYNTHETIC_COLLECTION_NAME,
+            **isolated_storage(tmp),
+            "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama_port}",
+        })
+        try:
+            results = asyncio.run(drive(args, f"http://127.0.0.1:{api_port}", process))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            stub.should_exit = True
+
+    return {
+        "collection_size": args.e2e_collection_size,
+        "repeat_ratio": args.e2e_repeat_ratio,
+        "llm_tokens": args.e2e_llm_tokens,
+        "llm_token_ms": args.e2e_llm_token_ms,
+        "protocols": args.e2e_protocols,
+        **results,
+    }
@@ -0,0 +1,119 @@
+"""
+CLIP text encoding latency.
+
+Measures `CLIPService.encode_text` for single queries and `CLIPService.encode_texts`
+at batch sizes from 1 to 256, reporting per-batch latency and per-query cost.
+Then drives `CLIPService.encode_text_batched` (the micro-batcher the API uses)
+with concurrent callers, reporting throughput, latency, the batch sizes the
+batcher formed and how long queries waited in its queue.
+Uses whichever backend CLIP_INFERENCE_BACKEND selects.
+"""
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services.executors import StageSaturated
+from benchmarks.common import measure, summarize
+
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+DEFAULT_CONCURRENCY = [1, 8, 32, 128]
+WORDS = [
+    "dog", "beach", "sunset", "mountain", "city", "night", "forest", "snow", "coffee", "car",
+    "cat", "river", "bridge", "flowers", "desert", "street", "portrait", "bicycle", "boat", "sky",
+]
+
+
+def make_queries(n: int, offset: int = 0) -> list[str]:
+    """Distinct short queries, so nothing is served from a cache."""
+    return [
+        f"{WORDS[i % len(WORDS)]} {WORDS[(i // len(WORDS)) % len(WORDS)]} photo {i}"
+        for i in range(offset, offset + n)
+    ]
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("encode")
+    group.add_argument("--encode-batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    group.add_argument("--encode-repeats", type=int, default=20)
+    group.add_argument("--encode-concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY,
+                       help="Concurrent callers of encode_text_batched")
+    group.add_argument("--encode-batched-queries", type=int, default=512, help="Queries per concurrency level")
+
+
+async def run_batched_level(clip, queries: list[str], concurrency: int) -> dict:
+    """Closed loop: `concurrency` callers each submit their next query as soon as the last one is encoded."""
+    pending = iter(queries)
+    latencies = []
+    rejected = 0
+
+    async def caller():
+        nonlocal rejected
+        for query in pending:
+            started = time.perf_counter()
+            try:
+                await clip.encode_text_batched(query)
+            except StageSaturated:
+                rejected += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    before = clip.get_batcher_stats()
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = clip.get_batcher_stats()
+
+    items = after["items"] - before["items"]
+    batches = after["batches"] - before["batches"]
+    queue_wait = after["queue_wait_seconds_total"] - before["queue_wait_seconds_total"]
+    return {
+        "concurrency": concurrency,
+        "queries": len(latencies),
+        "rejected": rejected,
+        "seconds": elapsed,
+        "queries_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies),
+        "avg_batch_size": items / batches if batches else 0.0,
+        "avg_queue_wait_ms": 1000 * queue_wait / items if items else 0.0,
+    }
+
+
+def run(args) -> dict:
+    from app.services.clip_service import get_clip_service
+
+    clip = get_clip_service()
+    single = make_queries(args.encode_repeats)
+    samples = iter(single)
+    results = {
+        "backend": settings.CLIP_INFERENCE_BACKEND,
+        "model": settings.CLIP_MODEL_NAME,
+        "encode_text": summarize(measure(lambda: clip.encode_text(next(samples)), len(single) - 1)),
+        "encode_texts": [],
+    }
+    print(f"encode_text: p50 {results['encode_text']['p50_ms']:.2f} ms")
+
+    for batch_size in args.encode_batch_sizes:
+        texts = make_queries(batch_size, offset=batch_size * 1000)
+        # Large batches are slow; fewer repeats keep the run bounded
+        repeats = max(3, args.encode_repeats * 8 // max(8, batch_size))
+        summary = summarize(measure(lambda: clip.encode_texts(texts), repeats))
+        summary["batch_size"] = batch_size
+        summary["per_query_ms"] = summary["p50_ms"] / batch_size
+        summary["queries_per_sec"] = 1000 * batch_size / summary["p50_ms"]
+        results["encode_texts"].append(summary)
+        print(f"encode_texts batch={batch_size:<4} p50 {summary['p50_ms']:9.2f} ms  "
+              f"{summary['per_query_ms']:7.3f} ms/query  {summary['queries_per_sec']:9.1f} q/s")
+
+    results["encode_text_batched"] = {
+        "max_batch_size": settings.CLIP_BATCH_MAX_SIZE,
+        "max_wait_ms": settings.CLIP_BATCH_MAX_WAIT_MS,
+        "levels": [],
+    }
+    for i, concurrency in enumerate(args.encode_concurrency):
+        queries = make_queries(args.encode_batched_queries, offset=(i + 1) * 1_000_000)
+        level = asyncio.run(run_batched_level(clip, queries, concurrency))
+        results["encode_text_batched"]["levels"].append(level)
+        print(f"encode_text_batched concurrency={concurrency:<4} {level['queries_per_sec']:9.1f} q/s  "
+              f"p50 {level['latency'].get('p50_ms', 0.0):8.2f} ms  batch {level['avg_batch_size']:5.1f}  "
+              f"queue wait {level['avg_queue_wait_ms']:6.2f} ms  ({level['rejected']} rejected)")
+    return results
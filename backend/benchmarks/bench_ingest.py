@@ -0,0 +1,58 @@
+"""
+Ingestion throughput.
+
+Writes synthetic JPEGs to a temporary directory and runs the
+scripts/generate_embeddings.py pipeline (decode pool -> CLIP -> ChromaDB writer)
+into a throwaway collection, reporting images/sec for each worker count.
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.common import write_synthetic_images
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("ingest")
+    group.add_argument("--ingest-images", type=int, default=512)
+    group.add_argument("--ingest-image-size", type=int, default=800, help="Side of the synthetic JPEGs in pixels")
+    group.add_argument("--ingest-batch-size", type=int, default=64)
+    group.add_argument("--ingest-workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+
+
+def run(args) -> dict:
+    import chromadb
+    from scripts import generate_embeddings
+    from sentence_transformers import SentenceTransformer
+
+    device = generate_embeddings.torch_device()
+    model = SentenceTransformer(generate_embeddings.MODEL_NAME, device=device)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        image_dir = os.path.join(tmp, "images")
+        started = time.perf_counter()
+        files = write_synthetic_images(image_dir, args.ingest_images, size=args.ingest_image_size)
+        print(f"Wrote {len(files)} synthetic images in {time.perf_counter() - started:.1f}s")
+
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chromadb"))
+        for workers in dict.fromkeys(args.ingest_workers):
+            collection_name = f"ingest-{workers}"
+            collection = client.create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
+            started = time.perf_counter()
+            indexed, failures = generate_embeddings.run_pipeline(
+                files, model, collection, batch_size=args.ingest_batch_size, workers=workers, image_dir=image_dir
+            )
+            elapsed = time.perf_counter() - started
+            client.delete_collection(collection_name)
+            entry = {
+                "workers": workers,
+                "batch_size": args.ingest_batch_size,
+                "images": len(files),
+                "indexed": indexed,
+                "failed": len(failures),
+                "seconds": elapsed,
+                "images_per_sec": indexed / elapsed if elapsed else 0.0,
+            }
+            results.append(entry)
+            print(f"ingest workers={workers:<3} {entry['images_per_sec']:8.1f} images/sec ({indexed} indexed, {len(failures)} failed)")
+    return {"device": device, "image_size": args.ingest_image_size, "results": results}
@@ -0,0 +1,87 @@
+"""
+Vector search latency and recall.
+
+For each synthetic collection size, builds a ChromaDB collection of random
+unit vectors and measures `ChromaDBService.search` latency and recall@k
+against exact brute force at several `top_k`. Queries are stored vectors
+plus Gaussian noise, as in scripts/compare_vector_backends.py. The NumPy
+backend can be measured on the same collections with `--search-backends`.
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.common import build_chroma_collection, random_unit_vectors, summarize, synthetic_ids
+from scripts.compare_vector_backends import exact_top_k, make_queries
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("search")
+    group.add_argument("--search-sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    group.add_argument("--search-top-k", type=int, nargs="+", default=[1, 5, 10, 50])
+    group.add_argument("--search-queries", type=int, default=200)
+    group.add_argument("--search-noise", type=float, default=0.05)
+    group.add_argument("--search-backends", nargs="+", choices=["chroma", "numpy", "numpy-int8"], default=["chroma"])
+    group.add_argument("--search-shards", type=int, default=1, help="Row-range shards for the NumPy backends")
+
+
+def evaluate(service, queries, truth_rows, id_to_row, k) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth_rows):
+        started = time.perf_counter()
+        result = service.search(query, top_k=k, include=["distances"])
+        latencies.append(time.perf_counter() - started)
+        hits += len(expected & {id_to_row[id_] for id_ in result["ids"][0]})
+
+    started = time.perf_counter()
+    service.search_batch(queries, top_k=k, include=["distances"])
+    batch_seconds = time.perf_counter() - started
+    return {
+        "top_k": k,
+        "recall": hits / (len(truth_rows) * k),
+        **summarize(latencies),
+        "batched_queries_per_sec": len(queries) / batch_seconds,
+    }
+
+
+def open_backend(name, collection, tmp, shards=1):
+    from app.services.chromadb_service import ChromaDBService
+
+    if name == "chroma":
+        return ChromaDBService.from_collection(collection)
+    from app.services.numpy_vector_service import NumpyVectorService
+    from scripts.build_vector_index import build_index
+
+    quantize = "int8" if name == "numpy-int8" else None
+    index_dir = os.path.join(tmp, f"{name}-{collection.count()}")
+    build_index(collection, index_dir, quantize=quantize)
+    return NumpyVectorService.from_directory(index_dir, shards=shards)
+
+
+def run(args) -> dict:
+    import chromadb
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chromadb"))
+        for size in args.search_sizes:
+            vectors = random_unit_vectors(size)
+            started = time.perf_counter()
+            collection = build_chroma_collection(client, vectors)
+            build_seconds = time.perf_counter() - started
+            print(f"Built synthetic collection of {size} vectors in {build_seconds:.1f}s")
+
+            queries = make_queries(vectors, args.search_queries, args.search_noise)
+            id_to_row = {id_: row for row, id_ in enumerate(synthetic_ids(size))}
+            for backend_name in args.search_backends:
+                service = open_backend(backend_name, collection, tmp, args.search_shards)
+                for k in args.search_top_k:
+                    k = min(k, size)
+                    truth = exact_top_k(vectors, queries, k)
+                    entry = {"backend": backend_name, "collection_size": size, "build_seconds": build_seconds,
+                             **evaluate(service, queries, truth, id_to_row, k)}
+                    results.append(entry)
+                    print(f"{backend_name:<11} n={size:<8} k={k:<4} recall {entry['recall']:.4f}  "
+                          f"p50 {entry['p50_ms']:7.2f} ms  p95 {entry['p95_ms']:7.2f} ms  "
+                          f"batched {entry['batched_queries_per_sec']:9.1f} q/s")
+    return {"queries": args.search_queries, "noise": args.search_noise, "results": results}
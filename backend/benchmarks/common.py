@@ -0,0 +1,125 @@
+"""
+Shared helpers for the benchmark suites: synthetic data, timing summaries and
+the JSON result format.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+EMBEDDING_DIM = 512 # clip-ViT-B-32
+SYNTHETIC_COLLECTION_NAME = "benchmark"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def random_unit_vectors(n: int, dim: int = EMBEDDING_DIM, seed: int = 0) -> np.ndarray:
+    """Random L2-normalized float32 vectors (a stand-in for CLIP image embeddings)."""
+    vectors = np.random.default_rng(seed).standard_normal((n, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_ids(n: int) -> list[str]:
+    return [f"synthetic-{i:08d}" for i in range(n)]
+
+
+def build_chroma_collection(client, vectors: np.ndarray, name: str = SYNTHETIC_COLLECTION_NAME, batch_size: int = 5000):
+    """Creates (or replaces) a cosine collection holding `vectors`, with filename metadata like ingestion writes."""
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    collection = client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+    ids = synthetic_ids(len(vectors))
+    for start in range(0, len(vectors), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        collection.add(
+            ids=batch_ids,
+            embeddings=vectors[start:start + batch_size].tolist(),
+            metadatas=[{"filename": f"{id_}.jpg"} for id_ in batch_ids],
+        )
+    return collection
+
+
+def write_synthetic_images(directory: str, n: int, size: int = 640, seed: int = 0) -> list[str]:
+    """Writes `n` JPEGs of smooth random gradients plus noise; returns their filenames."""
+    from PIL import Image
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 1, size, dtype=np.float32)
+    filenames = []
+    for i in range(n):
+        base = rng.uniform(0, 255, 3).astype(np.float32)
+        tilt = rng.uniform(-128, 128, (2, 3)).astype(np.float32)
+        pixels = base + ramp[:, None, None] * tilt[0] + ramp[None, :, None] * tilt[1]
+        pixels += rng.normal(scale=12, size=(size, size, 3)).astype(np.float32)
+        filename = f"synthetic-{i:08d}.jpg"
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(os.path.join(directory, filename), quality=90)
+        filenames.append(filename)
+    return filenames
+
+
+def measure(fn, repeats: int, warmup: int = 1) -> list[float]:
+    """Calls `fn` `warmup` times untimed, then returns `repeats` wall-clock samples in seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize(samples_seconds) -> dict:
+    """Latency percentiles in milliseconds."""
+    ms = np.asarray(samples_seconds, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def environment_info() -> dict:
+    """Machine and code version, so result files from different runs can be compared fairly."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    info = {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        import torch
+
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+        info["cuda"] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    except ImportError:
+        pass
+    return info
+
+
+def write_results(results: dict, path: str | None = None) -> str:
+    """Writes a run to `path`, or to benchmarks/results/<UTC timestamp>.json by default."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + ".json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    return path
@@ -0,0 +1,58 @@
+"""
+Benchmark Comparison
+--------------------
+Prints the numeric metrics of two benchmark runs side by side with the relative
+change, e.g. to check a branch against a baseline run.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python benchmarks/compare_results.py benchmarks/results/base.json benchmarks/results/new.json
+    Add --filter p50 to only show metrics whose path contains 'p50'.
+"""
+import argparse
+import json
+
+# List entries are keyed by these fields instead of their position, so runs with
+# different parameter sweeps still line up
+ENTRY_KEYS = ("backend", "collection_size", "top_k", "batch_size", "workers", "protocol", "concurrency")
+
+
+def flatten(value, prefix=""):
+    """Yields (path, number) for every numeric leaf."""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from flatten(child, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            if isinstance(child, dict):
+                label = ",".join(f"{k}={child[k]}" for k in ENTRY_KEYS if k in child) or str(i)
+            else:
+                label = str(i)
+            yield from flatten(child, f"{prefix}[{label}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--filter", help="Only show metric paths containing this substring")
+    args = parser.parse_args()
+
+    runs = []
+    for path in (args.baseline, args.candidate):
+        with open(path) as f:
+            runs.append(dict(flatten(json.load(f)["suites"])))
+    baseline, candidate = runs
+
+    print(f"{'metric':<72}{'baseline':>14}{'candidate':>14}{'change':>10}")
+    for path in sorted(baseline.keys() & candidate.keys()):
+        if args.filter and args.filter not in path:
+            continue
+        before, after = baseline[path], candidate[path]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{path:<72}{before:>14.4f}{after:>14.4f}{change:>10}")
+
+
+if __name__ == "__main__":
+    main()
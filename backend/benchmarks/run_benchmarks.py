@@ -0,0 +1,68 @@
+"""
+Benchmark Runner
+----------------
+Runs the benchmark suites and writes one JSON file per run, so results can be
+compared across commits with benchmarks/compare_results.py.
+
+Suites:
+    encode  CLIP text encoding latency at batch sizes 1..256, and micro-batcher throughput under concurrency
+    search  ChromaDB search latency and recall@k vs exact brute force on synthetic collections
+    ingest  scripts/generate_embeddings.py pipeline throughput on synthetic images
+    e2e     /search/stream throughput under concurrent load with a stub Ollama
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python benchmarks/run_benchmarks.py [--suites encode search] [--output run.json]
+    PYTHONPATH=. python benchmarks/run_benchmarks.py --suites search --search-sizes 1000 100000 --search-top-k 10
+Results go to benchmarks/results/<UTC timestamp>.json unless --output is given.
+"""
+import argparse
+import time
+import traceback
+
+from benchmarks import bench_e2e, bench_encode, bench_ingest, bench_search
+from benchmarks.common import environment_info, write_results
+
+SUITES = {
+    "encode": bench_encode,
+    "search": bench_search,
+    "ingest": bench_ingest,
+    "e2e": bench_e2e,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the search and ingestion benchmarks.")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--label", help="Free-form note stored with the run, e.g. the change being measured")
+    for suite in SUITES.values():
+        suite.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    run = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "label": args.label,
+        "environment": environment_info(),
+        "arguments": vars(args),
+        "suites": {},
+    }
+    for name in args.suites:
+        print(f"\n--- Running '{name}' benchmark ---")
+        started = time.perf_counter()
+        try:
+            run["suites"][name] = SUITES[name].run(args)
+        except Exception as e:
+            # Keep the other suites' results if one of them fails
+            traceback.print_exc()
+            run["suites"][name] = {"error": str(e)}
+        run["suites"][name]["suite_seconds"] = time.perf_counter() - started
+
+    path = write_results(run, args.output)
+    print(f"\nResults written to '{path}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+A minimal stand-in for the Ollama `/api/generate` endpoint.
+
+Streams a fixed number of tokens with a fixed delay, so end-to-end benchmarks
+measure the search service rather than LLM speed.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+
+
+def create_app(tokens: int = 20, token_delay_ms: float = 10.0):
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    words = ["This", "result", "matches", "the", "query", "because", "it", "shows", "the", "scene"]
+
+    @app.post("/api/generate")
+    async def generate(body: dict):
+        pieces = [f" {words[i % len(words)]}" for i in range(tokens)]
+
+        async def stream():
+            for piece in pieces:
+                await asyncio.sleep(token_delay_ms / 1000)
+                yield json.dumps({"model": body["model"], "response": piece, "done": False}) + "\n"
+            yield json.dumps({"model": body["model"], "response": "", "done": True}) + "\n"
+
+        if body.get("stream", True):
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+        await asyncio.sleep(tokens * token_delay_ms / 1000)
+        return {"model": body["model"], "response": "".join(pieces), "done": True}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(app, port: int):
+    """Starts uvicorn in a daemon thread and returns the server once it accepts connections."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Stub Ollama server did not start")
+        time.sleep(0.05)
+    return server
@@ -36,8 +36,22 @@ echo "--- Running data preparation scripts ---"
 export PYTHONPATH=.
 echo "Step 3a: Downloading images..."
 python scripts/download_images.py
-echo "Step 3b: Generating embeddings..."
-python scripts/generate_embeddings.py
+echo "Step 3b: Generating thumbnails..."
+python scripts/generate_thumbnails.py
+echo "Step 3c: Generating embeddings..."
+python scripts/generate_embeddings.py --sync
+echo "Step 3d: Building attribute indexes..."
+python scripts/build_attribute_index.py --backfill
+echo "Step 3e: Building keyword index..."
+if [ "$KEYWORD_CAPTIONS" = "true" ]; then
+    python scripts/build_keyword_index.py --captions
+else
+    python scripts/build_keyword_index.py
+fi
+if [ "$VECTOR_BACKEND" = "numpy" ]; then
+    echo "Step 3f: Building memory-mapped vector index..."
+    python scripts/build_vector_index.py
+fi
 
 
 echo "--- VICKY VISUAL SEARCH INITIALIZATION COMPLETE ---"
\ No newline at end of file
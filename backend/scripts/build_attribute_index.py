@@ -0,0 +1,107 @@
+"""
+Attribute Index Builder
+-----------------------
+Builds the bitmap attribute indexes used by filtered search (orientation, color,
+width/height, capture year) from the attributes stored in the collection's
+metadata at ingestion. The collection is read in pages and the index is swapped
+in atomically, so running servers pick it up on their next filtered query.
+
+With --backfill, images that were indexed before attributes were extracted are
+opened once to extract them, and their metadata is updated in place; their
+vectors are left untouched.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/build_attribute_index.py [--backfill] [--output storage/attribute_index]
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import chromadb
+from PIL import Image
+from tqdm import tqdm
+
+from app.core.config import settings
+from app.services.attribute_index import build_attribute_index
+from app.services.image_attributes import extract_attributes
+from scripts.download_images import load_original_sizes
+from scripts.staged_directory import staged_directory
+
+PAGE_SIZE = 5000
+BACKFILL_WORKERS = os.cpu_count() or 1
+
+def read_attributes(filename, original_size=None, image_dir=settings.IMAGES_DIR):
+    """Extracts one image's attributes (runs in a worker process); None if it can't be opened."""
+    try:
+        with Image.open(os.path.join(image_dir, filename)) as img:
+            return extract_attributes(img, original_size)
+    except Exception:
+        return None
+
+def backfill_attributes(collection, ids, metadatas, workers=BACKFILL_WORKERS, page_size=PAGE_SIZE):
+    """Adds attributes to rows missing them, updating `metadatas` and the collection."""
+    missing = [i for i, metadata in enumerate(metadatas) if "orientation" not in metadata and metadata.get("filename")]
+    if not missing:
+        return 0
+    updated = 0
+    original_sizes = load_original_sizes()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in tqdm(range(0, len(missing), page_size), desc="Backfilling attributes"):
+            rows = missing[start:start + page_size]
+            filenames = [metadatas[i]["filename"] for i in rows]
+            extracted = pool.map(
+                read_attributes, filenames, [original_sizes.get(f) for f in filenames], chunksize=64
+            )
+            changed = []
+            for row, attributes in zip(rows, extracted):
+                if attributes is not None:
+                    metadatas[row] = {**metadatas[row], **attributes}
+                    changed.append(row)
+            if changed:
+                collection.update(ids=[ids[i] for i in changed], metadatas=[metadatas[i] for i in changed])
+                updated += len(changed)
+    return updated
+
+def read_metadata(collection, page_size=PAGE_SIZE):
+    """Reads every id and metadata dict from the collection, one page at a time."""
+    ids, metadatas = [], []
+    count = collection.count()
+    with tqdm(total=count, desc="Reading metadata") as pbar:
+        for offset in range(0, count, page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            pbar.update(len(page["ids"]))
+    return ids, metadatas
+
+def build_index(collection, output_dir, backfill=False, page_size=PAGE_SIZE):
+    ids, metadatas = read_metadata(collection, page_size)
+
+    if backfill:
+        print(f"Backfilled attributes for {backfill_attributes(collection, ids, metadatas)} images.")
+
+    # Built next to the target and swapped in, so servers never open a partial index
+    with staged_directory(output_dir) as tmp_dir:
+        with_attributes = build_attribute_index(tmp_dir, ids, metadatas)
+    print(f"Wrote attribute index for {len(ids)} images ({with_attributes} with attributes) to '{output_dir}'.")
+    if with_attributes < len(ids):
+        print("Images without attributes never match a filter; run with --backfill to extract them.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build bitmap attribute indexes for filtered search.")
+    parser.add_argument("--output", default=settings.ATTRIBUTE_INDEX_DIR)
+    parser.add_argument("--backfill", action="store_true", help="Extract attributes for images indexed without them")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    collection = client.get_or_create_collection(
+        name=settings.CHROMA_COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine"}
+    )
+    build_index(collection, args.output, backfill=args.backfill, page_size=args.page_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Keyword Index Builder
+---------------------
+Builds the SQLite FTS5 (BM25) index used for hybrid retrieval. Each image in the
+collection gets one text document made of:
+    - the CSV_TEXT_COLUMNS of its row in CSV_PATH, when the CSV has them
+      (images are named by CSV row index, e.g. 00042.jpg is row 42)
+    - with --captions, a one-sentence caption written by the Ollama model; captions
+      are cached per file in CAPTION_CACHE_PATH, so reruns only caption new images
+Attributes (color, orientation) are left out: they are served by filters, and as
+the only text of an image they would make every color word match arbitrary images.
+The index is written next to the target and swapped in, so running servers pick
+it up on their next query. Without any text, no index is written and hybrid
+search stays off.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/build_keyword_index.py [--captions] [--caption-workers 2]
+"""
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import chromadb
+import pandas as pd
+from tqdm import tqdm
+
+from app.core.config import settings
+from app.services.keyword_index import build_keyword_index
+from scripts.build_attribute_index import PAGE_SIZE, read_metadata
+from scripts.embedding_manifest import scan_directory
+
+CAPTION_WORKERS = 2 # Concurrent caption requests to Ollama
+
+class CaptionCache:
+    """SQLite table of generated captions, keyed by filename and invalidated by mtime/size or model."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS captions ("
+            "filename TEXT PRIMARY KEY, file_state TEXT NOT NULL, model TEXT NOT NULL, "
+            "caption TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def load(self, model: str) -> dict[str, tuple[str, str]]:
+        """Returns filename -> (file_state, caption) for captions written by `model`."""
+        rows = self._conn.execute("SELECT filename, file_state, caption FROM captions WHERE model = ?", (model,))
+        return {row[0]: row[1:] for row in rows}
+
+    def put(self, filename: str, file_state: str, model: str, caption: str):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO captions (filename, file_state, model, caption, created_at) VALUES (?, ?, ?, ?, ?)",
+                (filename, file_state, model, caption, time.time())
+            )
+
+    def close(self):
+        self._conn.close()
+
+def load_csv_text(csv_path=settings.CSV_PATH, columns=settings.CSV_TEXT_COLUMNS) -> dict[int, str]:
+    """Returns CSV row index -> joined text of the configured columns that the CSV actually has."""
+    if not os.path.exists(csv_path):
+        return {}
+    present = [column for column in columns if column in pd.read_csv(csv_path, nrows=0).columns]
+    if not present:
+        print(f"'{csv_path}' has none of the text columns {columns}; skipping CSV text.")
+        return {}
+    frame = pd.read_csv(csv_path, usecols=present)
+    texts = {}
+    for index, values in zip(frame.index, frame.itertuples(index=False)):
+        text = " ".join(str(value) for value in values if pd.notna(value)).strip()
+        if text:
+            texts[int(index)] = text
+    return texts
+
+def generate_captions(filenames, image_dir=settings.IMAGES_DIR, workers=CAPTION_WORKERS) -> dict[str, str]:
+    """Returns filename -> caption, asking the Ollama model only for images without a cached one."""
+    import ollama
+
+    cache = CaptionCache(settings.CAPTION_CACHE_PATH)
+    try:
+        states = {f: f"{mtime_ns}:{size}" for f, (mtime_ns, size) in scan_directory(image_dir).items()}
+        cached = cache.load(settings.OLLAMA_MODEL)
+        captions = {f: cached[f][1] for f in filenames if f in cached and cached[f][0] == states.get(f)}
+        todo = [f for f in filenames if f not in captions and f in states]
+        print(f"{len(captions)} cached captions, {len(todo)} to generate with '{settings.OLLAMA_MODEL}'.")
+
+        client = ollama.Client(host=settings.OLLAMA_BASE_URL)
+        def caption(filename):
+            response = client.generate(
+                model=settings.OLLAMA_MODEL,
+                prompt=settings.CAPTION_PROMPT,
+                images=[os.path.join(image_dir, filename)]
+            )
+            return response["response"].strip()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(caption, f): f for f in todo}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Captioning"):
+                filename = futures[future]
+                try:
+                    captions[filename] = future.result()
+                except Exception as e:
+                    print(f"\nCould not caption {filename}: {e}")
+                    continue
+                cache.put(filename, states[filename], settings.OLLAMA_MODEL, captions[filename])
+        return captions
+    finally:
+        cache.close()
+
+def build_documents(ids, metadatas, csv_text, captions):
+    """Yields (id, filename, text) rows; images without any text are left out."""
+    for id_, metadata in zip(ids, metadatas):
+        filename = metadata.get("filename", "")
+        stem = os.path.splitext(filename)[0]
+        parts = [
+            csv_text.get(int(stem)) if stem.isdigit() else None,
+            captions.get(filename),
+        ]
+        text = " ".join(part for part in parts if part)
+        if text:
+            yield id_, filename, text
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 keyword index for hybrid search.")
+    parser.add_argument("--output", default=settings.KEYWORD_INDEX_PATH)
+    parser.add_argument("--captions", action="store_true", help="Generate image captions with the Ollama model")
+    parser.add_argument("--caption-workers", type=int, default=CAPTION_WORKERS)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    collection = client.get_or_create_collection(
+        name=settings.CHROMA_COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine"}
+    )
+    ids, metadatas = read_metadata(collection, args.page_size)
+    csv_text = load_csv_text()
+    captions = {}
+    if args.captions:
+        captions = generate_captions([m["filename"] for m in metadatas if m.get("filename")], workers=args.caption_workers)
+    count = build_keyword_index(args.output, build_documents(ids, metadatas, csv_text, captions))
+    if count == 0:
+        print("No image has CSV text or a caption; no keyword index was written and hybrid search stays off.")
+        print("Add text columns to the CSV or run with --captions.")
+        return
+    print(f"Indexed text for {count} of {len(ids)} images into '{args.output}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+NumPy Vector Index Builder
+--------------------------
+Exports the embeddings stored in ChromaDB into the memory-mapped index used by the
+"numpy" vector backend (VECTOR_BACKEND=numpy). The collection is read in pages, so
+the whole collection never has to fit in memory at once.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/build_vector_index.py [--quantize int8] [--output storage/numpy_index]
+"""
+import argparse
+
+import chromadb
+from tqdm import tqdm
+
+from app.core.config import settings
+from app.services.cache_service import bump_collection_epoch
+from app.services.numpy_index import NumpyIndexWriter
+from scripts.staged_directory import staged_directory
+
+PAGE_SIZE = 5000
+
+def build_index(collection, output_dir, quantize=None, page_size=PAGE_SIZE):
+    """
+    Streams every vector in the collection into a new index directory.
+
+    The index is built next to the target and swapped in at the end, so a
+    running server never maps a half-written index; servers re-map it on
+    their next query. Returns the number of vectors written.
+    """
+    count = collection.count()
+    if count == 0:
+        print("Collection is empty. Nothing to export.")
+        return 0
+
+    first = collection.get(limit=1, include=["embeddings"])
+    dim = len(first["embeddings"][0])
+    with staged_directory(output_dir) as tmp_dir:
+        writer = NumpyIndexWriter(tmp_dir, count, dim, quantize=quantize)
+        with tqdm(total=count, desc="Exporting vectors") as pbar:
+            for offset in range(0, count, page_size):
+                page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+                if not page["ids"]:
+                    break
+                writer.add(page["ids"], page["embeddings"], page["metadatas"])
+                pbar.update(len(page["ids"]))
+        writer.close(model_name=settings.CLIP_MODEL_NAME)
+    print(f"Wrote {count} vectors ({quantize or 'float16'}) to '{output_dir}'.")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Export ChromaDB embeddings to a memory-mapped NumPy index.")
+    parser.add_argument("--output", default=settings.NUMPY_INDEX_DIR)
+    parser.add_argument("--quantize", choices=["int8"], default=None, help="Also store int8 vectors for the first-pass scan")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    collection = client.get_or_create_collection(
+        name=settings.CHROMA_COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine"}
+    )
+    if build_index(collection, args.output, quantize=args.quantize, page_size=args.page_size):
+        # Cached results may hold ids or distances from the previous index
+        print(f"Collection epoch bumped to {bump_collection_epoch()}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+ONNX Parity Check and Latency Benchmark
+---------------------------------------
+Compares the exported ONNX CLIP towers (fp32 and, if exported, int8) with the
+PyTorch sentence-transformers model: cosine agreement of the embeddings, top-k
+retrieval overlap of text queries against the image embeddings, and encode latency.
+
+Usage (from the 'backend' folder, after scripts/export_onnx.py):
+    PYTHONPATH=. python scripts/check_onnx_parity.py [--images 64] [--threads 4] [--json parity.json]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import settings
+from app.services.numpy_index import normalize_rows
+from app.services.onnx_clip import IMAGE_MODEL_FILE, OnnxClipEncoder, model_path
+
+SAMPLE_QUERIES = [
+    "dog on beach", "sunset over the ocean", "mountains with trees under the blue sky",
+    "city skyline at night", "a bowl of fresh fruit", "person riding a bicycle",
+    "snowy forest", "coffee cup on a wooden table", "red sports car", "cat sleeping on a sofa",
+    "waterfall in the jungle", "people walking in a busy street", "aerial view of a beach",
+    "flowers in a garden", "old building with columns", "desert with sand dunes",
+]
+
+def load_images(n):
+    """Uses indexed images when available, otherwise random noise images."""
+    images = []
+    if os.path.isdir(settings.IMAGES_DIR):
+        for name in sorted(os.listdir(settings.IMAGES_DIR))[:n]:
+            if name.lower().endswith('.jpg'):
+                with Image.open(os.path.join(settings.IMAGES_DIR, name)) as img:
+                    images.append(img.convert('RGB'))
+    rng = np.random.default_rng(0)
+    while len(images) < n:
+        images.append(Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8)))
+    return images
+
+def timed(fn, repeats):
+    fn() # Warm up
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples) * 1000)
+
+def cosine_rows(a, b):
+    return np.sum(normalize_rows(a) * normalize_rows(b), axis=1)
+
+def top_k_overlap(text_a, image_a, text_b, image_b, k):
+    top_a = np.argsort(-(normalize_rows(text_a) @ normalize_rows(image_a).T), axis=1)[:, :k]
+    top_b = np.argsort(-(normalize_rows(text_b) @ normalize_rows(image_b).T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(top_a, top_b)]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ONNX vs PyTorch CLIP parity and latency.")
+    parser.add_argument("--model-dir", default=settings.ONNX_MODEL_DIR)
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=settings.ONNX_INTRA_OP_THREADS)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    images = load_images(args.images)
+    reference = SentenceTransformer(settings.CLIP_MODEL_NAME, device='cpu')
+    encode_torch = lambda x, bs: reference.encode(x, batch_size=bs, convert_to_numpy=True, show_progress_bar=False)
+    ref_text = encode_torch(SAMPLE_QUERIES, 32)
+    ref_image = encode_torch(images, 32)
+
+    backends = [("torch", encode_torch)]
+    for int8 in (False, True):
+        if int8 and not os.path.exists(model_path(args.model_dir, IMAGE_MODEL_FILE, int8=True)):
+            continue
+        encoder = OnnxClipEncoder(args.model_dir, int8=int8, intra_op_threads=args.threads)
+        backends.append(("onnx-int8" if int8 else "onnx-fp32", lambda x, bs, e=encoder: e.encode(x, batch_size=bs)))
+
+    results = []
+    for name, encode in backends:
+        text, image = encode(SAMPLE_QUERIES, 32), encode(images, 32)
+        text_cos, image_cos = cosine_rows(text, ref_text), cosine_rows(image, ref_image)
+        results.append({
+            "backend": name,
+            "text_cosine_mean": float(text_cos.mean()), "text_cosine_min": float(text_cos.min()),
+            "image_cosine_mean": float(image_cos.mean()), "image_cosine_min": float(image_cos.min()),
+            f"top{args.top_k}_overlap": top_k_overlap(text, image, ref_text, ref_image, min(args.top_k, len(images))),
+            "text_ms_batch1": timed(lambda: encode(SAMPLE_QUERIES[:1], 1), args.repeats),
+            "text_ms_batch16": timed(lambda: encode(SAMPLE_QUERIES, 16), args.repeats),
+            "image_ms_batch1": timed(lambda: encode(images[:1], 1), args.repeats),
+            "image_ms_batch32": timed(lambda: encode(images[:32], 32), max(1, args.repeats // 2)),
+        })
+
+    columns = ["text_cosine_min", "image_cosine_min", f"top{args.top_k}_overlap",
+               "text_ms_batch1", "text_ms_batch16", "image_ms_batch1", "image_ms_batch32"]
+    print(f"\n{'backend':<12}" + "".join(f"{c:>18}" for c in columns))
+    for r in results:
+        print(f"{r['backend']:<12}" + "".join(f"{r[c]:>18.4f}" for c in columns))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model": settings.CLIP_MODEL_NAME, "images": len(images), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Vector Backend Comparison
+-------------------------
+Measures recall@k and latency of the ChromaDB (HNSW) backend and the NumPy
+memory-mapped backend (float16 and int8 + rescoring) against exact float32
+brute force over the same collection.
+
+Queries are stored vectors perturbed with Gaussian noise, so results do not
+depend on the CLIP model being available.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/compare_vector_backends.py [--queries 200] [--top-k 10] [--json results.json]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from app.core.config import settings
+from app.services.numpy_index import normalize_rows
+from app.services.numpy_vector_service import NumpyVectorService
+from scripts.build_vector_index import build_index
+
+def load_all_vectors(collection, page_size=5000):
+    """Pulls every id and embedding from the collection as float32 (ground-truth source)."""
+    ids, vectors = [], []
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return ids, normalize_rows(np.concatenate(vectors))
+
+def make_queries(vectors, n, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=noise, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    return normalize_rows(queries)
+
+def exact_top_k(vectors, queries, k):
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+def evaluate(name, search_batch, queries, truth, ids, k):
+    """Runs single-query and batched searches and returns recall and latency figures."""
+    id_to_row = {id_: i for i, id_ in enumerate(ids)}
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = search_batch(query[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        hits += len(expected & {id_to_row[r] for r in result["ids"][0]})
+
+    started = time.perf_counter()
+    search_batch(queries, k)
+    batch_seconds = time.perf_counter() - started
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "backend": name,
+        f"recall@{k}": hits / (len(truth) * k),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "batched_queries_per_sec": len(queries) / batch_seconds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector backend recall and latency.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05, help="Std-dev of the noise added to query vectors")
+    parser.add_argument("--json", help="Optional path to write the results as JSON")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    collection = client.get_or_create_collection(name=settings.CHROMA_COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    ids, vectors = load_all_vectors(collection)
+    k = min(args.top_k, len(ids))
+    queries = make_queries(vectors, args.queries, args.noise)
+    truth = exact_top_k(vectors, queries, k)
+    print(f"Collection: {len(ids)} vectors, {len(queries)} queries, k={k}")
+
+    def chroma_search(q, top_k):
+        return collection.query(query_embeddings=q.tolist(), n_results=top_k, include=["distances"])
+
+    results = [evaluate("chroma-hnsw", chroma_search, queries, truth, ids, k)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for quantize in (None, "int8"):
+            index_dir = os.path.join(tmp, quantize or "float16")
+            build_index(collection, index_dir, quantize=quantize)
+            backend = NumpyVectorService.from_directory(index_dir)
+            search = lambda q, top_k: backend.search_batch(q, top_k, include=["distances"])
+            results.append(evaluate(f"numpy-{quantize or 'float16'}", search, queries, truth, ids, k))
+
+    print(f"\n{'backend':<16}{'recall':>10}{'p50 ms':>10}{'p95 ms':>10}{'batch q/s':>12}")
+    for r in results:
+        print(f"{r['backend']:<16}{r[f'recall@{k}']:>10.4f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['batched_queries_per_sec']:>12.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"collection_size": len(ids), "top_k": k, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
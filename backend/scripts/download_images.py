@@ -4,10 +4,22 @@ Image Downloader for Photo Dataset
 This script downloads and optimizes images based on settings in app.core.config.
 It must be run from the root 'backend' directory with the PYTHONPATH set.
 Example: PYTHONPATH=. python scripts/download_images.py
+
+Downloads run concurrently on a pooled keep-alive HTTP client with per-host rate
+limiting and retry with backoff; resizing and JPEG encoding happen in a process pool.
+Progress is recorded in a JSON-lines manifest so interrupted runs resume where they stopped.
 """
+import asyncio
+import json
 import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
 import pandas as pd
-import requests
 from PIL import Image
 from io import BytesIO
 from tqdm import tqdm
@@ -15,19 +27,172 @@ from tqdm import tqdm
 # --- Import the centralized settings ---
 from app.core.config import settings
 
-def download_images(csv_path, num_images, output_dir, target_size):
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class HostRateLimiter:
+    """Token bucket per host, so a single CDN never sees more than `rate` requests/second."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self._rate = rate
+        self._burst = burst or max(1, int(rate))
+        self._buckets = defaultdict(lambda: [float(self._burst), time.monotonic()])
+        self._locks = defaultdict(asyncio.Lock)
+
+    async def acquire(self, host: str):
+        if self._rate <= 0:
+            return
+        async with self._locks[host]:
+            bucket = self._buckets[host]
+            while True:
+                now = time.monotonic()
+                bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                await asyncio.sleep((1 - bucket[0]) / self._rate)
+
+def optimize_image(content, output_path, target_size):
+    """
+    Resizes and re-encodes downloaded bytes as an optimized JPEG (runs in a worker process).
+    EXIF is carried over so the capture date survives; the original dimensions
+    are returned for the manifest, since the saved copy no longer has them.
+    """
+    img = Image.open(BytesIO(content))
+    original_size = img.size
+    exif = img.info.get('exif')
+    if img.mode in ('RGBA', 'P'):
+        img = img.convert('RGB')
+    img.thumbnail(target_size, Image.Resampling.LANCZOS)
+    # Write to a temp file first so a crash never leaves a truncated image behind
+    tmp_path = f"{output_path}.part"
+    img.save(tmp_path, 'JPEG', quality=85, optimize=True, **({'exif': exif} if exif else {}))
+    os.replace(tmp_path, output_path)
+    return original_size
+
+def load_manifest(manifest_path, output_dir):
+    """
+    Returns the set of CSV indices already downloaded.
+
+    Without a manifest (first run after upgrading), it is seeded from a single
+    listing of the output directory instead of per-file existence checks.
+    """
+    completed = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # Tolerate a partially written last line
+                if entry.get('status') == 'ok':
+                    completed.add(entry['index'])
+                else:
+                    completed.discard(entry['index'])
+        return completed
+
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        for name in os.listdir(output_dir):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() == '.jpg' and stem.isdigit():
+                completed.add(int(stem))
+                f.write(json.dumps({'index': int(stem), 'filename': name, 'status': 'ok'}) + "\n")
+    return completed
+
+def load_original_sizes(manifest_path=settings.DOWNLOAD_MANIFEST_PATH):
+    """
+    Returns {filename: (width, height)} of the images as downloaded, before they
+    were resized; images downloaded before sizes were recorded are absent.
+    """
+    sizes = {}
+    if not os.path.exists(manifest_path):
+        return sizes
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get('status') == 'ok' and 'width' in entry:
+                sizes[entry['filename']] = (entry['width'], entry['height'])
+    return sizes
+
+async def fetch_with_retry(client, limiter, url, max_retries):
+    """GETs a URL, retrying transient failures with exponential backoff and jitter."""
+    host = urlsplit(url).hostname or ""
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(host)
+        try:
+            response = await client.get(url)
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+                retry_after = response.headers.get('retry-after', '')
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                await asyncio.sleep(delay + random.uniform(0, 0.5))
+                continue
+            response.raise_for_status()
+            return response.content
+        except httpx.TransportError: # Includes timeouts
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(2 ** attempt + random.uniform(0, 0.5))
+
+async def _download_all(jobs, output_dir, target_size, manifest_path, concurrency, per_host_rate, max_retries):
+    loop = asyncio.get_running_loop()
+    limiter = HostRateLimiter(per_host_rate)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    work = asyncio.Queue()
+    for job in jobs:
+        work.put_nowait(job)
+
+    with ProcessPoolExecutor() as pool, open(manifest_path, 'a') as manifest, \
+            tqdm(total=len(jobs), desc="Downloading") as pbar:
+        async with httpx.AsyncClient(limits=limits, timeout=10, follow_redirects=True) as client:
+
+            async def worker():
+                while True:
+                    try:
+                        image_index, url = work.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    filename = f"{image_index:05d}.jpg" # e.g., 00000.jpg, 00001.jpg
+                    entry = {'index': image_index, 'filename': filename}
+                    try:
+                        content = await fetch_with_retry(client, limiter, url, max_retries)
+                        width, height = await loop.run_in_executor(
+                            pool, optimize_image, content, os.path.join(output_dir, filename), target_size
+                        )
+                        entry.update(status='ok', width=width, height=height)
+                    except Exception as e:
+                        print(f"Error downloading image at index {image_index} (URL: {url}): {e}")
+                        entry.update(status='failed', error=str(e))
+                    manifest.write(json.dumps(entry) + "\n")
+                    manifest.flush()
+                    pbar.update(1)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+def download_images(csv_path, num_images, output_dir, target_size,
+                    concurrency=settings.DOWNLOAD_CONCURRENCY,
+                    per_host_rate=settings.DOWNLOAD_PER_HOST_RATE,
+                    max_retries=settings.DOWNLOAD_MAX_RETRIES,
+                    manifest_path=settings.DOWNLOAD_MANIFEST_PATH):
     """
     Download and optimize images from the provided CSV file.
-    
+
     Args:
         csv_path (str): Path to the CSV file with photo URLs.
         num_images (int or None): Number of images to download.
         output_dir (str): Directory where images will be saved.
         target_size (tuple): The target (max) size for the images.
+        concurrency (int): Number of downloads in flight at once.
+        per_host_rate (float): Maximum requests per second to any one host (0 disables).
+        max_retries (int): Retries for transient network errors and 429/5xx responses.
+        manifest_path (str): JSON-lines file recording completed and failed downloads.
     """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
-    
+
     if not os.path.exists(csv_path):
         print(f"Error: CSV file not found at {csv_path}")
         return
@@ -36,30 +201,23 @@ def download_images(csv_path, num_images, output_dir, target_size):
     df = pd.read_csv(csv_path)
     if num_images:
         df = df.head(num_images)
-    
-    print(f"Downloading {len(df)} images to '{output_dir}'...")
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Downloading"):
-        try:
-            # Using row.name ensures we use the original CSV index, which is more robust
-            image_index = row.name
-            filename = f"{image_index:05d}.jpg" # e.g., 00000.jpg, 00001.jpg
-            output_path = os.path.join(output_dir, filename)
 
-            if os.path.exists(output_path):
-                continue
-            
-            response = requests.get(row['photo_image_url'], timeout=10)
-            response.raise_for_status()
+    # Using the original CSV index for filenames is more robust than row order
+    completed = load_manifest(manifest_path, output_dir)
+    jobs = [
+        (int(image_index), url)
+        for image_index, url in df['photo_image_url'].items()
+        if int(image_index) not in completed
+    ]
+    if not jobs:
+        print(f"All {len(df)} images are already downloaded.")
+        return
 
-            img = Image.open(BytesIO(response.content))
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            img.thumbnail(target_size, Image.Resampling.LANCZOS)
-            img.save(output_path, 'JPEG', quality=85, optimize=True)
-                
-        except Exception as e:
-            print(f"Error downloading image at index {idx} (URL: {row['photo_image_url']}): {e}")
-            continue
+    print(f"Downloading {len(jobs)} of {len(df)} images to '{output_dir}' ({concurrency} concurrent)...")
+    asyncio.run(_download_all(
+        jobs, output_dir, target_size, manifest_path,
+        max(1, concurrency), per_host_rate, max_retries
+    ))
 
 if __name__ == "__main__":
     print("--- Starting Image Download Script ---")
@@ -70,4 +228,4 @@ if __name__ == "__main__":
         output_dir=settings.IMAGES_DIR,
         target_size=settings.IMAGE_TARGET_SIZE
     )
-    print("--- Image Download Complete ---")
\ No newline at end of file
+    print("--- Image Download Complete ---")
@@ -0,0 +1,87 @@
+"""
+Local manifest of indexed images for incremental sync.
+
+One row per indexed file: filename, mtime, size, content hash and the model
+version that produced its vector. `generate_embeddings.py --sync` compares the
+image directory against it, so a sync only touches files that changed.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+HASH_CHUNK_BYTES = 1024 * 1024
+MANIFEST_PATH = os.path.join("storage", "embedding_manifest.sqlite3")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_directory(directory: str, suffix: str = ".jpg") -> dict[str, tuple[int, int]]:
+    """Returns filename -> (mtime_ns, size) for every matching file; contents are not read."""
+    states = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(suffix):
+                stat = entry.stat()
+                states[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return states
+
+
+class EmbeddingManifest:
+    """SQLite table of what is in the vector collection, keyed by filename."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "filename TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "content_hash TEXT NOT NULL, model TEXT NOT NULL, indexed_at REAL NOT NULL)"
+        )
+
+    def load(self) -> dict[str, tuple]:
+        """Returns filename -> (mtime_ns, size, content_hash, model)."""
+        rows = self._conn.execute("SELECT filename, mtime_ns, size, content_hash, model FROM images")
+        return {row[0]: row[1:] for row in rows}
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def models(self) -> set[str]:
+        """Model versions of the recorded vectors."""
+        return {row[0] for row in self._conn.execute("SELECT DISTINCT model FROM images")}
+
+    def upsert(self, rows: list[tuple], model: str):
+        """Records (filename, mtime_ns, size, content_hash) rows as indexed with `model`."""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO images (filename, mtime_ns, size, content_hash, model, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(*row, model, now) for row in rows],
+            )
+
+    def replace_all(self, rows: list[tuple], model: str):
+        """Replaces every row with `rows`, in one transaction (e.g. after importing a snapshot)."""
+        now = time.time()
+        with self._conn:
+            self._conn.execute("DELETE FROM images")
+            self._conn.executemany(
+                "INSERT INTO images (filename, mtime_ns, size, content_hash, model, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(*row, model, now) for row in rows],
+            )
+
+    def remove(self, filenames: list[str]):
+        with self._conn:
+            self._conn.executemany("DELETE FROM images WHERE filename = ?", [(f,) for f in filenames])
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,106 @@
+"""
+CLIP ONNX Export
+----------------
+Exports the text and image towers of the sentence-transformers CLIP model to ONNX
+for the ONNX Runtime inference backend (CLIP_INFERENCE_BACKEND=onnx), and optionally
+writes dynamically int8-quantized copies of both towers.
+
+Requirements:
+    pip install -r requirements-onnx.txt
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/export_onnx.py [--quantize] [--output storage/onnx/clip-ViT-B-32]
+    Then verify accuracy and speed with scripts/check_onnx_parity.py.
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import settings
+from app.services.onnx_clip import (
+    EXPORT_MANIFEST_FILE, IMAGE_MODEL_FILE, TEXT_MAX_LENGTH, TEXT_MODEL_FILE, model_path
+)
+
+OPSET = 17
+
+class TextTower(torch.nn.Module):
+    def __init__(self, clip):
+        super().__init__()
+        self.clip = clip
+
+    def forward(self, input_ids, attention_mask):
+        return self.clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+class ImageTower(torch.nn.Module):
+    def __init__(self, clip):
+        super().__init__()
+        self.clip = clip
+
+    def forward(self, pixel_values):
+        return self.clip.get_image_features(pixel_values=pixel_values)
+
+def export_towers(model_name, output_dir):
+    """Exports both towers with dynamic batch (and sequence) axes."""
+    model = SentenceTransformer(model_name, device='cpu')
+    clip_module = model[0] # sentence_transformers.models.CLIPModel
+    clip, processor = clip_module.model.eval(), clip_module.processor
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokens = processor.tokenizer(["a photo of a dog"], padding="max_length", max_length=TEXT_MAX_LENGTH, return_tensors="pt")
+    size = processor.image_processor.crop_size["height"]
+    pixels = torch.zeros(1, 3, size, size)
+
+    with torch.inference_mode():
+        print("Exporting text tower...")
+        torch.onnx.export(
+            TextTower(clip), (tokens["input_ids"], tokens["attention_mask"]),
+            os.path.join(output_dir, TEXT_MODEL_FILE),
+            input_names=["input_ids", "attention_mask"], output_names=["embeddings"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                          "embeddings": {0: "batch"}},
+            opset_version=OPSET,
+        )
+        print("Exporting image tower...")
+        torch.onnx.export(
+            ImageTower(clip), (pixels,),
+            os.path.join(output_dir, IMAGE_MODEL_FILE),
+            input_names=["pixel_values"], output_names=["embeddings"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "embeddings": {0: "batch"}},
+            opset_version=OPSET,
+        )
+    # Tokenizer and image preprocessing configs, so serving doesn't need sentence-transformers
+    processor.save_pretrained(output_dir)
+
+def quantize_towers(output_dir):
+    """Writes dynamically int8-quantized copies of both towers next to the fp32 ones."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    for filename in (TEXT_MODEL_FILE, IMAGE_MODEL_FILE):
+        print(f"Quantizing {filename} to int8...")
+        quantize_dynamic(
+            model_path(output_dir, filename),
+            model_path(output_dir, filename, int8=True),
+            weight_type=QuantType.QInt8,
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the CLIP towers to ONNX.")
+    parser.add_argument("--model", default=settings.CLIP_MODEL_NAME)
+    parser.add_argument("--output", default=settings.ONNX_MODEL_DIR)
+    parser.add_argument("--quantize", action="store_true", help="Also write int8 dynamically-quantized towers")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    export_towers(args.model, args.output)
+    if args.quantize:
+        quantize_towers(args.output)
+    with open(os.path.join(args.output, EXPORT_MANIFEST_FILE), "w") as f:
+        json.dump({"model": args.model, "opset": OPSET, "int8": args.quantize, "exported_at": time.time()}, f, indent=2)
+    print(f"Exported '{args.model}' to '{args.output}' in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    main()
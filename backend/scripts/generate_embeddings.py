@@ -4,34 +4,76 @@ Image Embedding Generation and Indexing
 This script generates vector embeddings for images using a pre-trained CLIP model
 and stores them in a persistent ChromaDB collection.
 
+Ingestion runs as a staged pipeline so that decoding, inference and DB writes overlap:
+    1. A process pool decodes images, extracts their filterable attributes (stored
+       as metadata) and resizes them to CLIP input size.
+    2. A bounded queue prefetches the next batches while the current one is encoded.
+    3. A background writer thread upserts finished batches into ChromaDB.
+Failures are tracked per image and written to a retry manifest.
+
 Requirements:
     pip install chromadb sentence-transformers torch pillow tqdm
 
 Usage:
     1. First, run 'download_images.py' to ensure images are in 'data/images'.
-    2. Run this script from the 'backend' folder: python scripts/generate_embeddings.py
+    2. Run this script from the 'backend' folder: PYTHONPATH=. python scripts/generate_embeddings.py
+       Use --retry-failed to only re-process the images listed in the retry manifest.
+       Use --sync for an incremental sync against the local manifest: only new or
+       modified files (by mtime/size, then content hash) are embedded, vectors of
+       deleted files are removed, and a model change re-embeds everything.
     3. Embeddings will be stored in the 'storage/chromadb' directory.
 """
+import argparse
+import functools
+import json
 import os
-import torch
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 from PIL import Image
-from sentence_transformers import SentenceTransformer
-import chromadb
 from tqdm import tqdm
 
+from app.core.config import settings
+from app.services.cache_service import bump_collection_epoch
+from app.services.image_attributes import extract_attributes
+from app.services.vector_store import to_numpy
+from scripts.download_images import load_original_sizes
+from scripts.embedding_manifest import MANIFEST_PATH, EmbeddingManifest, file_sha256, scan_directory
+
 # --- Configuration ---
 # Set up paths relative to the 'backend' directory
 IMG_DIR = os.path.join("data", "images")
 CHROMA_PERSIST_DIR = os.path.join("storage", "chromadb")
 CHROMA_COLLECTION_NAME = "visual_search"
+RETRY_MANIFEST_PATH = os.path.join("storage", "embedding_failures.json")
+SYNC_MANIFEST_PATH = MANIFEST_PATH
 
 # Model and device configuration
 MODEL_NAME = 'clip-ViT-B-32'
-DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 BATCH_SIZE = 64 # Adjust based on your VRAM/RAM
+CLIP_INPUT_SIZE = 224 # Shortest side expected by the CLIP image processor
+
+# Pipeline configuration
+DECODE_WORKERS = os.cpu_count() or 1
+PREFETCH_BATCHES = 4 # Decoded batches buffered ahead of the encoder
+WRITE_QUEUE_SIZE = 4 # Encoded batches buffered ahead of the DB writer
+HASH_WORKERS = 8 # Threads hashing changed files during --sync
+DELETE_BATCH_SIZE = 5000 # IDs per delete call when removing orphaned vectors
+
+_SENTINEL = None
+
+def torch_device():
+    """The device the torch backend runs on."""
+    import torch
+
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
 
 def setup_chromadb_client():
     """Initializes and returns a persistent ChromaDB client."""
+    import chromadb
+
     print(f"Initializing ChromaDB client at: {CHROMA_PERSIST_DIR}")
     return chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
 
@@ -45,73 +87,327 @@ def get_already_processed_ids(collection):
     existing_items = collection.get(include=[]) # Fetches all items without embeddings/metadatas
     return set(existing_items['ids'])
 
-def process_batch(batch_files, model, collection):
-    """Processes a batch of images, generates embeddings, and adds them to ChromaDB."""
-    image_paths = [os.path.join(IMG_DIR, f) for f in batch_files]
-    
+def load_image(filename, original_size=None, image_dir=IMG_DIR):
+    """
+    Decodes a single image and downsizes it to CLIP input size (runs in a worker process).
+    Filterable attributes are read from the original image first, since the
+    conversion drops EXIF data; `original_size` is the size recorded at download,
+    before the file was resized.
+
+    Returns:
+        tuple: (filename, image or None, attributes dict or None, error message or None)
+    """
     try:
-        # Open images and generate embeddings
-        images = [Image.open(p) for p in image_paths]
-        embeddings = model.encode(images, batch_size=len(images), convert_to_tensor=True, show_progress_bar=False, device=DEVICE)
-        
-        # Prepare data for ChromaDB
-        ids = [os.path.splitext(f)[0] for f in batch_files]
-        metadatas = [{'filename': f} for f in batch_files]
-        
-        # Add to collection
-        collection.add(
-            embeddings=embeddings.cpu().tolist(), # Add embeddings as lists
-            metadatas=metadatas,
-            ids=ids
-        )
+        with Image.open(os.path.join(image_dir, filename)) as img:
+            attributes = extract_attributes(img, original_size)
+            img = img.convert('RGB')
+            scale = CLIP_INPUT_SIZE / min(img.size)
+            if scale < 1:
+                new_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                img = img.resize(new_size, Image.Resampling.BICUBIC)
+            return filename, img, attributes, None
+    except Exception as e:
+        return filename, None, None, str(e)
+
+def decode_batches(files, pool, decoded_queue, batch_size, stop_event, image_dir=IMG_DIR, original_sizes=None):
+    """Producer stage: decodes batches in the process pool and feeds the bounded prefetch queue."""
+    load = functools.partial(load_image, image_dir=image_dir)
+    original_sizes = original_sizes or {}
+    try:
+        for i in range(0, len(files), batch_size):
+            if stop_event.is_set():
+                break
+            batch_files = files[i:i + batch_size]
+            decoded_queue.put(list(pool.map(load, batch_files, [original_sizes.get(f) for f in batch_files])))
+    finally:
+        decoded_queue.put(_SENTINEL)
+
+def write_batches(collection, write_queue, failures, stats):
+    """Writer stage: upserts encoded batches into ChromaDB."""
+    while (item := write_queue.get()) is not _SENTINEL:
+        ids, embeddings, metadatas = item
+        try:
+            collection.upsert(embeddings=embeddings, metadatas=metadatas, ids=ids)
+            stats['indexed'] += len(ids)
+        except Exception as e:
+            print(f"\nError writing batch starting with {ids[0]}: {e}")
+            failures.update({m['filename']: f"write failed: {e}" for m in metadatas})
+
+def encode_batch(decoded, model, failures):
+    """Encodes the successfully decoded images of a batch, recording per-image failures."""
+    filenames, images, attributes = [], [], []
+    for filename, img, image_attributes, error in decoded:
+        if img is None:
+            failures[filename] = f"decode failed: {error}"
+        else:
+            filenames.append(filename)
+            images.append(img)
+            attributes.append(image_attributes)
+    if not images:
+        return None
+
+    try:
+        # The model already lives on its device (see load_model)
+        embeddings = model.encode(images, batch_size=len(images), convert_to_tensor=True, show_progress_bar=False)
     except Exception as e:
-        print(f"\nError processing batch starting with {batch_files[0]}: {e}")
-        print("Skipping this batch.")
+        print(f"\nError encoding batch starting with {filenames[0]}: {e}")
+        failures.update({f: f"encode failed: {e}" for f in filenames})
+        return None
+
+    ids = [os.path.splitext(f)[0] for f in filenames]
+    metadatas = [{'filename': f, **a} for f, a in zip(filenames, attributes)]
+    return ids, to_numpy(embeddings).tolist(), metadatas
+
+def run_pipeline(files, model, collection, batch_size=BATCH_SIZE, workers=DECODE_WORKERS, prefetch=PREFETCH_BATCHES,
+                 image_dir=IMG_DIR, original_sizes=None):
+    """
+    Runs decode -> encode -> write as overlapping stages. `original_sizes` maps
+    filenames to their pre-resize (width, height), see load_original_sizes.
+
+    Returns:
+        tuple: (number of indexed images, dict of failed filename -> reason)
+    """
+    failures = {}
+    stats = {'indexed': 0}
+    decoded_queue = queue.Queue(maxsize=prefetch)
+    write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+    stop_event = threading.Event()
+
+    writer = threading.Thread(target=write_batches, args=(collection, write_queue, failures, stats), daemon=True)
+    writer.start()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        producer = threading.Thread(
+            target=decode_batches, args=(files, pool, decoded_queue, batch_size, stop_event, image_dir, original_sizes),
+            daemon=True
+        )
+        producer.start()
+        try:
+            with tqdm(total=len(files), desc="Generating Embeddings") as pbar:
+                while (decoded := decoded_queue.get()) is not _SENTINEL:
+                    encoded = encode_batch(decoded, model, failures)
+                    if encoded is not None:
+                        write_queue.put(encoded)
+                    pbar.update(len(decoded))
+        finally:
+            stop_event.set()
+            # Drain so a blocked producer can observe the stop flag and exit
+            while producer.is_alive():
+                try:
+                    decoded_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            write_queue.put(_SENTINEL)
+            writer.join()
+
+    return stats['indexed'], failures
+
+def load_retry_manifest(path=RETRY_MANIFEST_PATH):
+    """Returns the filenames recorded as failed by a previous run."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return sorted(json.load(f).get('failures', {}))
+
+def write_retry_manifest(failures, path=RETRY_MANIFEST_PATH):
+    """Writes failed filenames and reasons so they can be re-processed with --retry-failed."""
+    if not failures:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'generated_at': time.time(), 'failures': dict(sorted(failures.items()))}, f, indent=2)
+    print(f"{len(failures)} images failed; see retry manifest at '{path}'.")
+
+def model_version(args):
+    """Identifies what produced the vectors; a different value makes --sync re-embed."""
+    return f"{MODEL_NAME}/onnx-int8" if args.backend == "onnx" and args.int8 else MODEL_NAME
+
+def hash_files(filenames, image_dir=IMG_DIR, workers=HASH_WORKERS):
+    """Content hashes of `filenames` (hashlib releases the GIL, so threads suffice)."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(filenames, pool.map(lambda f: file_sha256(os.path.join(image_dir, f)), filenames)))
+
+def plan_sync(on_disk, indexed, model, image_dir=IMG_DIR):
+    """
+    Diffs the image directory against the manifest. Only files whose mtime, size
+    or model differ are hashed; a matching hash means the content is unchanged.
+
+    Returns:
+        tuple: (files to embed, files only needing a manifest refresh, deleted files, hashes)
+    """
+    deleted = sorted(set(indexed) - set(on_disk))
+    candidates = [
+        filename for filename, stat in on_disk.items()
+        if filename not in indexed or indexed[filename][3] != model or indexed[filename][:2] != stat
+    ]
+    hashes = hash_files(candidates, image_dir)
+    to_embed, refreshed = [], []
+    for filename in candidates:
+        row = indexed.get(filename)
+        if row is not None and row[3] == model and row[2] == hashes[filename]:
+            refreshed.append(filename) # Touched or copied, same content
+        else:
+            to_embed.append(filename)
+    return sorted(to_embed), refreshed, deleted, hashes
+
+def delete_ids(collection, ids, batch_size=DELETE_BATCH_SIZE):
+    """Deletes vectors by id in batches."""
+    for start in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[start:start + batch_size])
+    return len(ids)
+
+def bootstrap_manifest(manifest, collection, on_disk, model, image_dir=IMG_DIR):
+    """
+    Adopts vectors indexed before the manifest existed, assuming they came from
+    `model`, so the first sync doesn't re-embed the whole collection. This is the
+    only time --sync reads every id from the collection.
+    """
+    print("Sync manifest is empty; adopting images already in the collection...")
+    existing = get_already_processed_ids(collection)
+    adopted = [f for f in on_disk if os.path.splitext(f)[0] in existing]
+    hashes = hash_files(adopted, image_dir)
+    manifest.upsert([(f, *on_disk[f], hashes[f]) for f in adopted], model)
+    orphans = sorted(existing - {os.path.splitext(f)[0] for f in on_disk})
+    removed = delete_ids(collection, orphans)
+    print(f"Adopted {len(adopted)} indexed images; removed {removed} vectors without an image file.")
+    return removed
+
+def run_sync(collection, args, load_model_fn, image_dir=IMG_DIR, manifest_path=SYNC_MANIFEST_PATH):
+    """
+    Incremental, idempotent sync of the image directory into the collection.
+
+    Returns:
+        tuple: (number of embedded images, number of removed vectors, dict of failures)
+    """
+    manifest = EmbeddingManifest(manifest_path)
+    version = model_version(args)
+    try:
+        on_disk = scan_directory(image_dir)
+        removed = 0
+        if manifest.count() == 0 and collection.count() > 0:
+            removed += bootstrap_manifest(manifest, collection, on_disk, version, image_dir)
+
+        to_embed, refreshed, deleted, hashes = plan_sync(on_disk, manifest.load(), version, image_dir)
+        print(f"Sync plan: {len(on_disk)} images on disk, {len(to_embed)} to embed, "
+              f"{len(refreshed)} unchanged after hashing, {len(deleted)} deleted.")
+
+        if deleted:
+            removed += delete_ids(collection, [os.path.splitext(f)[0] for f in deleted])
+            manifest.remove(deleted)
+        if refreshed:
+            manifest.upsert([(f, *on_disk[f], hashes[f]) for f in refreshed], version)
+
+        indexed, failures = 0, {}
+        if to_embed:
+            # Upserts replace the vectors of modified files under the same id
+            indexed, failures = run_pipeline(
+                to_embed, load_model_fn(), collection,
+                batch_size=args.batch_size, workers=args.workers, prefetch=args.prefetch,
+                image_dir=image_dir, original_sizes=load_original_sizes()
+            )
+            # Failed files stay out of the manifest, so the next sync retries them
+            manifest.upsert([(f, *on_disk[f], hashes[f]) for f in to_embed if f not in failures], version)
+        return indexed, removed, failures
+    finally:
+        manifest.close()
+
+def load_model(args):
+    if args.backend == "onnx":
+        from app.services.onnx_clip import OnnxClipEncoder
+
+        print(f"Loading ONNX CLIP model from '{settings.ONNX_MODEL_DIR}'{' (int8)' if args.int8 else ''}...")
+        return OnnxClipEncoder(settings.ONNX_MODEL_DIR, int8=args.int8, intra_op_threads=settings.ONNX_INTRA_OP_THREADS)
+    from sentence_transformers import SentenceTransformer
+
+    device = torch_device()
+    print(f"Loading CLIP model '{MODEL_NAME}' on device '{device}'...")
+    return SentenceTransformer(MODEL_NAME, device=device)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate CLIP embeddings and index them in ChromaDB.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=DECODE_WORKERS, help="Decode worker processes")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_BATCHES, help="Decoded batches to buffer ahead")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--retry-failed", action="store_true", help="Only re-process images from the retry manifest")
+    mode.add_argument("--sync", action="store_true",
+                      help="Incremental sync: embed new/modified files, delete vectors of removed files")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch",
+                        help="Inference backend; 'onnx' uses the towers from scripts/export_onnx.py")
+    parser.add_argument("--int8", action="store_true", help="With --backend onnx, use the int8-quantized image tower")
+    return parser.parse_args()
 
 def main():
     """Main function to orchestrate the embedding generation process."""
+    args = parse_args()
     print("--- Starting Embedding Generation and Indexing ---")
-    
+
     if not os.path.exists(IMG_DIR):
         print(f"Error: Image directory not found at '{IMG_DIR}'.")
         print("Please run the 'download_images.py' script first.")
         return
 
-    # --- 1. Initialize Model and DB ---
-    print(f"Loading CLIP model '{MODEL_NAME}' on device '{DEVICE}'...")
-    model = SentenceTransformer(MODEL_NAME, device=DEVICE)
-
+    # --- 1. Initialize DB (the model is loaded only once there is work to do) ---
     client = setup_chromadb_client()
     collection = client.get_or_create_collection(
         name=CHROMA_COLLECTION_NAME,
         metadata={"hnsw:space": "cosine"} # Using cosine similarity for search
     )
-    
+
+    if args.sync:
+        started = time.perf_counter()
+        indexed, removed, failures = run_sync(collection, args, lambda: load_model(args))
+        elapsed = time.perf_counter() - started
+        write_retry_manifest(failures)
+        if indexed or removed:
+            epoch = bump_collection_epoch()
+            print(f"Collection epoch bumped to {epoch}.")
+        print("\n--- Incremental Sync Complete ---")
+        print(f"Embedded {indexed} images and removed {removed} vectors in {elapsed:.1f}s.")
+        print(f"Total items in collection '{CHROMA_COLLECTION_NAME}': {collection.count()}")
+        return
+
     # --- 2. Identify Images to Process ---
-    all_image_files = get_image_files(IMG_DIR)
-    processed_ids = get_already_processed_ids(collection)
-    
-    files_to_process = [
-        f for f in all_image_files if os.path.splitext(f)[0] not in processed_ids
-    ]
-    
+    if args.retry_failed:
+        files_to_process = [f for f in load_retry_manifest() if os.path.exists(os.path.join(IMG_DIR, f))]
+        print(f"Retrying {len(files_to_process)} previously failed images...")
+    else:
+        all_image_files = get_image_files(IMG_DIR)
+        processed_ids = get_already_processed_ids(collection)
+
+        files_to_process = [
+            f for f in all_image_files if os.path.splitext(f)[0] not in processed_ids
+        ]
+        print(f"Found {len(all_image_files)} total images.")
+        print(f"Found {len(processed_ids)} already processed images.")
+
     if not files_to_process:
         print("All images are already processed and indexed. Nothing to do.")
         return
-        
-    print(f"Found {len(all_image_files)} total images.")
-    print(f"Found {len(processed_ids)} already processed images.")
-    print(f"Processing {len(files_to_process)} new images...")
-
-    # --- 3. Process Images in Batches ---
-    with tqdm(total=len(files_to_process), desc="Generating Embeddings") as pbar:
-        for i in range(0, len(files_to_process), BATCH_SIZE):
-            batch_files = files_to_process[i:i + BATCH_SIZE]
-            process_batch(batch_files, model, collection)
-            pbar.update(len(batch_files))
+
+    print(f"Processing {len(files_to_process)} new images with {args.workers} decode workers...")
+
+    # --- 3. Process Images Through the Pipeline ---
+    model = load_model(args)
+    started = time.perf_counter()
+    indexed, failures = run_pipeline(
+        files_to_process, model, collection,
+        batch_size=args.batch_size, workers=args.workers, prefetch=args.prefetch,
+        original_sizes=load_original_sizes()
+    )
+    elapsed = time.perf_counter() - started
+    write_retry_manifest(failures)
+
+    # Signal running API workers that cached search results are now stale
+    if indexed:
+        epoch = bump_collection_epoch()
+        print(f"Collection epoch bumped to {epoch}.")
 
     print("\n--- Embedding Generation and Indexing Complete ---")
+    print(f"Indexed {indexed} images in {elapsed:.1f}s ({indexed / elapsed if elapsed else 0:.1f} images/sec).")
     print(f"Total items in collection '{CHROMA_COLLECTION_NAME}': {collection.count()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,100 @@
+"""
+Thumbnail Generator
+-------------------
+Renders every image in the image directory at THUMBNAIL_SIZES (WebP by default)
+into THUMBNAIL_DIR, named by content hash, and writes the manifest the API uses
+to link search results to them.
+
+Runs are incremental: only files whose mtime/size changed are re-hashed, only
+missing renditions are rendered, and thumbnails no image refers to any more are
+removed. Rendering runs in a process pool.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/generate_thumbnails.py [--workers 8]
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+from app.core.config import settings
+from app.services.thumbnails import (
+    MANIFEST_FILE, THUMBNAIL_NAME, read_manifest, render_thumbnails, thumbnail_name, write_manifest
+)
+from scripts.embedding_manifest import file_sha256, scan_directory
+
+DIGEST_LENGTH = 16 # Hex characters of the SHA-256 kept in thumbnail names
+
+def plan(on_disk, entries, image_dir=settings.IMAGES_DIR):
+    """Re-hashes new or changed files; returns the updated manifest entries."""
+    updated = {}
+    for filename, (mtime_ns, size) in on_disk.items():
+        entry = entries.get(filename)
+        if entry is None or (entry["mtime_ns"], entry["size"]) != (mtime_ns, size):
+            digest = file_sha256(os.path.join(image_dir, filename))[:DIGEST_LENGTH]
+            entry = {"digest": digest, "mtime_ns": mtime_ns, "size": size}
+        updated[filename] = entry
+    return updated
+
+def missing_renditions(entries, output_dir):
+    """Filenames with at least one rendition not yet on disk (one per digest)."""
+    existing = set(os.listdir(output_dir))
+    todo, seen = [], set()
+    for filename, entry in entries.items():
+        digest = entry["digest"]
+        if digest in seen:
+            continue
+        seen.add(digest)
+        if any(thumbnail_name(digest, size) not in existing for size in settings.THUMBNAIL_SIZES):
+            todo.append(filename)
+    return todo
+
+def remove_orphans(entries, output_dir):
+    """Deletes thumbnails whose digest, size or format is no longer in use."""
+    wanted = {thumbnail_name(entry["digest"], size) for entry in entries.values() for size in settings.THUMBNAIL_SIZES}
+    removed = 0
+    for name in os.listdir(output_dir):
+        if (THUMBNAIL_NAME.fullmatch(name) or name.endswith(".tmp")) and name not in wanted:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+    return removed
+
+def generate(image_dir, output_dir, workers):
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    entries = plan(scan_directory(image_dir), read_manifest(manifest_path), image_dir)
+    todo = missing_renditions(entries, output_dir)
+    print(f"{len(entries)} images, {len(todo)} need thumbnails.")
+
+    failed = set()
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(render_thumbnails, os.path.join(image_dir, f), entries[f]["digest"], output_dir): f
+                for f in todo
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Rendering thumbnails"):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"\nCould not render thumbnails for {futures[future]}: {e}")
+                    failed.add(futures[future])
+
+    # Images without thumbnails stay out of the manifest and keep linking to the original
+    entries = {filename: entry for filename, entry in entries.items() if filename not in failed}
+    # The manifest is written before old files are removed, so servers never link to a deleted file
+    write_manifest(manifest_path, entries)
+    removed = remove_orphans(entries, output_dir)
+    print(f"Thumbnails ready for {len(entries)} images ({len(failed)} failed, {removed} stale files removed).")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate content-addressed thumbnails for search results.")
+    parser.add_argument("--images", default=settings.IMAGES_DIR)
+    parser.add_argument("--output", default=settings.THUMBNAIL_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    generate(args.images, args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Collection Snapshots
+--------------------
+Exports the vector collection to a portable snapshot and imports it back, so new
+environments and replicas can be seeded without running CLIP over every image.
+Snapshots also serve as a warm backup of the vectors, which otherwise only exist
+inside ChromaDB's private storage.
+
+A snapshot is a directory of chunks plus a manifest:
+    snapshot.json         format, model version, dimension, row count, and each
+                          chunk's files, row count and SHA-256
+    chunk-00000.npy       float16 vectors of the chunk, one row per item
+    chunk-00000.json      {"ids": [...], "metadatas": [...]} of the same rows
+Export reads the collection one page at a time and writes one chunk per page, so
+neither side ever holds the whole collection in memory. The snapshot is written
+next to the target and swapped in, so a half-written snapshot never replaces a good one.
+The model version is the one the sync manifest recorded for the vectors (e.g.
+clip-ViT-B-32/onnx-int8), or --model when the collection was built without --sync.
+
+Import verifies the checksums, then bulk-adds the chunks into a staging collection.
+Once complete, the existing collection is renamed aside, the staging collection
+takes the target name and only then is the old one deleted. A failed import
+leaves the existing collection untouched, and the name is only unbound between
+two renames (Chroma has no atomic swap) instead of while the old collection is
+deleted. The sync manifest is rewritten for the imported vectors with
+the snapshot's model version, so the next `generate_embeddings.py --sync` only
+embeds images the snapshot lacks. Running API servers keep their handle on the
+old collection and must be restarted afterwards.
+
+Usage (from the 'backend' folder):
+    PYTHONPATH=. python scripts/snapshot.py export storage/snapshots/latest [--page-size 5000] [--model NAME]
+    PYTHONPATH=. python scripts/snapshot.py import storage/snapshots/latest [--replace]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from app.core.config import settings
+from app.services.cache_service import bump_collection_epoch
+from scripts.embedding_manifest import MANIFEST_PATH, EmbeddingManifest, file_sha256, scan_directory
+from scripts.staged_directory import staged_directory
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "snapshot.json"
+PAGE_SIZE = 5000 # Rows read from the collection per chunk
+IMPORT_BATCH_SIZE = 5000 # Rows per add call; capped by the client's maximum batch size
+
+def chunk_names(index):
+    return f"chunk-{index:05d}.npy", f"chunk-{index:05d}.json"
+
+def indexed_model_version(manifest_path=MANIFEST_PATH):
+    """The model version the sync manifest recorded for the collection, or None if it has none (or several)."""
+    if not os.path.exists(manifest_path):
+        return None
+    manifest = EmbeddingManifest(manifest_path)
+    try:
+        models = manifest.models()
+    finally:
+        manifest.close()
+    return models.pop() if len(models) == 1 else None
+
+def base_model(model_version):
+    """'clip-ViT-B-32/onnx-int8' -> 'clip-ViT-B-32': the model whose text tower encodes queries."""
+    return model_version.split("/", 1)[0]
+
+def export_snapshot(collection, output_dir, model_name=settings.CLIP_MODEL_NAME, page_size=PAGE_SIZE):
+    """Writes every row of the collection into a snapshot directory; returns the row count."""
+    count = collection.count()
+    with staged_directory(output_dir) as tmp_dir:
+        os.makedirs(tmp_dir)
+
+        chunks, exported, dim = [], 0, None
+        with tqdm(total=count, desc="Exporting snapshot") as pbar:
+            for offset in range(0, count, page_size):
+                page = collection.get(limit=page_size, offset=offset, include=["embeddings", "metadatas"])
+                if not page["ids"]:
+                    break
+                vectors = np.asarray(page["embeddings"], dtype=np.float16)
+                dim = vectors.shape[1]
+                vectors_file, records_file = chunk_names(len(chunks))
+                np.save(os.path.join(tmp_dir, vectors_file), vectors)
+                with open(os.path.join(tmp_dir, records_file), "w") as f:
+                    json.dump({"ids": page["ids"], "metadatas": [m or {} for m in page["metadatas"]]}, f)
+                chunks.append({
+                    "vectors": vectors_file,
+                    "records": records_file,
+                    "rows": len(page["ids"]),
+                    "sha256": {
+                        vectors_file: file_sha256(os.path.join(tmp_dir, vectors_file)),
+                        records_file: file_sha256(os.path.join(tmp_dir, records_file)),
+                    },
+                })
+                exported += len(page["ids"])
+                pbar.update(len(page["ids"]))
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "model": model_name,
+            "collection": collection.name,
+            "dim": dim,
+            "dtype": "float16",
+            "count": exported,
+            "created_at": time.time(),
+            "chunks": chunks,
+        }
+        # The manifest goes last; its presence marks a complete snapshot
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+    return exported
+
+def read_manifest(snapshot_dir):
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"'{snapshot_dir}' is not a complete snapshot (no {MANIFEST_FILE}).")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')}; expected {SNAPSHOT_FORMAT}.")
+    return manifest
+
+def verify_snapshot(snapshot_dir, manifest):
+    """Checks every chunk file against the manifest checksums before anything is written."""
+    for chunk in tqdm(manifest["chunks"], desc="Verifying snapshot"):
+        for name, digest in chunk["sha256"].items():
+            if file_sha256(os.path.join(snapshot_dir, name)) != digest:
+                raise ValueError(f"Checksum mismatch for '{name}'; the snapshot is corrupt.")
+
+def read_chunks(snapshot_dir, manifest):
+    """Yields (ids, float32 vectors, metadatas) one chunk at a time."""
+    for chunk in manifest["chunks"]:
+        vectors = np.load(os.path.join(snapshot_dir, chunk["vectors"]), mmap_mode="r")
+        with open(os.path.join(snapshot_dir, chunk["records"])) as f:
+            records = json.load(f)
+        if not (len(records["ids"]) == len(records["metadatas"]) == len(vectors) == chunk["rows"]):
+            raise ValueError(f"Chunk '{chunk['records']}' does not match its row count.")
+        yield records["ids"], vectors.astype(np.float32), records["metadatas"]
+
+def max_batch_size(client, default=IMPORT_BATCH_SIZE):
+    """The largest add() the client accepts; older clients expose it as an attribute."""
+    getter = getattr(client, "get_max_batch_size", None)
+    limit = getter() if callable(getter) else getattr(client, "max_batch_size", None)
+    return min(default, limit) if limit else default
+
+def rewrite_sync_manifest(ids, model, image_dir=settings.IMAGES_DIR, manifest_path=MANIFEST_PATH):
+    """
+    Replaces the sync manifest with the images on disk whose vectors were just
+    imported, recorded under the snapshot's model version; returns their count.
+    """
+    imported = set(ids)
+    on_disk = scan_directory(image_dir) if os.path.isdir(image_dir) else {}
+    adopted = [f for f in on_disk if os.path.splitext(f)[0] in imported]
+    rows = [(f, *on_disk[f], file_sha256(os.path.join(image_dir, f))) for f in tqdm(adopted, desc="Hashing images")]
+    manifest = EmbeddingManifest(manifest_path)
+    try:
+        manifest.replace_all(rows, model)
+    finally:
+        manifest.close()
+    return len(rows)
+
+def collection_names(client):
+    return {c if isinstance(c, str) else c.name for c in client.list_collections()}
+
+def swap_collection(client, collection, name, existing):
+    """Gives `collection` the name `name`, deleting the collection that had it only once the rename succeeded."""
+    if name not in existing:
+        collection.modify(name=name)
+        return
+    previous = f"{name}_previous"
+    if previous in existing:
+        client.delete_collection(previous)
+    client.get_collection(name).modify(name=previous)
+    try:
+        collection.modify(name=name)
+    except BaseException:
+        client.get_collection(previous).modify(name=name)
+        raise
+    client.delete_collection(previous)
+
+def import_snapshot(client, snapshot_dir, name, replace=False, batch_size=IMPORT_BATCH_SIZE,
+                    manifest_path=MANIFEST_PATH, image_dir=settings.IMAGES_DIR):
+    """Loads a snapshot into the collection `name` and rewrites the sync manifest; returns the row count."""
+    manifest = read_manifest(snapshot_dir)
+    if base_model(manifest["model"]) != settings.CLIP_MODEL_NAME:
+        raise ValueError(
+            f"Snapshot vectors come from '{manifest['model']}' but the API encodes queries with "
+            f"'{settings.CLIP_MODEL_NAME}'; set CLIP_MODEL_NAME to match before importing."
+        )
+    existing = collection_names(client)
+    if name in existing and client.get_collection(name).count() > 0 and not replace:
+        raise ValueError(f"Collection '{name}' already has vectors; pass --replace to overwrite it.")
+    verify_snapshot(snapshot_dir, manifest)
+
+    staging = f"{name}_import"
+    if staging in existing:
+        client.delete_collection(staging)
+    collection = client.create_collection(name=staging, metadata={"hnsw:space": "cosine"})
+    batch_size = max_batch_size(client, batch_size)
+    imported_ids = []
+    try:
+        with tqdm(total=manifest["count"], desc="Importing snapshot") as pbar:
+            for ids, vectors, metadatas in read_chunks(snapshot_dir, manifest):
+                for start in range(0, len(ids), batch_size):
+                    end = start + batch_size
+                    collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(), metadatas=metadatas[start:end])
+                    pbar.update(len(ids[start:end]))
+                imported_ids.extend(ids)
+        swap_collection(client, collection, name, existing)
+    except BaseException:
+        if staging in collection_names(client):
+            client.delete_collection(staging)
+        raise
+
+    adopted = rewrite_sync_manifest(imported_ids, manifest["model"], image_dir, manifest_path)
+    print(f"Sync manifest now records {adopted} images on disk as indexed with '{manifest['model']}'.")
+    return len(imported_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of the vector collection.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the collection to a snapshot directory")
+    export_parser.add_argument("snapshot_dir")
+    export_parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    export_parser.add_argument("--model", help="Model version of the vectors (default: from the sync manifest, "
+                                               "else CLIP_MODEL_NAME), e.g. clip-ViT-B-32/onnx-int8")
+    import_parser = commands.add_parser("import", help="Load a snapshot directory into the collection")
+    import_parser.add_argument("snapshot_dir")
+    import_parser.add_argument("--replace", action="store_true", help="Overwrite a collection that already has vectors")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    import chromadb
+
+    client = chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+    started = time.perf_counter()
+    if args.command == "export":
+        collection = client.get_or_create_collection(
+            name=settings.CHROMA_COLLECTION_NAME,
+            metadata={"hnsw:space": "cosine"}
+        )
+        model = args.model or indexed_model_version() or settings.CLIP_MODEL_NAME
+        count = export_snapshot(collection, args.snapshot_dir, model_name=model, page_size=args.page_size)
+        print(f"Exported {count} vectors ({model}) to '{args.snapshot_dir}' in {time.perf_counter() - started:.1f}s.")
+        return
+
+    count = import_snapshot(client, args.snapshot_dir, settings.CHROMA_COLLECTION_NAME,
+                            replace=args.replace, batch_size=args.batch_size)
+    epoch = bump_collection_epoch()
+    print(f"Imported {count} vectors into '{settings.CHROMA_COLLECTION_NAME}' in {time.perf_counter() - started:.1f}s "
+          f"(collection epoch {epoch}). Restart running API servers to pick up the new collection.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Directories that are replaced as a whole.
+
+Indexes and snapshots are written next to their target and swapped in once
+complete, so a reader (a running server, or an import) never sees a
+half-written directory, and a failed build leaves the previous one in place.
+"""
+import os
+import shutil
+from contextlib import contextmanager
+
+
+@contextmanager
+def staged_directory(output_dir: str):
+    """
+    Yields the path to write the new directory at, then swaps it in for `output_dir`.
+
+    The path does not exist yet. If the block raises, the partial directory is
+    removed and `output_dir` is left untouched.
+    """
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        yield tmp_dir
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # The target only disappears between two renames, never while it is being deleted
+    old_dir = f"{output_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
@@ -0,0 +1,140 @@
+"""
+scripts/download_images.py against a local HTTP server: retries of transient
+failures, the per-host rate limiter, and resuming from the manifest.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.services.image_attributes import extract_attributes
+from scripts.download_images import HostRateLimiter, download_images, load_original_sizes
+
+
+def jpeg_bytes(size=(640, 480)) -> bytes:
+    exif = Image.Exif()
+    exif.get_ifd(0x8769)[36867] = "2019:07:14 18:30:00" # DateTimeOriginal
+    buf = BytesIO()
+    Image.new("RGB", size, "red").save(buf, "JPEG", exif=exif)
+    return buf.getvalue()
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """
+    Serves /ok/<n> as a JPEG, /flaky/<n> as 503 (Retry-After: 0) for its first
+    two requests, and anything else as 404. Every request is logged.
+    """
+    requests: list[tuple[str, float]] = []
+    image = jpeg_bytes()
+
+    def do_GET(self):
+        self.requests.append((self.path, time.monotonic()))
+        attempts = sum(1 for path, _ in self.requests if path == self.path)
+        if self.path.startswith("/flaky/") and attempts <= 2:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if not self.path.startswith(("/ok/", "/flaky/")):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(self.image)))
+        self.end_headers()
+        self.wfile.write(self.image)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def image_server():
+    ImageHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def run_download(tmp_path, urls, per_host_rate=0):
+    csv_path = tmp_path / "photos.csv"
+    csv_path.write_text("photo_image_url\n" + "\n".join(urls) + "\n")
+    manifest_path = tmp_path / "manifest.jsonl"
+    download_images(
+        str(csv_path), None, str(tmp_path / "images"), (200, 200),
+        concurrency=4, per_host_rate=per_host_rate, max_retries=3, manifest_path=str(manifest_path)
+    )
+    return [json.loads(line) for line in manifest_path.read_text().splitlines()]
+
+
+def requested(prefix):
+    return [path for path, _ in ImageHandler.requests if path.startswith(prefix)]
+
+
+def test_transient_failures_are_retried(tmp_path, image_server):
+    entries = run_download(tmp_path, [f"{image_server}/flaky/0", f"{image_server}/missing/1"])
+    status = {entry["index"]: entry["status"] for entry in entries}
+
+    assert status == {0: "ok", 1: "failed"}
+    assert len(requested("/flaky/0")) == 3 # Two 503s, then success
+    assert len(requested("/missing/1")) == 1 # A 404 is not retried
+    with Image.open(tmp_path / "images" / "00000.jpg") as img:
+        assert max(img.size) <= 200
+
+
+def test_resume_only_fetches_what_is_missing(tmp_path, image_server):
+    urls = [f"{image_server}/ok/0", f"{image_server}/missing/1", f"{image_server}/ok/2"]
+    run_download(tmp_path, urls)
+    assert len(ImageHandler.requests) == 3
+
+    # The failed image is back; only it is requested again
+    urls[1] = f"{image_server}/ok/1"
+    entries = run_download(tmp_path, urls)
+    assert [path for path, _ in ImageHandler.requests[3:]] == ["/ok/1"]
+    assert entries[-1] == {"index": 1, "filename": "00001.jpg", "status": "ok", "width": 640, "height": 480}
+    assert sorted(p.name for p in (tmp_path / "images").iterdir()) == ["00000.jpg", "00001.jpg", "00002.jpg"]
+
+
+def test_original_size_and_capture_date_survive_resizing(tmp_path, image_server):
+    run_download(tmp_path, [f"{image_server}/ok/0"])
+
+    sizes = load_original_sizes(str(tmp_path / "manifest.jsonl"))
+    assert sizes == {"00000.jpg": (640, 480)}
+    with Image.open(tmp_path / "images" / "00000.jpg") as img:
+        assert img.size == (200, 150)
+        attributes = extract_attributes(img, sizes["00000.jpg"])
+    assert (attributes["width"], attributes["height"], attributes["orientation"]) == (640, 480, "landscape")
+    assert (attributes["taken_at"], attributes["taken_year"]) == ("2019-07-14", 2019)
+
+
+def test_per_host_rate_is_enforced(tmp_path, image_server):
+    rate = 20.0
+    run_download(tmp_path, [f"{image_server}/ok/{i}" for i in range(30)], per_host_rate=rate)
+
+    times = sorted(at for _, at in ImageHandler.requests)
+    burst = int(rate)
+    # After the initial burst, requests are spaced by the refill rate
+    assert times[-1] - times[0] >= (len(times) - burst) / rate * 0.9
+
+
+def test_rate_limiter_buckets_are_per_host():
+    async def acquire_all():
+        limiter = HostRateLimiter(rate=20.0, burst=1)
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire(host) for host in ["a", "b", "c", "d"]))
+        one_each = time.monotonic() - started
+        await asyncio.gather(*(limiter.acquire("a") for _ in range(5)))
+        return one_each, time.monotonic() - started - one_each
+
+    one_each, same_host = asyncio.run(acquire_all())
+    assert one_each < 0.05
+    assert same_host >= 5 / 20.0 * 0.9
@@ -0,0 +1,114 @@
+"""
+`generate_embeddings.py --sync` against a temporary image directory and manifest.
+
+The model and collection are stand-ins; images are real JPEGs, decoded by the
+same pipeline as a full run. Each sync must embed exactly the files whose
+content changed, and a different model version must re-embed everything.
+"""
+import os
+from argparse import Namespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from scripts import generate_embeddings
+from scripts.embedding_manifest import EmbeddingManifest
+
+
+class FakeModel:
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, images, batch_size, convert_to_tensor=False, show_progress_bar=False):
+        self.encoded += len(images)
+        return np.ones((len(images), 4), dtype=np.float32)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.ids = set()
+
+    def count(self):
+        return len(self.ids)
+
+    def upsert(self, embeddings, metadatas, ids):
+        self.ids.update(ids)
+
+    def delete(self, ids):
+        self.ids.difference_update(ids)
+
+
+class Sync:
+    """Runs syncs of one image directory into one collection, counting embedded images."""
+
+    def __init__(self, tmp_path):
+        self.image_dir = str(tmp_path / "images")
+        self.manifest_path = str(tmp_path / "manifest.sqlite3")
+        self.collection = FakeCollection()
+        os.makedirs(self.image_dir)
+
+    def write(self, name, color):
+        Image.new("RGB", (32, 24), color).save(os.path.join(self.image_dir, name))
+
+    def run(self, **args):
+        args = Namespace(**{"backend": "torch", "int8": False, "batch_size": 4, "workers": 1, "prefetch": 2, **args})
+        model = FakeModel()
+        indexed, removed, failures = generate_embeddings.run_sync(
+            self.collection, args, lambda: model, image_dir=self.image_dir, manifest_path=self.manifest_path
+        )
+        assert not failures
+        assert indexed == model.encoded
+        return indexed, removed
+
+    def manifest(self):
+        manifest = EmbeddingManifest(self.manifest_path)
+        try:
+            return manifest.load()
+        finally:
+            manifest.close()
+
+
+@pytest.fixture
+def sync(tmp_path):
+    sync = Sync(tmp_path)
+    for i, color in enumerate(["red", "green", "blue", "white"]):
+        sync.write(f"{i:05d}.jpg", color)
+    assert sync.run() == (4, 0)
+    return sync
+
+
+def test_unchanged_directory_embeds_nothing(sync):
+    assert sync.run() == (0, 0)
+
+
+def test_only_modified_files_are_embedded(sync):
+    sync.write("00001.jpg", "black")
+    os.utime(os.path.join(sync.image_dir, "00001.jpg"), ns=(1, 1)) # A new mtime, whatever the clock resolution
+    sync.write("00004.jpg", "gray") # New file
+
+    assert sync.run() == (2, 0)
+    assert sync.collection.ids == {"00000", "00001", "00002", "00003", "00004"}
+    assert sync.run() == (0, 0)
+
+
+def test_touched_files_only_refresh_the_manifest(sync):
+    path = os.path.join(sync.image_dir, "00002.jpg")
+    os.utime(path, ns=(1, 1))
+
+    assert sync.run() == (0, 0)
+    assert sync.manifest()["00002.jpg"][0] == 1
+
+
+def test_deleted_files_lose_their_vectors(sync):
+    os.remove(os.path.join(sync.image_dir, "00003.jpg"))
+
+    assert sync.run() == (0, 1)
+    assert sync.collection.ids == {"00000", "00001", "00002"}
+    assert "00003.jpg" not in sync.manifest()
+
+
+def test_model_change_rebuilds_everything(sync):
+    assert sync.run(backend="onnx", int8=True) == (4, 0)
+    assert {row[3] for row in sync.manifest().values()} == {"clip-ViT-B-32/onnx-int8"}
+    assert sync.run(backend="onnx", int8=True) == (0, 0)
@@ -0,0 +1,70 @@
+"""
+Hybrid retrieval pieces: the keyword index builder and the fused rerank of
+the candidates.
+"""
+import numpy as np
+
+from app.core.config import settings
+from app.services.hybrid_search import reciprocal_rank_fusion, rerank
+from app.services.keyword_index import KeywordIndexService, build_keyword_index
+
+
+class VectorsStore:
+    def __init__(self, vectors):
+        self._vectors = vectors
+
+    def get_embeddings(self, ids):
+        return {id_: self._vectors[id_] for id_ in ids if id_ in self._vectors}
+
+    def get_metadatas(self, ids):
+        return {id_: {"filename": f"{id_}.jpg"} for id_ in ids}
+
+
+def test_rerank_surfaces_keyword_only_hits():
+    rng = np.random.default_rng(0)
+    query = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    # Ten images close to the query, and one that only the keyword index finds
+    vectors = {f"near-{i}": query + rng.normal(0, 0.05, 3).astype(np.float32) for i in range(10)}
+    vectors["exact-term"] = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+    store = VectorsStore(vectors)
+    cosine = {id_: float(v @ query / np.linalg.norm(v)) for id_, v in vectors.items()}
+    ann = sorted((id_ for id_ in vectors if id_.startswith("near")), key=cosine.get, reverse=True)
+
+    # The ANN list arrives reversed: the rerank uses the exact cosine ranking instead
+    candidates = reciprocal_rank_fusion([ann[::-1], ["exact-term"]])
+    results = rerank(store, query, candidates, ["exact-term"], top_k=3)
+    ids, distances, fused = results["ids"][0], results["distances"][0], results["fused_scores"][0]
+
+    # Ranked by both retrievers, the exact-term match outranks every vector-only hit
+    assert ids == ["exact-term", ann[0], ann[1]]
+    assert fused == sorted(fused, reverse=True)
+    # Distances stay the exact cosine distance of each image
+    assert distances[0] == 1.0
+    assert distances[1] < distances[2] < distances[0]
+
+
+def test_rerank_without_keyword_hits_is_the_exact_ranking():
+    store = VectorsStore({
+        "far": np.array([0.6, 0.8], dtype=np.float32),
+        "close": np.array([1.0, 0.0], dtype=np.float32),
+        "closer": np.array([0.99, 0.14], dtype=np.float32),
+    })
+    results = rerank(store, np.array([1.0, 0.1]), ["far", "close", "closer"], [], top_k=3)
+
+    assert results["ids"][0] == ["closer", "close", "far"]
+    assert results["distances"][0] == sorted(results["distances"][0])
+
+
+def test_index_without_text_is_not_installed(tmp_path, monkeypatch):
+    path = str(tmp_path / "keywords.sqlite3")
+    monkeypatch.setattr(settings, "KEYWORD_INDEX_PATH", path)
+    keywords = KeywordIndexService()
+
+    assert build_keyword_index(path, [("1", "00001.jpg", "red sports car")]) == 1
+    assert keywords.version() is not None
+    assert [hit[0] for hit in keywords.search("car", 5)] == ["1"]
+
+    # Rebuilding without any text removes the index, which turns hybrid off
+    assert build_keyword_index(path, []) == 0
+    assert keywords.version() is None
+    assert keywords.search("car", 5) == []
@@ -0,0 +1,26 @@
+"""
+Filterable attributes extracted at ingestion (app/services/image_attributes.py).
+"""
+import numpy as np
+from PIL import Image
+
+from app.services.image_attributes import color_labels, dominant_color, orientation_of
+
+
+def test_hue_at_360_degrees_is_red():
+    # H=255 is a hue of exactly 360 degrees, the upper edge of the last bucket
+    hsv = np.array([[255, 255, 255], [0, 255, 255], [250, 255, 255]], dtype=np.uint8)
+    assert list(color_labels(hsv)) == ["red", "red", "red"]
+
+
+def test_dominant_color_buckets_and_neutrals():
+    assert dominant_color(Image.new("RGB", (8, 8), (255, 0, 0))) == "red"
+    assert dominant_color(Image.new("RGB", (8, 8), (0, 0, 255))) == "blue"
+    assert dominant_color(Image.new("RGB", (8, 8), (250, 250, 250))) == "white"
+    assert dominant_color(Image.new("RGB", (8, 8), (5, 5, 5))) == "black"
+
+
+def test_orientation_tolerates_near_square():
+    assert orientation_of(1000, 980) == "square"
+    assert orientation_of(1200, 800) == "landscape"
+    assert orientation_of(800, 1200) == "portrait"
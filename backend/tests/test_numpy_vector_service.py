@@ -0,0 +1,128 @@
+"""
+NumpyVectorService against brute-force search over the same vectors.
+
+The scan is exact up to float16 storage, so recall must be near perfect; the
+int8 first pass relies on float16 rescoring to get there. Sharding only splits
+the scan, so it must not change a single result.
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import numpy_vector_service
+from app.services.numpy_index import NumpyIndexWriter
+from app.services.numpy_vector_service import NumpyVectorService
+
+ROWS, DIM, QUERIES, TOP_K = 3000, 32, 20, 10
+
+
+def dataset(rows=ROWS, seed=0):
+    # Clustered, like image embeddings, so near neighbours are close calls
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(30, DIM))
+    vectors = centers[rng.integers(0, len(centers), rows)] + 0.3 * rng.normal(size=(rows, DIM))
+    ids = [f"{i:05d}" for i in range(rows)]
+    return ids, vectors.astype(np.float32)
+
+
+def build(index_dir, ids, vectors, quantize=None):
+    writer = NumpyIndexWriter(str(index_dir), len(ids), DIM, quantize=quantize)
+    for start in range(0, len(ids), 1000):
+        end = start + 1000
+        writer.add(ids[start:end], vectors[start:end], [{"filename": f"{id_}.jpg"} for id_ in ids[start:end]])
+    writer.close(model_name="test-model")
+
+
+def normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def brute_force(vectors, queries, k):
+    scores = normalized(queries) @ normalized(vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Several scan chunks per shard, so the running top-k merge is exercised
+    monkeypatch.setattr(settings, "NUMPY_SCAN_CHUNK_BYTES", 64 * 1024)
+
+
+@pytest.fixture
+def queries():
+    rng = np.random.default_rng(1)
+    _, vectors = dataset()
+    return vectors[rng.integers(0, ROWS, QUERIES)] + 0.2 * rng.normal(size=(QUERIES, DIM)).astype(np.float32)
+
+
+@pytest.mark.parametrize("quantize, min_recall", [(None, 0.99), ("int8", 0.97)])
+def test_recall_against_brute_force(tmp_path, queries, quantize, min_recall):
+    ids, vectors = dataset()
+    build(tmp_path / "index", ids, vectors, quantize)
+    store = NumpyVectorService.from_directory(str(tmp_path / "index"))
+
+    results = store.search_batch(queries, top_k=TOP_K, include=["distances", "metadatas"])
+    expected = brute_force(vectors, queries, TOP_K)
+    hits = sum(len({ids[row] for row in rows} & set(found)) for rows, found in zip(expected, results["ids"]))
+    assert hits / (QUERIES * TOP_K) >= min_recall
+
+    for found, distances, metadatas in zip(results["ids"], results["distances"], results["metadatas"]):
+        assert distances == sorted(distances)
+        assert [m["filename"] for m in metadatas] == [f"{id_}.jpg" for id_ in found]
+
+
+@pytest.mark.parametrize("quantize", [None, "int8"])
+def test_sharded_scan_matches_unsharded(tmp_path, queries, monkeypatch, quantize):
+    monkeypatch.setattr(numpy_vector_service, "MIN_SHARD_ROWS", 500)
+    ids, vectors = dataset()
+    build(tmp_path / "index", ids, vectors, quantize)
+    single = NumpyVectorService.from_directory(str(tmp_path / "index"))
+    sharded = NumpyVectorService.from_directory(str(tmp_path / "index"), shards=4)
+    assert len(sharded.get_index().shards) == 4
+
+    include = ["distances", "metadatas"]
+    expected = single.search_batch(queries, top_k=TOP_K, include=include)
+    actual = sharded.search_batch(queries, top_k=TOP_K, include=include)
+    assert actual["ids"] == expected["ids"]
+    assert np.allclose(actual["distances"], expected["distances"], atol=1e-6)
+    assert actual["metadatas"] == expected["metadatas"]
+
+
+def test_search_ids_only_ranks_the_given_ids(tmp_path, queries):
+    ids, vectors = dataset()
+    build(tmp_path / "index", ids, vectors)
+    store = NumpyVectorService.from_directory(str(tmp_path / "index"))
+    subset = ids[::7] + ["missing"]
+
+    results = store.search_ids(queries[0], subset, top_k=5, include=["distances"])
+    rows = np.arange(0, ROWS, 7)
+    expected = rows[brute_force(vectors[rows], queries[:1], 5)[0]]
+    assert results["ids"][0] == [ids[row] for row in expected]
+
+
+def test_lookups_by_id(tmp_path):
+    ids, vectors = dataset(rows=50)
+    build(tmp_path / "index", ids, vectors)
+    store = NumpyVectorService.from_directory(str(tmp_path / "index"))
+
+    embeddings = store.get_embeddings(["00003", "missing"])
+    assert list(embeddings) == ["00003"]
+    assert np.allclose(embeddings["00003"], normalized(vectors[3:4])[0], atol=1e-3)
+    assert store.get_metadatas(["00049", "missing"]) == {"00049": {"filename": "00049.jpg"}}
+
+
+def test_rebuilt_index_is_picked_up(tmp_path):
+    ids, vectors = dataset(rows=50)
+    build(tmp_path / "index", ids, vectors)
+    store = NumpyVectorService.from_directory(str(tmp_path / "index"))
+    assert store.count() == 50
+
+    # The build scripts write next to the index and swap it in
+    build(tmp_path / "index.tmp", ids[:20], vectors[:20])
+    shutil.rmtree(tmp_path / "index")
+    os.replace(tmp_path / "index.tmp", tmp_path / "index")
+    assert store.count() == 20
+    assert store.search_batch(vectors[:1], top_k=1)["ids"] == [["00000"]]
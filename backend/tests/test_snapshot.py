@@ -0,0 +1,190 @@
+"""
+Snapshot export/import against an in-memory stand-in for the Chroma client.
+
+The swaps are what protect the live data: a failed export must leave the old
+snapshot in place, and a failed import must leave the old collection under
+its name, with the sync manifest untouched.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from scripts import snapshot
+from scripts.embedding_manifest import EmbeddingManifest
+from scripts.staged_directory import staged_directory
+
+
+class FakeCollection:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.rows = {}
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, limit, offset, include):
+        items = list(self.rows.items())[offset:offset + limit]
+        return {
+            "ids": [id_ for id_, _ in items],
+            "embeddings": [vector for _, (vector, _) in items],
+            "metadatas": [metadata for _, (_, metadata) in items],
+        }
+
+    def add(self, ids, embeddings, metadatas):
+        for id_, vector, metadata in zip(ids, embeddings, metadatas):
+            self.rows[id_] = (vector, metadata)
+
+    def modify(self, name):
+        if name in self.client.collections:
+            raise ValueError(f"Collection '{name}' already exists")
+        self.client.collections[name] = self.client.collections.pop(self.name)
+        self.name = name
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def list_collections(self):
+        return list(self.collections.values())
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def create_collection(self, name, metadata=None):
+        self.collections[name] = FakeCollection(self, name)
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+def fill(collection, count, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        collection.add([f"{i:05d}"], [rng.normal(size=8).tolist()], [{"filename": f"{i:05d}.jpg"}])
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    client = FakeClient()
+    fill(client.create_collection("source"), 23)
+    path = str(tmp_path / "snapshot")
+    snapshot.export_snapshot(client.get_collection("source"), path, model_name=settings.CLIP_MODEL_NAME, page_size=10)
+    return path
+
+
+def test_staged_directory_replaces_the_target(tmp_path):
+    target = str(tmp_path / "index")
+    os.makedirs(target)
+    open(os.path.join(target, "old.txt"), "w").close()
+
+    with staged_directory(target) as staging:
+        os.makedirs(staging)
+        open(os.path.join(staging, "new.txt"), "w").close()
+        assert os.path.exists(os.path.join(target, "old.txt"))
+
+    assert os.listdir(target) == ["new.txt"]
+    assert sorted(os.listdir(tmp_path)) == ["index"]
+
+
+def test_staged_directory_keeps_the_target_when_the_build_fails(tmp_path):
+    target = str(tmp_path / "index")
+    os.makedirs(target)
+    open(os.path.join(target, "old.txt"), "w").close()
+
+    with pytest.raises(RuntimeError):
+        with staged_directory(target) as staging:
+            os.makedirs(staging)
+            raise RuntimeError("build failed")
+
+    assert os.listdir(target) == ["old.txt"]
+    assert sorted(os.listdir(tmp_path)) == ["index"]
+
+
+def test_swap_collection_takes_a_free_name():
+    client = FakeClient()
+    staging = client.create_collection("visual_search_import")
+
+    snapshot.swap_collection(client, staging, "visual_search", snapshot.collection_names(client))
+
+    assert list(client.collections) == ["visual_search"]
+    assert client.get_collection("visual_search") is staging
+
+
+def test_swap_collection_replaces_the_existing_collection():
+    client = FakeClient()
+    client.create_collection("visual_search")
+    client.create_collection("visual_search_previous") # Left over from an interrupted swap
+    staging = client.create_collection("visual_search_import")
+
+    snapshot.swap_collection(client, staging, "visual_search", snapshot.collection_names(client))
+
+    assert list(client.collections) == ["visual_search"]
+    assert client.get_collection("visual_search") is staging
+
+
+def test_swap_collection_restores_the_existing_collection_when_the_rename_fails(monkeypatch):
+    client = FakeClient()
+    live = client.create_collection("visual_search")
+    staging = client.create_collection("visual_search_import")
+
+    def fail(name):
+        raise RuntimeError("rename failed")
+
+    monkeypatch.setattr(staging, "modify", fail)
+    with pytest.raises(RuntimeError):
+        snapshot.swap_collection(client, staging, "visual_search", snapshot.collection_names(client))
+
+    assert client.get_collection("visual_search") is live
+    assert "visual_search_previous" not in client.collections
+
+
+def test_import_replaces_the_collection(snapshot_dir, tmp_path):
+    client = FakeClient()
+    fill(client.create_collection("visual_search"), 5, seed=1)
+    manifest_path = str(tmp_path / "manifest.sqlite3")
+
+    count = snapshot.import_snapshot(client, snapshot_dir, "visual_search", replace=True,
+                                     manifest_path=manifest_path, image_dir=str(tmp_path / "images"))
+
+    assert count == 23
+    assert list(client.collections) == ["visual_search"]
+    assert client.get_collection("visual_search").count() == 23
+
+
+def test_failed_import_leaves_the_collection_and_manifest_untouched(snapshot_dir, tmp_path, monkeypatch):
+    client = FakeClient()
+    live = client.create_collection("visual_search")
+    fill(live, 5, seed=1)
+    manifest_path = str(tmp_path / "manifest.sqlite3")
+    manifest = EmbeddingManifest(manifest_path)
+    manifest.upsert([("00000.jpg", 1, 10, "hash")], "earlier-model")
+    manifest.close()
+
+    added = []
+    original_add = FakeCollection.add
+
+    def add(self, ids, embeddings, metadatas):
+        added.append(len(ids))
+        if len(added) == 2:
+            raise RuntimeError("disk full")
+        original_add(self, ids, embeddings, metadatas)
+
+    monkeypatch.setattr(snapshot, "max_batch_size", lambda client, default: 10)
+    monkeypatch.setattr(FakeCollection, "add", add)
+    with pytest.raises(RuntimeError):
+        snapshot.import_snapshot(client, snapshot_dir, "visual_search", replace=True,
+                                 manifest_path=manifest_path, image_dir=str(tmp_path / "images"))
+
+    assert list(client.collections) == ["visual_search"]
+    assert client.get_collection("visual_search") is live
+    assert live.count() == 5
+    manifest = EmbeddingManifest(manifest_path)
+    try:
+        assert manifest.models() == {"earlier-model"}
+    finally:
+        manifest.close()
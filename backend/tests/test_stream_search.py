@@ -0,0 +1,227 @@
+"""
+/search/stream against a local fake Ollama server.
+
+The API runs under a real uvicorn server so events are observed as they are
+flushed: image results must reach the client before the explanation, which
+arrives token by token as `explanation_delta` events and is completed by the
+final event.
+"""
+import asyncio
+import gc
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from starlette.requests import Request
+
+from app.api.v1 import search
+from app.core.config import settings
+from app.core.metrics import REQUESTS_IN_FLIGHT, STREAM_DISCONNECTS
+from app.core.models import SearchFilters
+from app.services import explanation_service
+from app.services.explanation_service import FALLBACK_EXPLANATION, ExplanationCache
+
+TOKENS = ["Bright", " red", " tones", " match", " the", " query."]
+TOKEN_DELAY = 0.15
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Streams TOKENS as Ollama NDJSON, one line every TOKEN_DELAY seconds."""
+    fail = False
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for token in TOKENS:
+            time.sleep(TOKEN_DELAY)
+            self.wfile.write(json.dumps({"model": body["model"], "response": token, "done": False}).encode() + b"\n")
+            self.wfile.flush()
+        self.wfile.write(json.dumps({"model": body["model"], "response": "", "done": True}).encode() + b"\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClip:
+    async def encode_text_batched(self, text):
+        return np.ones(4, dtype=np.float32)
+
+    def is_saturated(self):
+        return False
+
+
+class FakeStore:
+    def search(self, query_embedding, top_k=5, include=["metadatas"]):
+        ids = [f"{i:05d}" for i in range(top_k)]
+        return {
+            "ids": [ids],
+            "distances": [[0.1 * i for i in range(top_k)]],
+            "metadatas": [[{"filename": f"{id_}.jpg"} for id_ in ids]],
+        }
+
+    def search_filtered(self, query_embedding, top_k, match, include=["metadatas"]):
+        return self.search(query_embedding, top_k, include), "none"
+
+
+class NoKeywordIndex:
+    def version(self):
+        return None
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def fake_ollama():
+    server = serve(ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler))
+    yield server
+    server.shutdown()
+    FakeOllamaHandler.fail = False
+
+
+@pytest.fixture
+def api(fake_ollama, tmp_path, monkeypatch):
+    import ollama
+
+    # Keeps the explanation cache out of the working tree, including when the service is first created here
+    monkeypatch.setattr(settings, "EXPLANATION_CACHE_PATH", str(tmp_path / "explanations.sqlite3"))
+    explainer = explanation_service.get_explanation_service()
+    monkeypatch.setattr(explainer, "_async_client", ollama.AsyncClient(host=f"http://127.0.0.1:{fake_ollama.server_port}"))
+    monkeypatch.setattr(explainer, "_cache", ExplanationCache(settings.EXPLANATION_CACHE_PATH))
+
+    app = FastAPI()
+    app.include_router(search.router)
+    app.dependency_overrides[search.get_clip_service] = FakeClip
+    app.dependency_overrides[search.get_vector_store] = FakeStore
+    app.dependency_overrides[search.get_keyword_index_service] = NoKeywordIndex
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "API server did not start"
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def read_events(url: str, **params) -> list[tuple[float, dict]]:
+    """Returns (arrival time, payload) for every event of one stream."""
+    events = []
+    with httpx.stream("GET", f"{url}/search/stream", params=params, timeout=10) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("data: "):
+                events.append((time.perf_counter(), json.loads(line[len("data: "):])))
+    return events
+
+
+def test_results_precede_explanation_tokens(api):
+    events = read_events(api, q="red cars at night", limit=3)
+    payloads = [payload for _, payload in events]
+
+    results_at = next(i for i, p in enumerate(payloads) if p.get("results") and p["progress"] == 75)
+    delta_at = [i for i, p in enumerate(payloads) if "explanation_delta" in p]
+    done = payloads[-1]
+    assert done["step"] == "Done!" and done["progress"] == 100
+    assert len(payloads[results_at]["results"]) == 3
+    assert delta_at and results_at < delta_at[0] and delta_at[-1] < len(payloads) - 1
+
+    streamed = "".join(payloads[i]["explanation_delta"] for i in delta_at)
+    assert streamed == "".join(TOKENS)
+    assert done["explanation"] == streamed.strip()
+    assert all(item["explanation"] == done["explanation"] for item in done["results"])
+
+
+def test_tokens_are_flushed_as_they_are_generated(api):
+    events = read_events(api, q="tokens arrive one by one")
+    delta_times = [at for at, payload in events if "explanation_delta" in payload]
+    results_time = next(at for at, payload in events if payload.get("results"))
+
+    # Partial output: the client sees the results and the first token long
+    # before the LLM finishes, rather than everything at the end.
+    assert len(delta_times) == len(TOKENS)
+    assert delta_times[-1] - delta_times[0] >= (len(TOKENS) - 2) * TOKEN_DELAY
+    assert events[-1][0] - results_time >= (len(TOKENS) - 1) * TOKEN_DELAY
+
+
+def test_llm_failure_still_delivers_results(api):
+    FakeOllamaHandler.fail = True
+    payloads = [payload for _, payload in read_events(api, q="an llm outage")]
+
+    done = payloads[-1]
+    assert "error" not in done
+    assert len(done["results"]) == 5
+    assert done["explanation"] == FALLBACK_EXPLANATION
+
+
+def test_saturated_llm_still_serves_cached_explanation(api, monkeypatch):
+    first = read_events(api, q="a cached explanation")[-1][1]
+    monkeypatch.setattr(explanation_service.ExplanationService, "is_saturated", lambda self: True)
+    done = read_events(api, q="a cached explanation")[-1][1]
+
+    assert "degraded" not in done
+    assert done["explanation"] == first["explanation"] == "".join(TOKENS)
+
+
+@pytest.mark.parametrize("protocol", [1, 2])
+def test_client_disconnect_cancels_pending_work(api, monkeypatch, caplog, protocol):
+    async def never_polled(request):
+        # Leaves noticing the disconnect to the server cancelling the stream
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(search, "wait_for_disconnect", never_polled)
+    disconnects = STREAM_DISCONNECTS._values.get((), 0)
+    params = {"q": f"gone mid-stream {protocol}", "protocol": protocol}
+    with httpx.stream("GET", f"{api}/search/stream", params=params, headers={"Accept-Encoding": "gzip"}, timeout=10) as response:
+        for line in response.iter_lines():
+            if "explanation_delta" in line:
+                break # Hang up while tokens are still being generated
+
+    deadline = time.monotonic() + len(TOKENS) * TOKEN_DELAY + 2
+    while STREAM_DISCONNECTS._values.get((), 0) == disconnects and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    gc.collect()
+    assert STREAM_DISCONNECTS._values.get((), 0) == disconnects + 1
+    assert not [r for r in caplog.records if r.name == "asyncio" and r.levelno >= logging.ERROR]
+
+
+class IdleExplainer:
+    def is_saturated(self):
+        return False
+
+
+def test_unsent_stream_is_not_counted_in_flight():
+    async def open_stream():
+        request = Request({"type": "http", "method": "GET", "path": "/search/stream", "headers": []})
+        return await search.stream_search_images(
+            "never sent", request, offset=0, limit=5, protocol=1, filters=SearchFilters(), clip=FakeClip(),
+            store=FakeStore(), explainer=IdleExplainer(), cache=None, attributes=None, keywords=NoKeywordIndex()
+        )
+
+    in_flight = REQUESTS_IN_FLIGHT._values.get((("route", "stream"),), 0)
+    response = asyncio.run(open_stream())
+    # Dropped without ever being iterated, as when the client is gone before the response starts
+    del response
+    gc.collect()
+    assert REQUESTS_IN_FLIGHT._values.get((("route", "stream"),), 0) == in_flight
@@ -0,0 +1,90 @@
+"""
+Strategy selection of VectorStore.search_filtered, against an in-memory exact store.
+"""
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.vector_store import VectorStore
+
+
+class MemoryStore(VectorStore):
+    """Exact search over an in-memory matrix; records how many vectors search_ids reads."""
+
+    def __init__(self, vectors):
+        self.ids = [f"{i:05d}" for i in range(len(vectors))]
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.fetched = 0
+
+    def search_batch(self, query_embeddings, top_k=5, include=["metadatas"]):
+        scores = query_embeddings @ self.vectors.T
+        top = np.argsort(-scores, axis=1)[:, :top_k]
+        return {
+            "ids": [[self.ids[i] for i in row] for row in top],
+            "distances": [(1.0 - scores[q, row]).tolist() for q, row in enumerate(top)],
+            "metadatas": [[{} for _ in row] for row in top],
+        }
+
+    def count(self):
+        return len(self.ids)
+
+    def get_embeddings(self, ids):
+        self.fetched += len(ids)
+        return {id_: self.vectors[int(id_)] for id_ in ids}
+
+    def get_metadatas(self, ids):
+        return {id_: {} for id_ in ids}
+
+
+class Match:
+    def __init__(self, rows, total):
+        self.rows = sorted(rows)
+        self.count = len(self.rows)
+        self.selectivity = self.count / total
+
+    def ids(self):
+        return [f"{row:05d}" for row in self.rows]
+
+    def contains(self, id_):
+        return int(id_) in self.rows
+
+
+@pytest.fixture
+def store():
+    return MemoryStore(np.random.default_rng(0).normal(size=(2000, 16)).astype(np.float32))
+
+
+def brute_force(store, query, match, top_k):
+    scores = {id_: float(store.vectors[int(id_)] @ query) for id_ in match.ids()}
+    return sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+
+def test_narrow_filter_is_prefiltered(store):
+    query = store.vectors[0]
+    match = Match(range(0, 2000, 50), 2000) # 2%, 40 rows
+    results, strategy = store.search_filtered(query, 5, match)
+
+    assert strategy == "prefilter"
+    assert results["ids"][0] == brute_force(store, query, match, 5)
+
+
+def test_row_cap_bounds_prefiltering_at_low_selectivity(store, monkeypatch):
+    # 5% of the collection, but more rows than the cap: never scanned as a whole
+    monkeypatch.setattr(settings, "FILTER_PREFILTER_MAX_ROWS", 50)
+    monkeypatch.setattr(settings, "FILTER_POSTFILTER_MAX_K", 200)
+    query = store.vectors[3]
+    match = Match(range(0, 2000, 20), 2000)
+    results, strategy = store.search_filtered(query, 5, match)
+
+    assert strategy == "postfilter"
+    assert store.fetched == 0
+    assert results["ids"][0] == brute_force(store, query, match, 5)
+
+
+def test_broad_filter_under_the_cap_is_postfiltered(store):
+    query = store.vectors[7]
+    match = Match(range(0, 2000, 2), 2000) # 50%
+    results, strategy = store.search_filtered(query, 5, match)
+
+    assert strategy == "postfilter"
+    assert results["ids"][0] == brute_force(store, query, match, 5)
@@ -34,9 +34,12 @@ function App() {
         setProgress(update.progress);
         setProgressStep(update.step);
       },
-      onResults: (finalResults) => {
-        setResults(finalResults);
-        setIsLoading(false); // Search is complete
+      onResults: (searchResults) => {
+        setResults(searchResults);
+        setIsLoading(false); // Images are ready; the explanation keeps streaming in
+      },
+      onExplanation: (explanation) => {
+        setResults((current) => (current || []).map((item) => ({ ...item, explanation })));
       },
       onError: (errorMessage) => {
         setError(errorMessage);
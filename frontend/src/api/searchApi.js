@@ -1,18 +1,29 @@
 // The base URL for our FastAPI backend
 const API_URL = 'http://localhost:8000/api/v1';
 
+// Protocol 2 sends result URLs relative to `base_url`; absolute URLs (e.g. a CDN) are kept as is
+const resolveUrls = (item, baseUrl) => ({
+  ...item,
+  image_url: new URL(item.image_url, baseUrl).href,
+  thumbnail_urls: Object.fromEntries(
+    Object.entries(item.thumbnail_urls || {}).map(([size, url]) => [size, new URL(url, baseUrl).href])
+  ),
+});
+
 /**
- * Performs a streaming search.
+ * Performs a streaming search (compact stream protocol 2).
  * @param {string} queryText - The text to search for.
  * @param {Function} onProgress - Callback for progress updates.
- * @param {Function} onResults - Callback for the final results.
+ * @param {Function} onResults - Callback for the image results (sent before the explanation finishes).
+ * @param {Function} onExplanation - Callback with the explanation text streamed so far.
  * @param {Function} onError - Callback for errors.
  * @returns {EventSource} The event source object to allow for cancellation.
  */
-export const streamSearch = (queryText, { onProgress, onResults, onError }) => {
+export const streamSearch = (queryText, { onProgress, onResults, onExplanation, onError }) => {
   // Use a GET request with a query parameter for EventSource
-  const url = `${API_URL}/search/stream?q=${encodeURIComponent(queryText)}`;
+  const url = `${API_URL}/search/stream?protocol=2&q=${encodeURIComponent(queryText)}`;
   const eventSource = new EventSource(url);
+  let explanationText = '';
 
   // Listener for incoming messages
   eventSource.onmessage = (event) => {
@@ -23,9 +34,20 @@ export const streamSearch = (queryText, { onProgress, onResults, onError }) => {
       onProgress(data);
     }
     
-    // Handle the final message with results
+    // Handle the image results, which arrive as soon as the search finishes
     if (data.results) {
-      onResults(data.results);
+      onResults(data.results.map((item) => ({ ...resolveUrls(item, data.base_url), explanation: explanationText })));
+    }
+
+    // Handle explanation tokens streamed from the LLM
+    if (data.explanation_delta) {
+      explanationText += data.explanation_delta;
+      onExplanation(explanationText);
+    }
+
+    // Handle the final message; it only carries the explanation when none was streamed
+    if (data.progress === 100 && !data.error) {
+      onExplanation((data.explanation ?? explanationText).trim());
       eventSource.close(); // We're done, close the connection
     }
 
@@ -1,11 +1,23 @@
 import React from 'react';
 
+// Builds a srcset from the thumbnail sizes, so the browser picks the smallest rendition that fits
+const toSrcSet = (thumbnailUrls = {}) =>
+  Object.entries(thumbnailUrls).map(([size, url]) => `${url} ${size}w`).join(', ') || undefined;
+
 // Accept 'score' as a new prop
-const ImageCard = ({ imageUrl, explanation, score }) => {
+const ImageCard = ({ imageUrl, thumbnailUrls, explanation, score }) => {
   return (
     <div className="image-card">
       <div className="score-badge">{score}% Match</div>
-      <img src={imageUrl} alt="Search result" className="result-image" />
+      <img
+        src={imageUrl}
+        srcSet={toSrcSet(thumbnailUrls)}
+        sizes="(max-width: 700px) 100vw, 400px"
+        loading="lazy"
+        decoding="async"
+        alt="Search result"
+        className="result-image"
+      />
       <div className="explanation-box">
         <p className="explanation-text">{explanation}</p>
       </div>
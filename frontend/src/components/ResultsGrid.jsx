@@ -20,6 +20,7 @@ const ResultsGrid = ({ results, isLoading, error }) => {
         <ImageCard
           key={item.image_id}
           imageUrl={item.image_url}
+          thumbnailUrls={item.thumbnail_urls}
           explanation={item.explanation}
           score={item.score}
         />